@@ -0,0 +1,115 @@
+"""
+KYREL - Agregados Materializados
+Totales de stock y de ventas guardados junto a los datos (clave "agregados")
+y actualizados en O(1) con cada alta de producto, ajuste de stock o venta.
+"""
+
+CLAVE = "agregados"
+
+
+def factura_de(venta):
+    """Número de factura de una línea de venta (las ventas de una sola línea
+    anteriores a las facturas con varias líneas son su propia factura)"""
+    return venta.get("factura", venta["id"])
+
+
+def es_inicio_factura(venta):
+    """True en la primera línea de cada factura (la que cuenta como factura)"""
+    return factura_de(venta) == venta["id"]
+
+
+def _clave_sede_categoria(sede, categoria):
+    return f"{sede}|{categoria}"
+
+
+def agregados_vacios():
+    """Estructura de agregados sin registros"""
+    return {
+        "productos": 0,
+        "facturas": 0,
+        "unidades_por_sede": {},
+        "unidades_por_categoria": {},
+        "unidades_por_sede_categoria": {},
+        "ventas_por_dia": {}
+    }
+
+
+def calcular_agregados(datos):
+    """Recalcula todos los agregados recorriendo los datos (las ventas de
+    los meses archivados se suman desde sus resúmenes, ver historico.py)"""
+    agregados = agregados_vacios()
+    for mes in datos.get("historico", {}).get("meses", {}).values():
+        agregados["facturas"] += mes["ventas"]["facturas"]
+        for fecha, (total, facturas, _) in mes["ventas"]["por_dia"].items():
+            dia = agregados["ventas_por_dia"].setdefault(fecha, {"total": 0, "facturas": 0})
+            dia["total"] = round(dia["total"] + total, 2)
+            dia["facturas"] += facturas
+    for producto in datos.get("productos", []):
+        producto_agregado(agregados, producto)
+    for venta in datos.get("ventas", []):
+        venta_agregada(agregados, venta)
+    return agregados
+
+
+def agregados_de(datos):
+    """Agregados de `datos`, calculándolos si aún no existen"""
+    if CLAVE not in datos:
+        datos[CLAVE] = calcular_agregados(datos)
+    return datos[CLAVE]
+
+
+def _sumar_unidades(agregados, producto, unidades):
+    sede = producto["sede"]
+    categoria = producto["categoria"]
+    clave = _clave_sede_categoria(sede, categoria)
+    por_sede = agregados["unidades_por_sede"]
+    por_categoria = agregados["unidades_por_categoria"]
+    por_sede_categoria = agregados["unidades_por_sede_categoria"]
+    por_sede[sede] = por_sede.get(sede, 0) + unidades
+    por_categoria[categoria] = por_categoria.get(categoria, 0) + unidades
+    por_sede_categoria[clave] = por_sede_categoria.get(clave, 0) + unidades
+
+
+def producto_agregado(agregados, producto):
+    """Suma un producto nuevo a los agregados"""
+    agregados["productos"] += 1
+    _sumar_unidades(agregados, producto, producto["cantidad"])
+
+
+def stock_ajustado(agregados, producto, delta):
+    """Refleja un cambio de stock de un producto existente"""
+    _sumar_unidades(agregados, producto, delta)
+
+
+def venta_agregada(agregados, venta):
+    """Suma una línea de venta a los agregados (la factura se cuenta una vez)"""
+    inicio = 1 if es_inicio_factura(venta) else 0
+    agregados["facturas"] += inicio
+    dia = agregados["ventas_por_dia"].setdefault(venta["fecha"], {"total": 0, "facturas": 0})
+    dia["total"] = round(dia["total"] + venta["total"], 2)
+    dia["facturas"] += inicio
+
+
+def unidades_sede_categoria(agregados, sede, categoria):
+    """Unidades en stock de una categoría en una sede"""
+    return agregados["unidades_por_sede_categoria"].get(_clave_sede_categoria(sede, categoria), 0)
+
+
+def diferencias_agregados(datos):
+    """Compara los agregados guardados con un recálculo desde cero.
+
+    Devuelve una lista de (campo, guardado, calculado) con las diferencias.
+    """
+    guardados = datos.get(CLAVE) or agregados_vacios()
+    calculados = calcular_agregados(datos)
+    diferencias = []
+    for campo, valor in calculados.items():
+        actual = guardados.get(campo)
+        if isinstance(valor, dict):
+            actual = actual or {}
+            for clave in sorted(set(valor) | set(actual)):
+                if actual.get(clave) != valor.get(clave):
+                    diferencias.append((f"{campo}[{clave}]", actual.get(clave), valor.get(clave)))
+        elif actual != valor:
+            diferencias.append((campo, actual, valor))
+    return diferencias
@@ -0,0 +1,96 @@
+"""
+KYREL - Agrupación
+Agrupa y agrega colecciones en una sola pasada, con uniones por hash.
+
+Ejemplo (asistencia por sede, uniendo asistencia -> empleado por carnet):
+
+    sede_de = tabla_hash(empleados, "carnet", "sede")
+    agrupar(asistencias,
+            lambda a: sede_de.get(a["empleado_carnet"]),
+            {"total": contar(), "presentes": contar(lambda a: a["presente"]),
+             "porcentaje": proporcion(lambda a: a["presente"])})
+"""
+
+
+class Reductor:
+    """Agregación incremental: estado inicial, acumulación y resultado"""
+
+    def __init__(self, inicial, acumular, resultado=None):
+        self.inicial = inicial
+        self.acumular = acumular
+        self.resultado = resultado or (lambda estado: estado)
+
+
+def _campo(campo):
+    """Convierte un nombre de campo en función de acceso (o la deja igual)"""
+    if callable(campo):
+        return campo
+    return lambda registro: registro.get(campo, 0)
+
+
+def contar(condicion=None):
+    """Cantidad de registros del grupo (que cumplen `condicion`, si se indica)"""
+    if condicion is None:
+        return Reductor(lambda: 0, lambda estado, registro: estado + 1)
+    return Reductor(lambda: 0, lambda estado, registro: estado + 1 if condicion(registro) else estado)
+
+
+def sumar(campo):
+    """Suma de un campo (nombre o función) en el grupo"""
+    valor = _campo(campo)
+    return Reductor(lambda: 0, lambda estado, registro: estado + valor(registro))
+
+
+def proporcion(condicion, porcentaje=True):
+    """Fracción de registros del grupo que cumplen `condicion` (en % por defecto)"""
+    factor = 100 if porcentaje else 1
+
+    def acumular(estado, registro):
+        estado[1] += 1
+        if condicion(registro):
+            estado[0] += 1
+        return estado
+
+    return Reductor(
+        lambda: [0, 0],
+        acumular,
+        lambda estado: estado[0] / estado[1] * factor if estado[1] else None
+    )
+
+
+def tabla_hash(registros, clave, valor=None):
+    """Construye un diccionario clave -> registro (o -> campo `valor`) para
+    unir colecciones por hash en lugar de con bucles anidados"""
+    tabla = {}
+    for registro in registros:
+        tabla[registro[clave]] = registro if valor is None else registro[valor]
+    return tabla
+
+
+def agrupar(registros, clave, reductores, grupos=()):
+    """Agrupa `registros` por `clave(registro)` aplicando cada reductor.
+
+    Los registros cuya clave es None se descartan. `grupos` permite crear
+    de antemano grupos que deben aparecer aunque no tengan registros.
+    Devuelve {grupo: {nombre_reductor: resultado}}.
+    """
+    nombres = list(reductores)
+    lista = [reductores[n] for n in nombres]
+    estados = {}
+    for grupo in grupos:
+        estados[grupo] = [r.inicial() for r in lista]
+
+    for registro in registros:
+        grupo = clave(registro)
+        if grupo is None:
+            continue
+        estado = estados.get(grupo)
+        if estado is None:
+            estado = estados[grupo] = [r.inicial() for r in lista]
+        for i, reductor in enumerate(lista):
+            estado[i] = reductor.acumular(estado[i], registro)
+
+    return {
+        grupo: {nombre: reductor.resultado(e) for nombre, reductor, e in zip(nombres, lista, estado)}
+        for grupo, estado in estados.items()
+    }
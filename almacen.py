@@ -0,0 +1,515 @@
+"""
+KYREL - Almacén de Datos
+Copia única en memoria de los datos, recargada solo cuando el origen cambia.
+
+El almacén por defecto usa datos.json: los cambios se confirman como líneas
+en un diario (datos.json.diario) y cada cierto número de confirmaciones se
+consolidan en datos.json (punto de control). almacen_sqlite ofrece la misma
+interfaz sobre una base SQLite y almacen_binario la guarda en una
+instantánea binaria en lugar de JSON.
+"""
+
+import os
+import json
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Sin fcntl (Windows) no hay cerrojo entre procesos; la verificación de
+    # versión al confirmar sigue detectando los conflictos
+    fcntl = None
+
+from indices import Indices, clave_carnet
+from diario import Diario, aplicar_operacion
+from lector_json import iterar_coleccion, leer_clave
+from agregados import (
+    CLAVE as CLAVE_AGREGADOS, agregados_de, calcular_agregados, diferencias_agregados,
+    producto_agregado, stock_ajustado, venta_agregada
+)
+import historico
+import perfil
+
+# Confirmaciones en el diario antes de consolidar en datos.json
+LIMITE_DIARIO = 500
+
+# Campo clave de cada colección para las operaciones "actualizar"
+CLAVES = {
+    "productos": "id",
+    "ventas": "id",
+    "empleados": "carnet",
+}
+
+
+def datos_vacios():
+    """Estructura inicial cuando no existe el archivo de datos"""
+    return {
+        "productos": [],
+        "ventas": [],
+        "empleados": [],
+        "asistencias": [],
+        "incapacidades": [],
+        "movimientos": [],
+        "configuracion": {
+            "proximo_id_producto": 1,
+            "proximo_id_venta": 1,
+            "proximo_id_movimiento": 1
+        }
+    }
+
+
+class ConflictoVersion(Exception):
+    """Otro proceso confirmó cambios desde que se leyeron los datos"""
+
+
+def version_datos(datos):
+    """Número de confirmaciones aplicadas a los datos"""
+    return datos.get("configuracion", {}).get("version_datos", 0)
+
+
+def crear_almacen(backend, ruta):
+    """Crea el almacén para el backend indicado ("json", "sqlite" o "binario")"""
+    if backend == "json":
+        return Almacen(ruta)
+    if backend == "sqlite":
+        from almacen_sqlite import AlmacenSQLite
+        return AlmacenSQLite(ruta)
+    if backend == "binario":
+        from almacen_binario import AlmacenBinario
+        return AlmacenBinario(ruta)
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
+
+
+class AlmacenBase:
+    """Parte común a todos los backends: copia en memoria, índices,
+    modificaciones anotadas y consultas agregadas.
+
+    Cada backend implementa `cargar`, `guardar` e `invalidar`.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.datos = None
+        # Operaciones aplicadas en memoria pendientes de confirmar
+        self.pendientes = []
+        # Aumenta cada vez que los datos en memoria cambian
+        self.version = 0
+        self._indices = None
+        # Profundidad del cerrojo tomado por este almacén (es reentrante)
+        self._bloqueos = 0
+
+    def indices_de(self, datos):
+        """Índices para `datos`; se construyen una sola vez por copia cargada"""
+        if self._indices is None or self._indices.datos is not datos:
+            self._indices = Indices(datos)
+        return self._indices
+
+    def iterar(self, coleccion):
+        """Recorre los registros de una sola colección"""
+        return perfil.contar(iter(self.cargar().get(coleccion, [])))
+
+    def buscar(self, coleccion, clave):
+        """Registro de una colección por su clave (ID o carnet), o None.
+        Las ventas y movimientos se buscan también en el histórico"""
+        registro = self.indices_de(self.cargar()).buscar(coleccion, clave)
+        if registro is None:
+            return self.buscar_archivado(coleccion, clave)
+        return registro
+
+    def en_rango(self, coleccion, desde=None, hasta=None, particion=None):
+        """Ventas, movimientos o asistencias entre dos fechas (inclusive) en
+        orden de fecha, incluidos los meses archivados; `particion` filtra por
+        carnet (ventas, asistencias) o sede (movimientos)"""
+        registros = self.indices_de(self.cargar()).en_rango(coleccion, desde, hasta, particion)
+        manifiesto = self.historico()
+        if not manifiesto:
+            return list(registros)
+        archivados = historico.en_rango(historico.directorio_historico(self.ruta), manifiesto,
+                                        coleccion, desde, hasta, particion)
+        return archivados + list(registros)
+
+    def historico(self):
+        """Manifiesto de los meses archivados (vacío si no hay)"""
+        return self.cargar().get(historico.CLAVE, {})
+
+    def buscar_archivado(self, coleccion, clave):
+        """Venta o movimiento de un mes archivado, o None"""
+        if coleccion not in ("ventas", "movimientos") or not isinstance(clave, int):
+            return None
+        manifiesto = self.historico()
+        if not manifiesto:
+            return None
+        return historico.buscar(historico.directorio_historico(self.ruta), manifiesto, coleccion, clave)
+
+    def marca_datos(self):
+        """Valor que cambia siempre que cambian los datos (para cachés)"""
+        self.cargar()
+        return self.version
+
+    def punto_de_control(self):
+        """Consolida los cambios confirmados (no aplica a todos los backends)"""
+
+    @contextmanager
+    def bloqueo(self):
+        """Cerrojo exclusivo entre procesos (fcntl.flock sobre `<ruta>.lock`)
+        alrededor de leer-modificar-escribir; reentrante dentro del mismo
+        almacén. Sin fcntl no excluye: queda la verificación de versión"""
+        if fcntl is None or self._bloqueos:
+            self._bloqueos += 1
+            try:
+                yield
+            finally:
+                self._bloqueos -= 1
+            return
+        with open(self.ruta + ".lock", 'a') as cerrojo:
+            fcntl.flock(cerrojo, fcntl.LOCK_EX)
+            self._bloqueos += 1
+            try:
+                yield
+            finally:
+                self._bloqueos -= 1
+                fcntl.flock(cerrojo, fcntl.LOCK_UN)
+
+
+    # --------------------------------------------------------
+    # Modificaciones (se anotan para confirmarlas después)
+    # --------------------------------------------------------
+
+    def _anotar(self, datos, op):
+        """Anota una operación si afecta a la copia vigente en memoria"""
+        if datos is self.datos:
+            self.pendientes.append(op)
+
+    def insertar(self, datos, coleccion, registro):
+        """Agrega un registro a una colección, a los índices y a los agregados"""
+        indices = self.indices_de(datos)
+        agregados = agregados_de(datos)
+        datos.setdefault(coleccion, []).append(registro)
+        indices.agregar(coleccion, registro)
+        if coleccion == "productos":
+            producto_agregado(agregados, registro)
+        elif coleccion == "ventas":
+            venta_agregada(agregados, registro)
+        self._anotar(datos, {"op": "insertar", "coleccion": coleccion, "registro": registro})
+
+    def ajustar_stock(self, datos, producto, delta):
+        """Suma `delta` (positivo o negativo) a la cantidad de un producto"""
+        # Los agregados se obtienen antes del cambio: si aún no existen se
+        # calculan desde los datos y no deben incluir ya este delta
+        agregados = agregados_de(datos)
+        producto["cantidad"] += delta
+        stock_ajustado(agregados, producto, delta)
+        self._anotar(datos, {
+            "op": "stock",
+            "producto_id": producto["id"],
+            "delta": delta,
+            "cantidad": producto["cantidad"]
+        })
+
+    def actualizar(self, datos, coleccion, registro, campos):
+        """Modifica campos de un registro existente"""
+        registro.update(campos)
+        self._anotar(datos, {
+            "op": "actualizar",
+            "coleccion": coleccion,
+            "clave": registro[CLAVES[coleccion]],
+            "campos": campos
+        })
+
+    def siguiente_id(self, datos, contador):
+        """Reserva el próximo ID del contador indicado de `configuracion`"""
+        config = datos["configuracion"]
+        valor = config[contador]
+        config[contador] = valor + 1
+        self._anotar(datos, {"op": "config", "campos": {contador: valor + 1}})
+        return valor
+
+    # --------------------------------------------------------
+    # Consultas agregadas
+    # --------------------------------------------------------
+
+    def agregados(self):
+        """Agregados materializados de los datos vigentes (solo lectura)"""
+        return agregados_de(self.cargar())
+
+    def verificar_agregados(self):
+        """Diferencias entre los agregados guardados y un recálculo completo"""
+        return diferencias_agregados(self.cargar())
+
+    def reparar_agregados(self):
+        """Reemplaza los agregados por un recálculo completo"""
+        datos = self.cargar()
+        datos[CLAVE_AGREGADOS] = calcular_agregados(datos)
+        self.version += 1
+
+    def unidades_por_sede(self):
+        """Unidades en stock por sede"""
+        return dict(self.agregados()["unidades_por_sede"])
+
+    def unidades_por_categoria(self):
+        """Unidades en stock por categoría"""
+        return dict(self.agregados()["unidades_por_categoria"])
+
+    def total_ventas_dia(self, fecha):
+        """Monto vendido en una fecha (AAAA-MM-DD)"""
+        return self.agregados()["ventas_por_dia"].get(fecha, {}).get("total", 0)
+
+    def total_ventas_empleado(self, carnet):
+        """Monto vendido por un empleado, incluidos los meses archivados"""
+        self.cargar()
+        ventas = self.indices_de(self.datos).ventas_por_carnet.get(clave_carnet(carnet), [])
+        return sum(v["total"] for v in ventas) + historico.total_ventas_empleado(self.datos, carnet)
+
+
+class Almacen(AlmacenBase):
+    """Almacén sobre datos.json con diario de cambios"""
+
+    def __init__(self, ruta, limite_diario=LIMITE_DIARIO):
+        super().__init__(ruta)
+        self.diario = Diario(ruta + ".diario")
+        self.limite_diario = limite_diario
+        self.firma = None
+        self.firma_diario = None
+        self.posicion_diario = 0
+        self.entradas_diario = 0
+        # version_datos del último punto de control leído o escrito
+        self.version_base = 0
+
+    def firma_archivo(self):
+        """Identifica el estado del archivo en disco (inodo, mtime, tamaño)"""
+        try:
+            st = os.stat(self.ruta)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    # --------------------------------------------------------
+    # Lectura
+    # --------------------------------------------------------
+
+    def cargar(self):
+        """Devuelve los datos, volviendo a leer de disco solo si algo cambió"""
+        firma = self.firma_archivo()
+        firma_diario = self.diario.firma()
+        if self.datos is not None and firma == self.firma:
+            if firma_diario == self.firma_diario:
+                return self.datos
+            # Mismo punto de control: basta con reproducir la cola del diario
+            if (firma_diario is not None and self.firma_diario is not None
+                    and firma_diario[0] == self.firma_diario[0]
+                    and firma_diario[2] > self.posicion_diario):
+                self._reproducir_diario(self.posicion_diario)
+                self.firma_diario = firma_diario
+                self.version += 1
+                return self.datos
+
+        if firma is None:
+            datos = datos_vacios()
+        else:
+            try:
+                with perfil.medicion("io", "leer_datos", bytes_leidos=firma[2]):
+                    datos = self.leer_archivo()
+            except (OSError, ValueError):
+                datos = datos_vacios()
+
+        self.datos = datos
+        self.firma = firma
+        self.version_base = version_datos(datos)
+        self.pendientes = []
+        self.entradas_diario = 0
+        self._reproducir_diario(0)
+        self.firma_diario = firma_diario
+        self.version += 1
+        return self.datos
+
+    def leer_archivo(self):
+        """Lee el punto de control completo (datos.json)"""
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _reproducir_diario(self, desde):
+        """Aplica las confirmaciones del diario posteriores al punto de control"""
+        entradas, self.posicion_diario = self.diario.leer(desde)
+        indices = self.indices_de(self.datos)
+        config = self.datos.setdefault("configuracion", {})
+        for entrada in entradas:
+            self.entradas_diario += 1
+            # Ya incluida en datos.json (punto de control interrumpido)
+            if entrada.get("version", 0) <= self.version_base:
+                continue
+            for op in entrada["ops"]:
+                aplicar_operacion(self.datos, indices, op)
+            config["version_datos"] = max(config.get("version_datos", 0), entrada["version"])
+
+    def marca_datos(self):
+        """Valor que cambia siempre que cambian los datos, sin cargarlos"""
+        return (self.firma_archivo(), self.diario.firma(), self.version)
+
+    def iterar(self, coleccion):
+        """Recorre una colección sin cargar las demás cuando es posible.
+
+        Si la copia en memoria está al día se usa esa; si no hay diario
+        pendiente se lee la colección directamente de datos.json.
+        """
+        firma = self.firma_archivo()
+        firma_diario = self.diario.firma()
+        if self.datos is not None and firma == self.firma and firma_diario == self.firma_diario:
+            return perfil.contar(iter(self.datos.get(coleccion, [])))
+        if firma is not None and firma_diario is None:
+            return perfil.contar(iterar_coleccion(self.ruta, coleccion))
+        return super().iterar(coleccion)
+
+    def buscar(self, coleccion, clave):
+        """Busca por índice si hay copia en memoria al día (o diario pendiente);
+        si no, recorre en streaming solo la colección pedida"""
+        firma = self.firma_archivo()
+        firma_diario = self.diario.firma()
+        vigente = self.datos is not None and firma == self.firma and firma_diario == self.firma_diario
+        if vigente or firma is None or firma_diario is not None:
+            return super().buscar(coleccion, clave)
+        campo = CLAVES[coleccion]
+        normalizar = clave_carnet if campo == "carnet" else (lambda valor: valor)
+        clave = normalizar(clave)
+        for registro in perfil.contar(iterar_coleccion(self.ruta, coleccion)):
+            if normalizar(registro.get(campo)) == clave:
+                return registro
+        return self.buscar_archivado(coleccion, clave)
+
+    def historico(self):
+        """Manifiesto de los meses archivados; sin copia en memoria ni diario
+        pendiente se lee solo esa clave de la cabecera de datos.json"""
+        if self.datos is None and self.firma_archivo() is not None and self.diario.firma() is None:
+            return leer_clave(self.ruta, historico.CLAVE, {})
+        return super().historico()
+
+    def agregados(self):
+        """Agregados materializados; sin copia en memoria ni diario pendiente
+        se leen solo de la cabecera de datos.json"""
+        firma = self.firma_archivo()
+        firma_diario = self.diario.firma()
+        if self.datos is None and firma is not None and firma_diario is None:
+            agregados = leer_clave(self.ruta, CLAVE_AGREGADOS)
+            if agregados is not None:
+                return agregados
+        return agregados_de(self.cargar())
+
+    def reparar_agregados(self):
+        """Recalcula los agregados y los guarda en datos.json"""
+        with self.bloqueo():
+            super().reparar_agregados()
+            self.reescribir(self.datos)
+
+    # --------------------------------------------------------
+    # Escritura
+    # --------------------------------------------------------
+
+    def cambiado_en_disco(self):
+        """True si datos.json o el diario cambiaron desde la última lectura o
+        escritura de este almacén (otro proceso confirmó cambios)"""
+        return self.firma_archivo() != self.firma or self.diario.firma() != self.firma_diario
+
+    def guardar(self, datos):
+        """Confirma los cambios y deja `datos` como copia vigente en memoria.
+
+        Si los cambios se hicieron con los métodos del almacén sobre la copia
+        vigente, solo se anexan al diario; en otro caso se reescribe el archivo.
+
+        Los cambios se confirman bajo el cerrojo y solo si nadie más confirmó
+        desde que se leyeron los datos (para un diccionario ajeno, si la
+        versión en disco no es posterior a la suya); si no, se descarta la
+        copia en memoria y se lanza ConflictoVersion para que el llamador
+        reaplique la operación sobre los datos frescos.
+        """
+        with self.bloqueo():
+            self._verificar_version(datos)
+            if datos is self.datos and self.pendientes:
+                self._confirmar_en_diario()
+                if self.entradas_diario >= self.limite_diario:
+                    self.punto_de_control()
+            else:
+                self.reescribir(datos)
+        self.version += 1
+
+    def _verificar_version(self, datos):
+        """Lanza ConflictoVersion si otro proceso confirmó cambios que `datos`
+        no incluye"""
+        if datos is self.datos:
+            conflicto = self.cambiado_en_disco()
+        else:
+            conflicto = version_datos(self.cargar()) > version_datos(datos)
+        if conflicto:
+            self.invalidar()
+            raise ConflictoVersion(
+                f"{self.ruta} fue modificado por otro proceso "
+                f"después de la versión {version_datos(datos)}"
+            )
+
+    def _confirmar_en_diario(self):
+        """Anexa las operaciones pendientes como una sola confirmación"""
+        config = self.datos.setdefault("configuracion", {})
+        config["version_datos"] = config.get("version_datos", 0) + 1
+        entrada = {"version": config["version_datos"], "ops": self.pendientes}
+        self.pendientes = []
+
+        antes, despues = self.diario.anexar(entrada)
+        self.entradas_diario += 1
+        if antes == self.posicion_diario:
+            self.posicion_diario = despues
+            self.firma_diario = self.diario.firma()
+        else:
+            # Otro proceso escribió en el diario: releer todo en la próxima carga
+            self.firma = None
+
+    def reescribir(self, datos):
+        """Escribe todos los datos como una confirmación más: sube
+        version_datos para que las copias leídas antes no pasen la
+        verificación de versión. Se llama con el cerrojo tomado"""
+        config = datos.setdefault("configuracion", {})
+        config["version_datos"] = config.get("version_datos", 0) + 1
+        self.escribir_completo(datos)
+
+    def escribir_completo(self, datos):
+        """Escribe todos los datos en datos.json y vacía el diario"""
+        # Escribir a un archivo temporal primero
+        temp_file = self.ruta + ".tmp"
+        with perfil.medicion("io", "escribir_datos") as medida:
+            self.escribir_archivo(temp_file, datos)
+            medida["bytes_escritos"] = os.path.getsize(temp_file)
+
+        # Reemplazar el archivo original
+        os.replace(temp_file, self.ruta)
+        self.diario.truncar()
+
+        self.datos = datos
+        self.firma = self.firma_archivo()
+        self.version_base = version_datos(datos)
+        self.firma_diario = None
+        self.posicion_diario = 0
+        self.entradas_diario = 0
+        self.pendientes = []
+
+    def escribir_archivo(self, ruta, datos):
+        """Escribe el punto de control completo en `ruta` (JSON legible)"""
+        contenido = datos
+        cabecera = [c for c in (CLAVE_AGREGADOS, historico.CLAVE) if c in datos]
+        if cabecera:
+            # Agregados y manifiesto van primero para leerlos sin recorrer el historial
+            contenido = {c: datos[c] for c in cabecera}
+            contenido.update((k, v) for k, v in datos.items() if k not in cabecera)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(contenido, f, indent=2, ensure_ascii=False)
+
+    def punto_de_control(self):
+        """Consolida el diario en datos.json"""
+        with self.bloqueo():
+            if self.diario.firma() is None:
+                return
+            self.escribir_completo(self.cargar())
+
+    def invalidar(self):
+        """Descarta la copia en memoria; la próxima lectura irá a disco"""
+        self.datos = None
+        self.firma = None
+        self.firma_diario = None
+        self.pendientes = []
+        self._indices = None
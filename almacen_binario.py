@@ -0,0 +1,118 @@
+"""
+KYREL - Almacén Binario
+Variante del almacén JSON cuyo punto de control es una instantánea binaria
+(datos.bin) en lugar de datos.json: los datos se serializan con marshal,
+que se lee y escribe varias veces más rápido que el JSON con sangría, y se
+guardan con una cabecera de longitud fija con el hash SHA-256 del contenido,
+que se comprueba al cargar. El diario de cambios funciona igual.
+
+datos.json sigue siendo el formato de intercambio: mantenimiento.py exporta
+la instantánea a JSON (para revisarla o editarla) y la vuelve a importar.
+
+Uso:
+    python mantenimiento.py importar-json --json datos.json --binario datos.bin
+    KYREL_BACKEND=binario python principal_cli.py
+"""
+
+import marshal
+import struct
+import hashlib
+
+from almacen import Almacen, AlmacenBase
+
+MAGIA = b"KYRELB"
+FORMATO = 1
+# magia, formato, versión de marshal, longitud del contenido, SHA-256
+CABECERA = struct.Struct("<6sHHQ32s")
+
+
+class InstantaneaInvalida(Exception):
+    """La instantánea está dañada, incompleta o es de otra versión.
+
+    No deriva de ValueError a propósito: el almacén trata un JSON ilegible
+    como datos vacíos, pero una instantánea dañada no debe sobrescribirse.
+    """
+
+
+# ============================================================
+# FORMATO
+# ============================================================
+
+def escribir_instantanea(ruta, datos):
+    """Escribe `datos` en `ruta` en formato binario"""
+    contenido = marshal.dumps(datos, marshal.version)
+    cabecera = CABECERA.pack(MAGIA, FORMATO, marshal.version, len(contenido),
+                             hashlib.sha256(contenido).digest())
+    with open(ruta, 'wb') as f:
+        f.write(cabecera)
+        f.write(contenido)
+
+
+def leer_instantanea(ruta):
+    """Lee una instantánea verificando su cabecera y su hash"""
+    with open(ruta, 'rb') as f:
+        cabecera = f.read(CABECERA.size)
+        contenido = f.read()
+    if len(cabecera) < CABECERA.size:
+        raise InstantaneaInvalida(f"{ruta}: archivo incompleto")
+    magia, formato, version, longitud, resumen = CABECERA.unpack(cabecera)
+    if magia != MAGIA:
+        raise InstantaneaInvalida(f"{ruta}: no es una instantánea de KYREL")
+    if formato != FORMATO or version > marshal.version:
+        raise InstantaneaInvalida(
+            f"{ruta}: formato {formato}/marshal {version} no soportado; "
+            "vuelve a importarla desde JSON"
+        )
+    if len(contenido) != longitud or hashlib.sha256(contenido).digest() != resumen:
+        raise InstantaneaInvalida(f"{ruta}: el contenido no coincide con su hash (archivo dañado)")
+    try:
+        return marshal.loads(contenido)
+    except (ValueError, EOFError, TypeError) as e:
+        raise InstantaneaInvalida(f"{ruta}: {e}")
+
+
+# ============================================================
+# ALMACÉN
+# ============================================================
+
+class AlmacenBinario(Almacen):
+    """Almacén con diario cuyo punto de control es una instantánea binaria.
+
+    Las lecturas parciales en streaming de datos.json no aplican aquí: se
+    carga la instantánea completa, que es rápido.
+    """
+
+    def leer_archivo(self):
+        return leer_instantanea(self.ruta)
+
+    def escribir_archivo(self, ruta, datos):
+        escribir_instantanea(ruta, datos)
+
+    iterar = AlmacenBase.iterar
+    buscar = AlmacenBase.buscar
+    agregados = AlmacenBase.agregados
+    historico = AlmacenBase.historico
+
+
+# ============================================================
+# INTERCAMBIO CON JSON
+# ============================================================
+
+def exportar_json(origen, destino):
+    """Escribe en `destino` (JSON) los datos de la instantánea `origen`,
+    incluido su diario. Devuelve los datos exportados"""
+    binario = AlmacenBinario(origen)
+    with binario.bloqueo():
+        datos = binario.cargar()
+        Almacen(destino).escribir_completo(datos)
+    return datos
+
+
+def importar_json(origen, destino):
+    """Reemplaza la instantánea `destino` por los datos de `origen` (JSON,
+    incluido su diario). Devuelve los datos importados"""
+    binario = AlmacenBinario(destino)
+    with binario.bloqueo():
+        datos = Almacen(origen).cargar()
+        binario.escribir_completo(datos)
+    return datos
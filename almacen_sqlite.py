@@ -0,0 +1,433 @@
+"""
+KYREL - Almacén SQLite
+Backend alternativo a datos.json sobre una base SQLite (módulo sqlite3).
+
+Mantiene la misma copia en memoria que el almacén JSON para las pantallas,
+pero confirma cada grupo de cambios en una transacción y resuelve las
+consultas agregadas con SQL sobre columnas indexadas.
+"""
+
+import json
+import sqlite3
+
+import perfil
+from almacen import AlmacenBase, Almacen, ConflictoVersion, datos_vacios, version_datos, CLAVES
+from indices import PARTICIONES_FECHA
+
+# Columnas de cada tabla: (nombre, tipo). Los campos de un registro que no
+# estén aquí se guardan como JSON en la columna "extra".
+TABLAS = {
+    "productos": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("nombre", "TEXT NOT NULL"),
+        ("categoria", "TEXT NOT NULL"),
+        ("sede", "TEXT NOT NULL"),
+        ("cantidad", "INTEGER NOT NULL"),
+        ("precio", "REAL NOT NULL"),
+    ],
+    "ventas": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("fecha", "TEXT NOT NULL"),
+        ("cliente", "TEXT"),
+        ("producto_id", "INTEGER"),
+        ("cantidad", "INTEGER"),
+        ("total", "REAL NOT NULL"),
+        ("empleado_carnet", "TEXT"),
+    ],
+    "empleados": [
+        ("carnet", "TEXT PRIMARY KEY COLLATE NOCASE"),
+        ("nombre", "TEXT NOT NULL"),
+        ("sede", "TEXT NOT NULL"),
+        ("horas_trabajadas", "INTEGER"),
+        ("ventas_realizadas", "INTEGER"),
+    ],
+    "asistencias": [
+        ("fila", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("fecha", "TEXT NOT NULL"),
+        ("empleado_carnet", "TEXT NOT NULL"),
+        ("presente", "INTEGER NOT NULL"),
+    ],
+    "incapacidades": [
+        ("fila", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("empleado_carnet", "TEXT NOT NULL"),
+        ("fecha_inicio", "TEXT NOT NULL"),
+        # Sin fecha de fin: incapacidad abierta (como en el almacén JSON)
+        ("fecha_fin", "TEXT"),
+        ("motivo", "TEXT"),
+    ],
+    "movimientos": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("fecha", "TEXT NOT NULL"),
+        ("producto_id", "INTEGER NOT NULL"),
+        ("tipo", "TEXT NOT NULL"),
+        ("cantidad", "INTEGER NOT NULL"),
+        ("sede", "TEXT"),
+    ],
+}
+
+INDICES_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_productos_sede_categoria ON productos (sede, categoria)",
+    "CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas (fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_ventas_empleado ON ventas (empleado_carnet COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_asistencias_empleado ON asistencias (empleado_carnet)",
+    "CREATE INDEX IF NOT EXISTS idx_asistencias_fecha ON asistencias (fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_incapacidades_empleado ON incapacidades (empleado_carnet)",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_producto ON movimientos (producto_id)",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos (fecha)",
+]
+
+# Contadores de `configuracion` y la tabla AUTOINCREMENT de la que salen
+CONTADORES = {
+    "proximo_id_producto": "productos",
+    "proximo_id_venta": "ventas",
+    "proximo_id_movimiento": "movimientos",
+}
+
+# Columnas internas que no forman parte del registro
+COLUMNAS_INTERNAS = {"fila"}
+COLUMNAS_BOOLEANAS = {("asistencias", "presente")}
+
+
+def _columnas(tabla):
+    return [nombre for nombre, _ in TABLAS[tabla] if nombre not in COLUMNAS_INTERNAS]
+
+
+def _crear_tabla(conexion, tabla):
+    definicion = ", ".join(f"{nombre} {tipo}" for nombre, tipo in TABLAS[tabla])
+    conexion.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({definicion}, extra TEXT)")
+
+
+def crear_esquema(conexion):
+    """Crea las tablas e índices si no existen"""
+    for tabla in TABLAS:
+        _crear_tabla(conexion, tabla)
+    conexion.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT)")
+    _migrar_esquema(conexion)
+    for sentencia in INDICES_SQL:
+        conexion.execute(sentencia)
+
+
+def _migrar_esquema(conexion):
+    """Ajusta bases creadas con versiones anteriores del esquema"""
+    no_nulas = {fila[1]: fila[3] for fila in conexion.execute("PRAGMA table_info(incapacidades)")}
+    if no_nulas.get("fecha_fin"):
+        # fecha_fin era NOT NULL; SQLite no permite quitarlo sin recrear la tabla
+        conexion.execute("ALTER TABLE incapacidades RENAME TO incapacidades_anterior")
+        _crear_tabla(conexion, "incapacidades")
+        conexion.execute("INSERT INTO incapacidades SELECT * FROM incapacidades_anterior")
+        conexion.execute("DROP TABLE incapacidades_anterior")
+
+
+def _fila_a_registro(tabla, columnas, fila):
+    """Convierte una fila SQL al diccionario que usan las pantallas"""
+    registro = {}
+    for nombre, valor in zip(columnas, fila):
+        if valor is None:
+            continue
+        if (tabla, nombre) in COLUMNAS_BOOLEANAS:
+            valor = bool(valor)
+        registro[nombre] = valor
+    extra = fila[len(columnas)]
+    if extra:
+        registro.update(json.loads(extra))
+    return registro
+
+
+def _insertar_registro(conexion, tabla, registro):
+    """Inserta un registro; los campos sin columna van a `extra`"""
+    columnas = _columnas(tabla)
+    extra = {k: v for k, v in registro.items() if k not in columnas}
+    valores = [registro.get(c) for c in columnas]
+    valores.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+    marcas = ", ".join("?" * (len(columnas) + 1))
+    conexion.execute(
+        f"INSERT INTO {tabla} ({', '.join(columnas)}, extra) VALUES ({marcas})",
+        valores
+    )
+
+
+class AlmacenSQLite(AlmacenBase):
+    """Almacén sobre una base SQLite"""
+
+    def __init__(self, ruta):
+        super().__init__(ruta)
+        # Con varios terminales escribiendo, esperar el cerrojo en vez de fallar
+        self.conexion = sqlite3.connect(ruta, timeout=30)
+        crear_esquema(self.conexion)
+        self.conexion.commit()
+        # PRAGMA data_version cambia cuando otra conexión confirma cambios
+        self.version_sqlite = None
+
+    def _version_sqlite(self):
+        return self.conexion.execute("PRAGMA data_version").fetchone()[0]
+
+    def _version_meta(self):
+        """version_datos guardada en la base (0 si nunca se confirmó)"""
+        fila = self.conexion.execute("SELECT valor FROM meta WHERE clave = 'version_datos'").fetchone()
+        return int(fila[0]) if fila else 0
+
+    # --------------------------------------------------------
+    # Lectura
+    # --------------------------------------------------------
+
+    def cargar(self):
+        """Devuelve los datos, releyendo la base solo si otra conexión la cambió"""
+        version_sqlite = self._version_sqlite()
+        if self.datos is not None and version_sqlite == self.version_sqlite:
+            return self.datos
+
+        datos = datos_vacios()
+        with self.conexion:
+            # Una sola transacción de lectura: todas las tablas y version_datos
+            # corresponden al mismo estado confirmado
+            self.conexion.execute("BEGIN")
+            version_sqlite = self._version_sqlite()
+            for tabla in TABLAS:
+                columnas = _columnas(tabla)
+                orden = TABLAS[tabla][0][0]
+                cursor = self.conexion.execute(
+                    f"SELECT {', '.join(columnas)}, extra FROM {tabla} ORDER BY {orden}"
+                )
+                datos[tabla] = [_fila_a_registro(tabla, columnas, fila) for fila in cursor]
+
+            # Los próximos IDs salen de las secuencias AUTOINCREMENT
+            secuencias = dict(self.conexion.execute("SELECT name, seq FROM sqlite_sequence"))
+            version = self._version_meta()
+        for contador, tabla in CONTADORES.items():
+            datos["configuracion"][contador] = secuencias.get(tabla, 0) + 1
+        if version:
+            datos["configuracion"]["version_datos"] = version
+
+        self.datos = datos
+        self.version_sqlite = version_sqlite
+        self.pendientes = []
+        self.version += 1
+        return self.datos
+
+    def marca_datos(self):
+        """Valor que cambia siempre que cambian los datos, sin cargarlos"""
+        return (self._version_sqlite(), self.version)
+
+    def iterar(self, coleccion):
+        """Recorre una colección fila a fila sin cargar las demás"""
+        if self.datos is not None and self._version_sqlite() == self.version_sqlite:
+            return perfil.contar(iter(self.datos.get(coleccion, [])))
+        if coleccion not in TABLAS:
+            return iter([])
+        columnas = _columnas(coleccion)
+        orden = TABLAS[coleccion][0][0]
+        cursor = self.conexion.execute(
+            f"SELECT {', '.join(columnas)}, extra FROM {coleccion} ORDER BY {orden}"
+        )
+        return perfil.contar(_fila_a_registro(coleccion, columnas, fila) for fila in cursor)
+
+    def en_rango(self, coleccion, desde=None, hasta=None, particion=None):
+        """Registros entre dos fechas usando el índice por fecha de la tabla"""
+        if self.datos is not None and self._version_sqlite() == self.version_sqlite:
+            return super().en_rango(coleccion, desde, hasta, particion)
+        condiciones, parametros = [], []
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            # Mismo criterio que IndiceFechas: "2025-12" incluye todo el mes
+            condiciones.append("fecha <= ?")
+            parametros.append(hasta + "\uffff")
+        if particion is not None:
+            condiciones.append(f"{PARTICIONES_FECHA[coleccion]} = ? COLLATE NOCASE")
+            parametros.append(particion)
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        columnas = _columnas(coleccion)
+        cursor = self.conexion.execute(
+            f"SELECT {', '.join(columnas)}, extra FROM {coleccion} {donde} "
+            f"ORDER BY fecha, {TABLAS[coleccion][0][0]}",
+            parametros
+        )
+        return [_fila_a_registro(coleccion, columnas, fila) for fila in perfil.contar(cursor)]
+
+    def buscar(self, coleccion, clave):
+        """Registro por su clave primaria, consultando solo esa fila"""
+        if self.datos is not None and self._version_sqlite() == self.version_sqlite:
+            return super().buscar(coleccion, clave)
+        columnas = _columnas(coleccion)
+        fila = self.conexion.execute(
+            f"SELECT {', '.join(columnas)}, extra FROM {coleccion} WHERE {CLAVES[coleccion]} = ?",
+            (clave,)
+        ).fetchone()
+        return _fila_a_registro(coleccion, columnas, fila) if fila else None
+
+    # --------------------------------------------------------
+    # Escritura
+    # --------------------------------------------------------
+
+    def guardar(self, datos):
+        """Confirma los cambios en una sola transacción.
+
+        Con cambios anotados sobre la copia vigente se aplican solo esas
+        operaciones; en otro caso se reemplaza el contenido completo.
+
+        La transacción toma el cerrojo de escritura de entrada (BEGIN
+        IMMEDIATE); si otra conexión confirmó desde que se leyeron los datos
+        (para un diccionario ajeno, si la versión de la base es posterior a
+        la suya) se descarta la copia en memoria y se lanza ConflictoVersion
+        para que el llamador reaplique la operación.
+        """
+        # Si otra conexión confirmó desde nuestra última lectura, la copia en
+        # memoria queda desactualizada tras confirmar: se releerá completa
+        ajena = self._version_sqlite() != self.version_sqlite
+        try:
+            with self.conexion:
+                self.conexion.execute("BEGIN IMMEDIATE")
+                self._verificar_version(datos)
+                if datos is self.datos and self.pendientes:
+                    for op in self.pendientes:
+                        self._aplicar(op)
+                else:
+                    self._reemplazar_todo(datos)
+                config = datos.setdefault("configuracion", {})
+                config["version_datos"] = config.get("version_datos", 0) + 1
+                self.conexion.execute(
+                    "INSERT OR REPLACE INTO meta (clave, valor) VALUES ('version_datos', ?)",
+                    (str(config["version_datos"]),)
+                )
+        except (sqlite3.Error, ConflictoVersion):
+            self.invalidar()
+            raise
+
+        self.datos = datos
+        self.pendientes = []
+        # Nuestros propios cambios no alteran data_version
+        self.version_sqlite = self._version_sqlite()
+        self.version += 1
+        if ajena:
+            self.invalidar()
+
+    def _verificar_version(self, datos):
+        """Lanza ConflictoVersion si la base tiene confirmaciones que `datos`
+        no incluye (dentro de la transacción de escritura)"""
+        en_base = self._version_meta()
+        if datos is self.datos:
+            conflicto = en_base != version_datos(datos)
+        else:
+            conflicto = en_base > version_datos(datos)
+        if conflicto:
+            raise ConflictoVersion(
+                f"{self.ruta} fue modificada por otra conexión "
+                f"después de la versión {version_datos(datos)}"
+            )
+
+    def _aplicar(self, op):
+        """Traduce una operación anotada a SQL"""
+        tipo = op["op"]
+        if tipo == "insertar":
+            _insertar_registro(self.conexion, op["coleccion"], op["registro"])
+        elif tipo == "stock":
+            # Se aplica el delta para no pisar cambios concurrentes
+            self.conexion.execute(
+                "UPDATE productos SET cantidad = cantidad + ? WHERE id = ?",
+                (op["delta"], op["producto_id"])
+            )
+        elif tipo == "actualizar":
+            tabla = op["coleccion"]
+            clave = CLAVES[tabla]
+            columnas = _columnas(tabla)
+            campos = {k: v for k, v in op["campos"].items() if k in columnas}
+            extra = {k: v for k, v in op["campos"].items() if k not in columnas}
+            if campos:
+                asignaciones = ", ".join(f"{c} = ?" for c in campos)
+                self.conexion.execute(
+                    f"UPDATE {tabla} SET {asignaciones} WHERE {clave} = ?",
+                    list(campos.values()) + [op["clave"]]
+                )
+            if extra:
+                fila = self.conexion.execute(
+                    f"SELECT extra FROM {tabla} WHERE {clave} = ?", (op["clave"],)
+                ).fetchone()
+                actual = json.loads(fila[0]) if fila and fila[0] else {}
+                actual.update(extra)
+                self.conexion.execute(
+                    f"UPDATE {tabla} SET extra = ? WHERE {clave} = ?",
+                    (json.dumps(actual, ensure_ascii=False), op["clave"])
+                )
+        # "config": los contadores son las secuencias AUTOINCREMENT
+
+    def _reemplazar_todo(self, datos):
+        """Reescribe todas las tablas con el contenido de `datos`"""
+        for tabla in TABLAS:
+            self.conexion.execute(f"DELETE FROM {tabla}")
+            for registro in datos.get(tabla, []):
+                _insertar_registro(self.conexion, tabla, registro)
+        # Las secuencias deben quedar donde indica `configuracion`
+        config = datos.get("configuracion", {})
+        for contador, tabla in CONTADORES.items():
+            if contador in config:
+                self.conexion.execute("DELETE FROM sqlite_sequence WHERE name = ?", (tabla,))
+                self.conexion.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                    (tabla, max(config[contador] - 1, 0))
+                )
+
+    def invalidar(self):
+        """Descarta la copia en memoria; la próxima lectura irá a la base"""
+        self.datos = None
+        self.version_sqlite = None
+        self.pendientes = []
+        self._indices = None
+
+    # --------------------------------------------------------
+    # Consultas agregadas (resueltas en SQL)
+    # --------------------------------------------------------
+
+    def unidades_por_sede(self):
+        """Unidades en stock por sede"""
+        return dict(self.conexion.execute(
+            "SELECT sede, SUM(cantidad) FROM productos GROUP BY sede ORDER BY MIN(id)"
+        ))
+
+    def unidades_por_categoria(self):
+        """Unidades en stock por categoría"""
+        return dict(self.conexion.execute(
+            "SELECT categoria, SUM(cantidad) FROM productos GROUP BY categoria"
+        ))
+
+    def total_ventas_dia(self, fecha):
+        """Monto vendido en una fecha (AAAA-MM-DD)"""
+        fila = self.conexion.execute(
+            "SELECT COALESCE(SUM(total), 0) FROM ventas WHERE fecha = ?", (fecha,)
+        ).fetchone()
+        return fila[0]
+
+    def total_ventas_empleado(self, carnet):
+        """Monto vendido por un empleado"""
+        fila = self.conexion.execute(
+            "SELECT COALESCE(SUM(total), 0) FROM ventas WHERE empleado_carnet = ? COLLATE NOCASE",
+            (carnet,)
+        ).fetchone()
+        return fila[0]
+
+
+class BaseNoVacia(Exception):
+    """La base de destino de una migración ya tiene datos"""
+
+
+def migrar_desde_json(ruta_json, ruta_sqlite, reemplazar=False):
+    """Copia datos.json (con su diario) a una base SQLite nueva o vacía.
+
+    Si la base ya tiene datos lanza BaseNoVacia, salvo con `reemplazar`,
+    que sustituye su contenido por el de datos.json.
+    """
+    datos = Almacen(ruta_json).cargar()
+    almacen = AlmacenSQLite(ruta_sqlite)
+    with almacen.bloqueo():
+        en_base = almacen._version_meta()
+        ocupadas = [t for t in TABLAS if almacen.conexion.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone()]
+        if (en_base or ocupadas) and not reemplazar:
+            raise BaseNoVacia(
+                f"{ruta_sqlite} ya tiene datos ({', '.join(ocupadas) or f'versión {en_base}'}); "
+                "usa --reemplazar para sustituirlos"
+            )
+        config = datos.setdefault("configuracion", {})
+        # Al reemplazar, la copia pasa a ser posterior a lo que haya en la base
+        config["version_datos"] = max(version_datos(datos), en_base)
+        almacen.guardar(datos)
+    return {tabla: len(datos.get(tabla, [])) for tabla in TABLAS}
@@ -0,0 +1,258 @@
+"""
+KYREL - Analítica de Ventas
+Métricas del módulo de ventas calculadas en una sola pasada sobre `ventas`
+(o vectorizadas sobre la vista columnar cuando NumPy está disponible). Los
+meses archivados (ver historico.py) se suman desde sus resúmenes.
+"""
+
+import heapq
+from datetime import date, timedelta
+
+import columnar
+from agregados import es_inicio_factura
+
+TOP_PRODUCTOS = 4
+
+
+def variacion_porcentual(actual, anterior):
+    """Variación de `actual` respecto a `anterior` en %, o None si no hay base"""
+    if not anterior:
+        return None
+    return (actual - anterior) / anterior * 100
+
+
+def _resumen_dia(fecha, acumulado, nuevos):
+    total, facturas, unidades = acumulado or (0.0, 0, 0)
+    return {
+        "fecha": fecha,
+        "total": round(total, 2),
+        "facturas": facturas,
+        "unidades": unidades,
+        "nuevos_clientes": nuevos
+    }
+
+
+def _sumar_historico(historico, por_dia, por_mes, por_producto, primera_compra, clave_dia=str):
+    """Suma los resúmenes de meses archivados a los acumuladores; devuelve
+    (total, facturas, unidades) de esos meses"""
+    total = facturas = unidades = 0
+    for mes in historico:
+        ventas = mes["ventas"]
+        for fecha, (monto, n, u) in ventas["por_dia"].items():
+            acumulado = por_dia.setdefault(clave_dia(fecha), [0.0, 0, 0])
+            acumulado[0] += monto
+            acumulado[1] += n
+            acumulado[2] += u
+            por_mes[fecha[:7]] = por_mes.get(fecha[:7], 0.0) + monto
+        for producto_id, ingresos, u in ventas["por_producto"]:
+            producto = por_producto.setdefault(producto_id, [0.0, 0])
+            producto[0] += ingresos
+            producto[1] += u
+        for cliente, fecha in ventas["primeras_compras"].items():
+            anterior = primera_compra.get(cliente)
+            if anterior is None or fecha < anterior:
+                primera_compra[cliente] = fecha
+        total += ventas["total"]
+        facturas += ventas["facturas"]
+        unidades += ventas["unidades"]
+    return total, facturas, unidades
+
+
+def analizar_ventas(ventas, hoy, top_n=TOP_PRODUCTOS, historico=()):
+    """Calcula las métricas de ventas recorriendo `ventas` una sola vez.
+
+    `ventas` puede ser cualquier iterable (lista o generador) y `hoy` una
+    fecha AAAA-MM-DD; `historico`, los resúmenes de los meses archivados.
+    Devuelve un diccionario reutilizable por las pantallas.
+    """
+    ayer = (date.fromisoformat(hoy) - timedelta(days=1)).isoformat()
+
+    por_dia = {}          # fecha -> [total, facturas, unidades]
+    por_mes = {}          # AAAA-MM -> total
+    por_producto = {}     # producto_id -> [ingresos, unidades]
+    primera_compra = {}   # cliente -> primera fecha
+    total_general, facturas, unidades_total = _sumar_historico(
+        historico, por_dia, por_mes, por_producto, primera_compra
+    )
+
+    for venta in ventas:
+        fecha = venta["fecha"]
+        monto = venta["total"]
+        cantidad = venta.get("cantidad", 0)
+
+        acumulado = por_dia.get(fecha)
+        if acumulado is None:
+            acumulado = por_dia[fecha] = [0.0, 0, 0]
+        acumulado[0] += monto
+        inicio = 1 if es_inicio_factura(venta) else 0
+        acumulado[1] += inicio
+        acumulado[2] += cantidad
+
+        mes = fecha[:7]
+        por_mes[mes] = por_mes.get(mes, 0.0) + monto
+
+        producto = por_producto.get(venta.get("producto_id"))
+        if producto is None:
+            producto = por_producto[venta.get("producto_id")] = [0.0, 0]
+        producto[0] += monto
+        producto[1] += cantidad
+
+        cliente = (venta.get("cliente") or "").strip().casefold()
+        if cliente:
+            anterior = primera_compra.get(cliente)
+            if anterior is None or fecha < anterior:
+                primera_compra[cliente] = fecha
+
+        total_general += monto
+        facturas += inicio
+        unidades_total += cantidad
+
+    # Clientes nuevos: su primera compra fue ese día
+    nuevos = {hoy: 0, ayer: 0}
+    for fecha in primera_compra.values():
+        if fecha in nuevos:
+            nuevos[fecha] += 1
+
+    top = heapq.nlargest(top_n, por_producto.items(), key=lambda item: item[1][0])
+
+    mes_actual = hoy[:7]
+    mes_anterior = (date.fromisoformat(hoy).replace(day=1) - timedelta(days=1)).isoformat()[:7]
+    resumen_hoy = _resumen_dia(hoy, por_dia.get(hoy), nuevos[hoy])
+    resumen_ayer = _resumen_dia(ayer, por_dia.get(ayer), nuevos[ayer])
+
+    return {
+        "hoy": resumen_hoy,
+        "ayer": resumen_ayer,
+        "variacion_dia": {
+            campo: variacion_porcentual(resumen_hoy[campo], resumen_ayer[campo])
+            for campo in ("total", "facturas", "unidades", "nuevos_clientes")
+        },
+        "total_general": round(total_general, 2),
+        "facturas": facturas,
+        "unidades": unidades_total,
+        "clientes": len(primera_compra),
+        "mes_actual": round(por_mes.get(mes_actual, 0.0), 2),
+        "mes_anterior": round(por_mes.get(mes_anterior, 0.0), 2),
+        "variacion_mes": variacion_porcentual(por_mes.get(mes_actual, 0.0), por_mes.get(mes_anterior, 0.0)),
+        "por_mes": {mes: round(total, 2) for mes, total in sorted(por_mes.items())},
+        "por_dia": {
+            fecha: {"total": round(t, 2), "facturas": n, "unidades": u}
+            for fecha, (t, n, u) in sorted(por_dia.items())
+        },
+        "top_productos": [
+            {"producto_id": pid, "ingresos": round(ingresos, 2), "unidades": unidades}
+            for pid, (ingresos, unidades) in top
+        ],
+    }
+
+
+def analizar_ventas_columnar(tabla, hoy, top_n=TOP_PRODUCTOS, historico=()):
+    """Mismo resultado que `analizar_ventas`, vectorizado con NumPy sobre
+    una vista columnar de ventas (ver columnar.ventas_columnar)"""
+    np = columnar.np
+    fecha = tabla.columna("fecha")
+    total = tabla.columna("total")
+    cantidad = tabla.columna("cantidad")
+    # Las líneas de una misma factura cuentan como una sola factura
+    inicio = tabla.columna("factura") == tabla.columna("id")
+    hoy_entero = columnar.fecha_a_entero(hoy)
+    ayer = (date.fromisoformat(hoy) - timedelta(days=1)).isoformat()
+    ayer_entero = columnar.fecha_a_entero(ayer)
+
+    # Por día y por mes: bincount suma en el orden de las filas
+    dias, por_dia_idx = np.unique(fecha, return_inverse=True)
+    total_dia = np.bincount(por_dia_idx, weights=total, minlength=len(dias))
+    facturas_dia = np.bincount(por_dia_idx, weights=inicio, minlength=len(dias))
+    unidades_dia = np.bincount(por_dia_idx, weights=cantidad, minlength=len(dias))
+    por_dia = {
+        int(d): [total_dia[i].item(), int(facturas_dia[i]), int(unidades_dia[i])]
+        for i, d in enumerate(dias)
+    }
+    meses, por_mes_idx = np.unique(fecha // 100, return_inverse=True)
+    total_mes = np.bincount(por_mes_idx, weights=total, minlength=len(meses))
+    por_mes = {f"{int(m) // 100:04d}-{int(m) % 100:02d}": total_mes[i].item() for i, m in enumerate(meses)}
+
+    # Por producto
+    productos, por_producto_idx = np.unique(tabla.columna("producto_id"), return_inverse=True)
+    ingresos = np.bincount(por_producto_idx, weights=total, minlength=len(productos))
+    unidades = np.bincount(por_producto_idx, weights=cantidad, minlength=len(productos))
+    por_producto = {
+        None if pid == -1 else int(pid): [ingresos[i].item(), int(unidades[i])]
+        for i, pid in enumerate(productos)
+    }
+
+    # Primera compra de cada cliente
+    clientes = tabla.columna("cliente")
+    con_cliente = clientes >= 0
+    primera = np.full(len(tabla.categorias["cliente"]), np.iinfo(fecha.dtype).max, dtype=fecha.dtype)
+    np.minimum.at(primera, clientes[con_cliente], fecha[con_cliente])
+
+    # Meses archivados: los clientes que ya compraron antes adelantan su
+    # primera compra; los que no aparecen en las ventas activas se cuentan aparte
+    primera_archivada = {}
+    archivado = _sumar_historico(historico, por_dia, por_mes, por_producto, primera_archivada,
+                                 columnar.fecha_a_entero)
+    solo_archivados = []
+    for cliente, fecha_texto in primera_archivada.items():
+        codigo = tabla.codigo("cliente", cliente)
+        entero = columnar.fecha_a_entero(fecha_texto)
+        if codigo is None:
+            solo_archivados.append(entero)
+        elif entero < primera[codigo]:
+            primera[codigo] = entero
+    top = heapq.nlargest(top_n, por_producto.items(), key=lambda item: item[1][0])
+
+    def resumen_dia(fecha_texto, entero):
+        nuevos = int(np.count_nonzero(primera == entero)) + solo_archivados.count(entero)
+        return _resumen_dia(fecha_texto, por_dia.get(entero), nuevos)
+
+    mes_actual = hoy[:7]
+    mes_anterior = (date.fromisoformat(hoy).replace(day=1) - timedelta(days=1)).isoformat()[:7]
+    resumen_hoy = resumen_dia(hoy, hoy_entero)
+    resumen_ayer = resumen_dia(ayer, ayer_entero)
+
+    return {
+        "hoy": resumen_hoy,
+        "ayer": resumen_ayer,
+        "variacion_dia": {
+            campo: variacion_porcentual(resumen_hoy[campo], resumen_ayer[campo])
+            for campo in ("total", "facturas", "unidades", "nuevos_clientes")
+        },
+        "total_general": round(float(total.sum()) + archivado[0], 2),
+        "facturas": int(np.count_nonzero(inicio)) + archivado[1],
+        "unidades": int(cantidad.sum()) + archivado[2],
+        "clientes": len(primera) + len(solo_archivados),
+        "mes_actual": round(por_mes.get(mes_actual, 0.0), 2),
+        "mes_anterior": round(por_mes.get(mes_anterior, 0.0), 2),
+        "variacion_mes": variacion_porcentual(por_mes.get(mes_actual, 0.0), por_mes.get(mes_anterior, 0.0)),
+        "por_mes": {mes: round(t, 2) for mes, t in sorted(por_mes.items())},
+        "por_dia": {
+            columnar.entero_a_fecha(d): {"total": round(t, 2), "facturas": n, "unidades": u}
+            for d, (t, n, u) in sorted(por_dia.items())
+        },
+        "top_productos": [
+            {"producto_id": pid, "ingresos": round(i, 2), "unidades": u}
+            for pid, (i, u) in top
+        ],
+    }
+
+
+_cache = {}
+
+def resumen_ventas(almacen, hoy, top_n=TOP_PRODUCTOS):
+    """Métricas de ventas del almacén, recalculadas solo si cambiaron los datos.
+
+    Con NumPy disponible se calculan sobre la vista columnar de ventas, que
+    se extiende con las ventas nuevas en lugar de reconstruirse (ver
+    benchmarks/analitica.py).
+    """
+    clave = (almacen.marca_datos(), hoy, top_n)
+    if _cache.get("clave") != clave:
+        historico = list(almacen.historico().get("meses", {}).values())
+        if columnar.np is not None:
+            resumen = analizar_ventas_columnar(columnar.vista_ventas(almacen), hoy, top_n, historico)
+        else:
+            resumen = analizar_ventas(almacen.iterar("ventas"), hoy, top_n, historico)
+        _cache["clave"] = clave
+        _cache["resumen"] = resumen
+    return _cache["resumen"]
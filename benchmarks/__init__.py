@@ -0,0 +1,5 @@
+"""
+KYREL - Benchmarks
+Scripts de carga y rendimiento. Se ejecutan como módulos desde la raíz del
+proyecto, p. ej. `python -m benchmarks.estres_concurrencia`.
+"""
@@ -0,0 +1,95 @@
+"""
+KYREL - Rendimiento de la Analítica de Ventas
+Tiempo de las métricas de ventas_dashboard después de un cambio en los datos,
+por cada forma de calcularlas:
+
+    recorrido           una pasada en Python sobre las ventas (analizar_ventas)
+    columnar completo   vista columnar reconstruida + cálculo vectorizado
+    columnar tras venta la vista extendida con la venta nueva + cálculo
+                        vectorizado (lo que hace resumen_ventas con NumPy)
+
+La venta de cada repetición se confirma fuera del tiempo medido. Comprueba
+además que el cálculo vectorizado dé el mismo resultado que el recorrido.
+Requiere NumPy.
+
+Uso:
+    python -m benchmarks.analitica --ventas 10000 100000 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import funciones
+import analitica
+import columnar
+from benchmarks.generador import escala, generar_archivo
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def vender_una(carnet, producto_id):
+    """Confirma una venta (y stock para ella) sin medirla"""
+    funciones.ejecutar(funciones.mover_stock, producto_id, "Entrada", 1)
+    funciones.ejecutar(funciones.vender, "Cliente de prueba", carnet, producto_id, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYREL - Analítica de ventas: recorrido vs columnar")
+    parser.add_argument("--ventas", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if columnar.np is None:
+        print("NumPy no está instalado: solo se usa el recorrido en Python")
+        return 1
+
+    os.environ["KYREL_SERVIDOR"] = "no"
+    errores = 0
+    print(f"{'Ventas':>10}  {'Recorrido':>10} {'Col. completo':>14} {'Col. tras venta':>16}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for ventas in args.ventas:
+            ruta = os.path.join(directorio, f"datos_{ventas}.json")
+            datos = generar_archivo(ruta, **escala(ventas))
+            carnet = datos["empleados"][0]["carnet"]
+            producto_id = datos["productos"][0]["id"]
+            del datos
+            funciones.BACKEND = "json"
+            funciones.DATOS_FILE = ruta
+            funciones._almacen = None
+            almacen = funciones.obtener_almacen()
+            hoy = funciones.fecha_hoy()
+            almacen.cargar()
+            columnar.vista_ventas(almacen)
+
+            recorrido = completo = incremental = float("inf")
+            for _ in range(args.repeticiones):
+                vender_una(carnet, producto_id)
+                segundos, vectorizado = cronometrar(lambda: analitica.analizar_ventas_columnar(
+                    columnar.vista_ventas(almacen), hoy))
+                incremental = min(incremental, segundos)
+                segundos, esperado = cronometrar(lambda: analitica.analizar_ventas(
+                    almacen.iterar("ventas"), hoy))
+                recorrido = min(recorrido, segundos)
+                segundos, _ = cronometrar(lambda: analitica.analizar_ventas_columnar(
+                    columnar.ventas_columnar(almacen.iterar("ventas")), hoy))
+                completo = min(completo, segundos)
+                if vectorizado != esperado:
+                    errores += 1
+
+            print(f"{ventas:>10,}  {recorrido * 1000:>8.1f}ms {completo * 1000:>12.1f}ms "
+                  f"{incremental * 1000:>14.1f}ms")
+    if errores:
+        print(f"ERROR: {errores} resultado(s) vectorizados distintos del recorrido")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
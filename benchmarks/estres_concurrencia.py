@@ -0,0 +1,140 @@
+"""
+KYREL - Estrés de Concurrencia
+Lanza N procesos que hacen entradas y salidas de stock al mismo tiempo sobre
+una copia de datos.json (o de la base SQLite) y comprueba que no se pierde
+ninguna actualización: el stock final de cada producto debe ser el inicial
+más las entradas menos las salidas registradas, los IDs de movimiento no
+deben repetirse y ninguna entrada (siempre válida) debe ser rechazada.
+
+Uso:
+    python -m benchmarks.estres_concurrencia --procesos 4 --operaciones 200
+    python -m benchmarks.estres_concurrencia --backend sqlite
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+import funciones
+from almacen import Almacen
+from almacen_sqlite import migrar_desde_json
+
+
+def preparar(directorio, origen, backend):
+    """Copia los datos de origen al directorio de trabajo"""
+    destino = os.path.join(directorio, "datos.json")
+    shutil.copy(origen, destino)
+    if backend == "sqlite":
+        migrar_desde_json(destino, os.path.join(directorio, "datos.db"))
+
+
+def configurar(directorio, backend):
+    """Apunta funciones al directorio de trabajo (en cada proceso)"""
+    funciones.BACKEND = backend
+    funciones.DATOS_FILE = os.path.join(directorio, "datos.json")
+    funciones.SQLITE_FILE = os.path.join(directorio, "datos.db")
+    funciones._almacen = None
+
+
+def trabajador(directorio, backend, operaciones, productos, semilla):
+    """Hace `operaciones` entradas/salidas al azar; devuelve (hechas,
+    rechazadas, entradas rechazadas)"""
+    configurar(directorio, backend)
+    azar = random.Random(semilla)
+    hechas = rechazadas = entradas_rechazadas = 0
+    for _ in range(operaciones):
+        tipo = azar.choice(("Entrada", "Salida"))
+        try:
+            funciones.ejecutar(funciones.mover_stock, azar.choice(productos), tipo, azar.randint(1, 3))
+            hechas += 1
+        except funciones.OperacionInvalida:
+            # Sin stock para la salida; una entrada solo se rechaza si se
+            # perdió ante otros terminales, lo que no debe pasar
+            rechazadas += 1
+            if tipo == "Entrada":
+                entradas_rechazadas += 1
+    return hechas, rechazadas, entradas_rechazadas
+
+
+def verificar(datos, inicial, movimientos_iniciales):
+    """Lista de errores: stock que no cuadra con los movimientos nuevos o IDs repetidos"""
+    errores = []
+    esperado = dict(inicial)
+    for mov in datos["movimientos"][movimientos_iniciales:]:
+        signo = 1 if mov["tipo"] == "Entrada" else -1
+        esperado[mov["producto_id"]] += signo * mov["cantidad"]
+    for producto in datos["productos"]:
+        if producto["cantidad"] != esperado[producto["id"]]:
+            errores.append(
+                f"Producto #{producto['id']}: stock {producto['cantidad']}, "
+                f"esperado {esperado[producto['id']]}"
+            )
+        if producto["cantidad"] < 0:
+            errores.append(f"Producto #{producto['id']}: stock negativo")
+    ids = [mov["id"] for mov in datos["movimientos"]]
+    if len(ids) != len(set(ids)):
+        errores.append(f"{len(ids) - len(set(ids))} ID(s) de movimiento repetidos")
+    return errores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYREL - Estrés de escrituras concurrentes")
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--operaciones", type=int, default=200, help="Operaciones por proceso")
+    parser.add_argument("--productos", type=int, default=3, help="Productos distintos a modificar (más conflictos con menos)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--datos", default=funciones.DATOS_FILE, help="datos.json de origen")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        preparar(directorio, args.datos, args.backend)
+        configurar(directorio, args.backend)
+        datos = funciones.cargar_datos()
+        inicial = {p["id"]: p["cantidad"] for p in datos["productos"]}
+        movimientos_iniciales = len(datos["movimientos"])
+        productos = sorted(inicial)[:args.productos]
+
+        inicio = time.perf_counter()
+        with multiprocessing.Pool(args.procesos) as pool:
+            resultados = pool.starmap(trabajador, [
+                (directorio, args.backend, args.operaciones, productos, semilla)
+                for semilla in range(args.procesos)
+            ])
+        segundos = time.perf_counter() - inicio
+
+        hechas = sum(h for h, _, _ in resultados)
+        rechazadas = sum(r for _, r, _ in resultados)
+        entradas_rechazadas = sum(e for _, _, e in resultados)
+        funciones._almacen = None
+        datos = funciones.cargar_datos()
+        errores = verificar(datos, inicial, movimientos_iniciales)
+        if entradas_rechazadas:
+            errores.append(f"{entradas_rechazadas} entrada(s) válidas rechazadas")
+        if len(datos["movimientos"]) - movimientos_iniciales != hechas:
+            errores.append(f"{hechas} operaciones confirmadas pero "
+                           f"{len(datos['movimientos']) - movimientos_iniciales} movimientos nuevos")
+        if args.backend == "json":
+            # El snapshot consolidado debe coincidir con la reproducción del diario
+            funciones.consolidar_datos()
+            errores += verificar(Almacen(funciones.DATOS_FILE).cargar(), inicial, movimientos_iniciales)
+
+    print(f"Backend: {args.backend}  procesos: {args.procesos}  operaciones/proceso: {args.operaciones}")
+    print(f"  Confirmadas: {hechas}  rechazadas: {rechazadas}  en {segundos:.2f} s "
+          f"({hechas / segundos if segundos else 0:,.0f} ops/s)")
+    print(f"  Movimientos nuevos: {len(datos['movimientos']) - movimientos_iniciales}")
+    if errores:
+        print("ERROR: se perdieron actualizaciones o se rechazaron operaciones válidas")
+        for error in errores:
+            print(f"  {error}")
+        return 1
+    print("OK: el stock final cuadra con los movimientos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+KYREL - Rendimiento de Facturación
+Facturas por segundo con historiales de ventas de distintos tamaños:
+
+    por línea       cada línea se guarda reescribiendo el archivo completo
+    por factura     una confirmación en el diario por factura (ejecutar)
+    agrupada        varias facturas por confirmación (ejecutar_lote, como
+                    hace el servidor con ventas casi simultáneas)
+
+Uso:
+    python -m benchmarks.facturas --historial 10000 100000 --facturas 500
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import funciones
+from almacen import Almacen
+
+
+def generar_historial(origen, destino, ventas):
+    """Copia de `origen` con `ventas` ventas (y sus movimientos) sintéticas
+    y stock de sobra para facturar"""
+    with open(origen, 'r', encoding='utf-8') as f:
+        datos = json.load(f)
+    azar = random.Random(0)
+    productos = datos["productos"]
+    carnets = [e["carnet"] for e in datos["empleados"]]
+    for producto in productos:
+        producto["cantidad"] = 10 ** 9
+    datos["ventas"] = []
+    datos["movimientos"] = []
+    for i in range(1, ventas + 1):
+        producto = azar.choice(productos)
+        cantidad = azar.randint(1, 3)
+        fecha = f"2025-{azar.randint(1, 12):02d}-{azar.randint(1, 28):02d}"
+        datos["ventas"].append({
+            "id": i, "fecha": fecha, "cliente": f"Cliente {azar.randint(1, ventas // 3 + 1)}",
+            "producto_id": producto["id"], "cantidad": cantidad,
+            "total": round(cantidad * producto["precio"], 2), "empleado_carnet": azar.choice(carnets),
+        })
+        datos["movimientos"].append({
+            "id": i, "producto_id": producto["id"], "fecha": fecha,
+            "tipo": "Venta", "cantidad": cantidad, "sede": producto["sede"],
+        })
+    config = datos.setdefault("configuracion", {})
+    config["proximo_id_venta"] = ventas + 1
+    config["proximo_id_movimiento"] = ventas + 1
+    datos.pop("agregados", None)
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+
+
+def facturas_al_azar(datos, cantidad, lineas, semilla=1):
+    azar = random.Random(semilla)
+    ids = [p["id"] for p in datos["productos"]]
+    carnets = [e["carnet"] for e in datos["empleados"]]
+    return [
+        ("Cliente", azar.choice(carnets), [(pid, azar.randint(1, 3)) for pid in azar.sample(ids, lineas)])
+        for _ in range(cantidad)
+    ]
+
+
+def por_linea(facturas):
+    """Como antes de las facturas: cada línea es una venta guardada con una
+    reescritura completa del archivo"""
+    almacen = funciones.obtener_almacen()
+    for cliente, carnet, lineas in facturas:
+        for producto_id, cantidad in lineas:
+            datos = almacen.cargar()
+            funciones.vender(datos, cliente, carnet, producto_id, cantidad)
+            almacen.pendientes = []
+            almacen.escribir_completo(datos)
+
+
+def por_factura(facturas):
+    for cliente, carnet, lineas in facturas:
+        funciones.ejecutar(funciones.vender_factura, cliente, carnet, lineas)
+
+
+def agrupada(facturas, lote):
+    for i in range(0, len(facturas), lote):
+        llamadas = [(funciones.vender_factura, factura, {}) for factura in facturas[i:i + lote]]
+        for resultado in funciones.ejecutar_lote(llamadas):
+            if isinstance(resultado, funciones.OperacionInvalida):
+                raise resultado
+
+
+def medir(directorio, plantilla, funcion, facturas, *args):
+    """Segundos de `funcion` sobre una copia nueva de la plantilla"""
+    for nombre in os.listdir(directorio):
+        os.remove(os.path.join(directorio, nombre))
+    shutil.copy(plantilla, os.path.join(directorio, "datos.json"))
+    funciones.DATOS_FILE = os.path.join(directorio, "datos.json")
+    funciones.BACKEND = "json"
+    funciones._almacen = None
+    funciones.cargar_datos()
+    inicio = time.perf_counter()
+    funcion(facturas, *args)
+    segundos = time.perf_counter() - inicio
+    ventas = len(Almacen(funciones.DATOS_FILE).cargar()["ventas"])
+    return segundos, ventas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYREL - Facturas por segundo")
+    parser.add_argument("--historial", type=int, nargs="+", default=[10000, 100000], help="Ventas previas")
+    parser.add_argument("--facturas", type=int, default=500)
+    parser.add_argument("--lineas", type=int, default=3, help="Productos por factura")
+    parser.add_argument("--lote", type=int, default=16, help="Facturas por confirmación agrupada")
+    parser.add_argument("--por-linea", type=int, default=5, help="Facturas a medir reescribiendo el archivo (es lento)")
+    parser.add_argument("--datos", default=funciones.DATOS_FILE, help="datos.json de origen")
+    args = parser.parse_args(argv)
+
+    os.environ["KYREL_SERVIDOR"] = "no"
+    with tempfile.TemporaryDirectory() as base:
+        plantilla = os.path.join(base, "plantilla.json")
+        trabajo = os.path.join(base, "trabajo")
+        os.mkdir(trabajo)
+        for historial in args.historial:
+            generar_historial(args.datos, plantilla, historial)
+            with open(plantilla, 'r', encoding='utf-8') as f:
+                facturas = facturas_al_azar(json.load(f), args.facturas, args.lineas)
+
+            print(f"Historial: {historial:,} ventas  ({os.path.getsize(plantilla) / 1e6:.1f} MB), "
+                  f"{args.lineas} líneas por factura")
+            pruebas = [
+                ("por línea", por_linea, facturas[:args.por_linea], ()),
+                ("por factura", por_factura, facturas, ()),
+                (f"agrupada ({args.lote})", agrupada, facturas, (args.lote,)),
+            ]
+            for nombre, funcion, lote, extra in pruebas:
+                segundos, ventas = medir(trabajo, plantilla, funcion, lote, *extra)
+                esperadas = historial + len(lote) * args.lineas
+                estado = "" if ventas == esperadas else f"  ERROR: {ventas} ventas, esperadas {esperadas}"
+                print(f"  {nombre:<16} {len(lote):>6} facturas en {segundos:7.2f} s  "
+                      f"({len(lote) / segundos if segundos else 0:>9,.1f} facturas/s){estado}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+KYREL - Rendimiento de Formatos
+Tiempo de guardado (punto de control completo) y de carga en frío de
+datos.json frente a la instantánea binaria, con 10k, 100k y 1M ventas.
+
+Uso:
+    python -m benchmarks.formatos
+    python -m benchmarks.formatos --ventas 10000 100000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import funciones
+from almacen import Almacen
+from almacen_binario import AlmacenBinario
+from benchmarks.facturas import generar_historial
+
+FORMATOS = [("JSON", Almacen, "datos.json"), ("binario", AlmacenBinario, "datos.bin")]
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYREL - Carga y guardado JSON vs binario")
+    parser.add_argument("--ventas", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--datos", default=funciones.DATOS_FILE, help="datos.json de origen")
+    args = parser.parse_args(argv)
+
+    print(f"{'Ventas':>10}  {'Formato':<8} {'Tamaño':>10} {'Guardar':>9} {'Cargar':>9}")
+    with tempfile.TemporaryDirectory() as directorio:
+        plantilla = os.path.join(directorio, "plantilla.json")
+        for ventas in args.ventas:
+            generar_historial(args.datos, plantilla, ventas)
+            datos = Almacen(plantilla).cargar()
+            for nombre, clase, archivo in FORMATOS:
+                ruta = os.path.join(directorio, archivo)
+                guardar, _ = cronometrar(clase(ruta).escribir_completo, datos)
+                cargar, leidos = cronometrar(clase(ruta).cargar)
+                if len(leidos["ventas"]) != ventas:
+                    print(f"ERROR: {nombre} devolvió {len(leidos['ventas'])} ventas")
+                    return 1
+                print(f"{ventas:>10,}  {nombre:<8} {os.path.getsize(ruta) / 1e6:>8.1f}MB "
+                      f"{guardar:>8.2f}s {cargar:>8.2f}s")
+                os.remove(ruta)
+            del datos
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+KYREL - Generador de Datos Sintéticos
+Crea un datos.json realista con la cantidad pedida de productos, empleados,
+ventas, asistencias, incapacidades y movimientos, para medir el sistema a
+escala (1k, 100k, 1M ventas...). Los datos son deterministas para una misma
+semilla y consistentes con las operaciones de funciones.py: las ventas se
+agrupan en facturas de 1 a 3 líneas, cada línea tiene su movimiento de
+"Venta" y las fechas terminan hoy, así el dashboard tiene ventas del día.
+
+Uso:
+    python -m benchmarks.generador --ventas 100000 --salida /tmp/datos.json
+    python -m benchmarks.generador --ventas 1000000 --productos 2000 --salida /tmp/grande.json
+"""
+
+import sys
+import random
+import argparse
+from datetime import date, timedelta
+
+from agregados import calcular_agregados
+from almacen import Almacen
+
+SEDES = ["Centro", "Norte", "Sur"]
+PRENDAS = {
+    "Camisas": ["Camiseta", "Camisa", "Polo", "Blusa"],
+    "Sacos": ["Saco", "Suéter", "Chaqueta", "Cárdigan"],
+}
+ESTILOS = ["Deportiva", "Casual", "Formal", "Clásica", "Slim", "Oversize", "Manga Larga", "Estampada"]
+COLORES = ["Azul", "Negro", "Blanco", "Rojo", "Gris", "Verde", "Beige", "Vinotinto"]
+NOMBRES = ["Carlos", "Ana", "Luis", "María", "Jorge", "Sofía", "Pedro", "Laura", "Andrés", "Camila"]
+APELLIDOS = ["Ramírez", "Martínez", "Gómez", "Pérez", "García", "López", "Torres", "Rojas", "Díaz", "Vargas"]
+MOTIVOS = ["Gripe", "Lesión", "Cirugía", "Control médico", "Calamidad"]
+
+
+def escala(ventas):
+    """Cantidades proporcionales a un número de ventas"""
+    empleados = max(6, ventas // 2000)
+    return {
+        "productos": min(5000, max(14, ventas // 200)),
+        "empleados": empleados,
+        "ventas": ventas,
+        "asistencias": empleados * min(365, max(30, ventas // empleados // 4)),
+        "incapacidades": empleados * 2,
+        "movimientos": max(7, ventas // 10),
+    }
+
+
+def generar_datos(productos, empleados, ventas, asistencias, incapacidades, movimientos,
+                  hasta=None, dias=365, semilla=0):
+    """Datos sintéticos; `movimientos` son entradas y salidas además de los
+    movimientos de venta de cada línea"""
+    azar = random.Random(semilla)
+    hasta = date.fromisoformat(hasta) if hasta else date.today()
+    fechas = [(hasta - timedelta(days=d)).isoformat() for d in range(dias - 1, -1, -1)]
+
+    # Un mismo modelo se vende en varias sedes, como en los datos reales
+    lista_productos = []
+    while len(lista_productos) < productos:
+        categoria = azar.choice(list(PRENDAS))
+        nombre = f"{azar.choice(PRENDAS[categoria])} {azar.choice(ESTILOS)} {azar.choice(COLORES)}"
+        precio = round(azar.uniform(15, 120), 2)
+        for sede in azar.sample(SEDES, azar.randint(1, len(SEDES))):
+            if len(lista_productos) < productos:
+                lista_productos.append({
+                    "id": len(lista_productos) + 1, "nombre": nombre, "categoria": categoria,
+                    "sede": sede, "cantidad": azar.randint(0, 200), "precio": precio
+                })
+
+    lista_empleados = [
+        {
+            "carnet": f"EMP{i:03d}", "nombre": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+            "sede": SEDES[i % len(SEDES)], "horas_trabajadas": azar.randint(120, 180),
+            "ventas_realizadas": 0
+        }
+        for i in range(1, empleados + 1)
+    ]
+
+    # Ventas en facturas de 1 a 3 líneas, en orden de fecha
+    clientes = max(1, ventas // 3)
+    por_fecha = sorted(azar.randrange(dias) for _ in range(ventas))
+    lista_ventas, lista_movimientos = [], []
+    i = 0
+    while i < ventas:
+        lineas = min(azar.randint(1, 3), ventas - i)
+        empleado = azar.choice(lista_empleados)
+        empleado["ventas_realizadas"] += 1
+        cliente = f"Cliente {azar.randint(1, clientes)}"
+        fecha = fechas[por_fecha[i]]
+        factura = i + 1
+        for _ in range(lineas):
+            producto = azar.choice(lista_productos)
+            cantidad = azar.randint(1, 3)
+            venta = {
+                "id": i + 1, "fecha": fecha, "cliente": cliente, "producto_id": producto["id"],
+                "cantidad": cantidad, "total": round(cantidad * producto["precio"], 2),
+                "empleado_carnet": empleado["carnet"], "factura": factura
+            }
+            if venta["id"] == factura:
+                venta["num_lineas"] = lineas
+            lista_ventas.append(venta)
+            lista_movimientos.append({
+                "fecha": fecha, "producto_id": producto["id"], "tipo": "Venta",
+                "cantidad": cantidad, "sede": producto["sede"]
+            })
+            i += 1
+
+    for _ in range(movimientos):
+        producto = azar.choice(lista_productos)
+        lista_movimientos.append({
+            "fecha": fechas[azar.randrange(dias)], "producto_id": producto["id"],
+            "tipo": azar.choice(("Entrada", "Entrada", "Salida")),
+            "cantidad": azar.randint(5, 60), "sede": producto["sede"]
+        })
+    lista_movimientos.sort(key=lambda m: m["fecha"])
+    lista_movimientos = [{"id": numero, **m} for numero, m in enumerate(lista_movimientos, 1)]
+
+    # Asistencia diaria de todos los empleados, desde los días más recientes
+    lista_asistencias = []
+    for fecha in reversed(fechas):
+        if len(lista_asistencias) >= asistencias:
+            break
+        for empleado in lista_empleados[:asistencias - len(lista_asistencias)]:
+            lista_asistencias.append({
+                "fecha": fecha, "empleado_carnet": empleado["carnet"], "presente": azar.random() < 0.92
+            })
+    lista_asistencias.reverse()
+
+    lista_incapacidades = []
+    for _ in range(incapacidades):
+        inicio = hasta - timedelta(days=azar.randrange(dias))
+        lista_incapacidades.append({
+            "empleado_carnet": azar.choice(lista_empleados)["carnet"],
+            "fecha_inicio": inicio.isoformat(),
+            "fecha_fin": (inicio + timedelta(days=azar.randint(1, 10))).isoformat(),
+            "motivo": azar.choice(MOTIVOS)
+        })
+    lista_incapacidades.sort(key=lambda x: x["fecha_inicio"])
+
+    datos = {
+        "productos": lista_productos,
+        "ventas": lista_ventas,
+        "empleados": lista_empleados,
+        "asistencias": lista_asistencias,
+        "incapacidades": lista_incapacidades,
+        "movimientos": lista_movimientos,
+        "configuracion": {
+            "proximo_id_producto": len(lista_productos) + 1,
+            "proximo_id_venta": len(lista_ventas) + 1,
+            "proximo_id_movimiento": len(lista_movimientos) + 1,
+        },
+    }
+    datos["agregados"] = calcular_agregados(datos)
+    return datos
+
+
+def generar_archivo(ruta, semilla=0, hasta=None, **cantidades):
+    """Escribe en `ruta` un datos.json sintético; devuelve los datos"""
+    datos = generar_datos(semilla=semilla, hasta=hasta, **cantidades)
+    Almacen(ruta).escribir_completo(datos)
+    return datos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYREL - Generar datos sintéticos")
+    parser.add_argument("--ventas", type=int, default=100000)
+    for coleccion in ("productos", "empleados", "asistencias", "incapacidades", "movimientos"):
+        parser.add_argument(f"--{coleccion}", type=int, help="Por defecto, proporcional a las ventas")
+    parser.add_argument("--hasta", metavar="AAAA-MM-DD", help="Fecha de los últimos registros (por defecto, hoy)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", required=True, help="datos.json de destino")
+    args = parser.parse_args(argv)
+
+    cantidades = escala(args.ventas)
+    for coleccion in cantidades:
+        if getattr(args, coleccion) is not None:
+            cantidades[coleccion] = getattr(args, coleccion)
+    datos = generar_archivo(args.salida, semilla=args.semilla, hasta=args.hasta, **cantidades)
+    print(f"Datos generados en {args.salida}:")
+    for coleccion in cantidades:
+        print(f"  {coleccion:<15} {len(datos[coleccion]):>10,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
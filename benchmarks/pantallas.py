@@ -0,0 +1,226 @@
+"""
+KYREL - Rendimiento por Pantalla
+Mide el cálculo detrás de cada pantalla del menú (sin dibujarla) sobre datos
+sintéticos de distintos tamaños (ver benchmarks/generador.py), y guarda o
+compara los resultados con una línea base en JSON para detectar cuándo un
+cambio hace más lenta una pantalla.
+
+Cada medición parte de los datos ya cargados y de los índices construidos,
+pero sin los resultados cacheados (analítica, vista columnar, view-models),
+es decir, lo que cuesta la primera visita después de un cambio; se toma el
+mejor de varios intentos, el valor menos afectado por el ruido.
+
+Nada se escribe en disco, para que los tiempos y la línea base no dependan
+del sistema de archivos: el guardado se mide en dos partes, una operación
+confirmada con el diario en memoria (AlmacenEnMemoria) y la serialización
+de un punto de control completo hacia /dev/null. La escritura real se mide
+aparte: benchmarks/facturas.py (confirmaciones en el diario) y
+benchmarks/formatos.py (puntos de control JSON y binario).
+
+Uso:
+    python -m benchmarks.pantallas --ventas 1000 100000 --guardar base.json
+    python -m benchmarks.pantallas --ventas 1000 100000 --comparar base.json
+    python -m benchmarks.pantallas --ventas 1000000 --pantallas dashboard buscar_factura
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+from contextlib import nullcontext
+
+import funciones
+import analitica
+import columnar
+from almacen import Almacen
+from benchmarks.generador import escala, generar_archivo
+
+CONSULTAS_STOCK = ["camis", "azul", "saco formal", "polo slim negro", "zzz"]
+CONSULTAS_POR_REPETICION = 20
+# Diferencias menores que esto no cuentan como regresión (ruido del reloj)
+MINIMO_REGRESION = 0.001
+
+
+class AlmacenEnMemoria(Almacen):
+    """Almacén JSON cuyas confirmaciones no salen de la memoria: se mide la
+    operación y la contabilidad del almacén, no el disco"""
+
+    def bloqueo(self):
+        return nullcontext()
+
+    def cambiado_en_disco(self):
+        return False
+
+    def _confirmar_en_diario(self):
+        config = self.datos.setdefault("configuracion", {})
+        config["version_datos"] = config.get("version_datos", 0) + 1
+        self.pendientes = []
+
+
+def limpiar_caches():
+    """Olvida los resultados cacheados, no los datos ni los índices"""
+    analitica._cache.clear()
+    columnar._cache.clear()
+    funciones._modelos.clear()
+
+
+# ============================================================
+# PANTALLAS
+# ============================================================
+# Cada función recibe el contexto de la escala (IDs y carnets de prueba) y
+# hace el mismo cálculo que la pantalla del mismo nombre en funciones.py.
+
+def dashboard(contexto):
+    funciones.modelo_dashboard(funciones.fecha_hoy())
+
+
+def inventario_principal(contexto):
+    funciones.modelo_inventario()
+    for sede in ("Centro", "Norte", "Sur"):
+        for categoria in ("Camisas", "Sacos"):
+            funciones.modelo_resultados_inventario(sede, categoria)
+
+
+def ventas_dashboard(contexto):
+    funciones.modelo_ventas(funciones.fecha_hoy())
+
+
+def consultar_stock(contexto):
+    for texto in CONSULTAS_STOCK:
+        funciones.buscar_stock(texto, funciones.MAX_RESULTADOS_STOCK)
+
+
+def buscar_factura(contexto):
+    for numero in contexto["facturas"]:
+        funciones.obtener_detalle_factura(numero)
+
+
+def buscar_empleado(contexto):
+    for carnet in contexto["carnets"]:
+        funciones.modelo_empleado(carnet, funciones.fecha_hoy())
+
+
+def gestion_empleados(contexto):
+    funciones.modelo_empleados(funciones.fecha_hoy())
+
+
+def guardar(contexto):
+    producto_id = contexto["productos"].pop()
+    funciones.ejecutar(funciones.mover_stock, producto_id, "Entrada", 1)
+
+
+def punto_de_control(contexto):
+    almacen = funciones.obtener_almacen()
+    almacen.escribir_archivo(os.devnull, almacen.cargar())
+
+
+# Las de guardado van al final: cambian los datos
+PANTALLAS = [dashboard, inventario_principal, ventas_dashboard, consultar_stock, buscar_factura,
+             buscar_empleado, gestion_empleados, guardar, punto_de_control]
+
+
+# ============================================================
+# MEDICIÓN
+# ============================================================
+
+def preparar_escala(directorio, ventas, semilla=0):
+    """Genera los datos de la escala, apunta funciones a ellos y los carga"""
+    ruta = os.path.join(directorio, f"datos_{ventas}.json")
+    datos = generar_archivo(ruta, semilla=semilla, **escala(ventas))
+    azar = random.Random(semilla)
+    contexto = {
+        "facturas": [azar.randint(1, ventas) for _ in range(CONSULTAS_POR_REPETICION)],
+        "carnets": [azar.choice(datos["empleados"])["carnet"] for _ in range(CONSULTAS_POR_REPETICION)],
+        "productos": [p["id"] for p in datos["productos"]] * 100,
+    }
+    del datos
+    funciones.BACKEND = "json"
+    funciones.DATOS_FILE = ruta
+    funciones._almacen = AlmacenEnMemoria(ruta)
+    funciones.obtener_indices()
+    return contexto
+
+
+def medir(pantalla, contexto, repeticiones):
+    """Mejor tiempo en segundos de `pantalla` en `repeticiones` ejecuciones"""
+    pantalla(contexto)  # calentamiento: índices y lecturas perezosas
+    tiempos = []
+    for _ in range(repeticiones):
+        limpiar_caches()
+        inicio = time.perf_counter()
+        pantalla(contexto)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def comparar(resultados, base, tolerancia):
+    """Lista de (escala, pantalla, base, actual) más lentos que la base en
+    más de `tolerancia` (fracción) y de MINIMO_REGRESION segundos"""
+    regresiones = []
+    for ventas, tiempos in resultados.items():
+        for nombre, segundos in tiempos.items():
+            anterior = base.get("resultados", {}).get(ventas, {}).get(nombre)
+            if anterior and segundos > anterior * (1 + tolerancia) and segundos - anterior > MINIMO_REGRESION:
+                regresiones.append((ventas, nombre, anterior, segundos))
+    return regresiones
+
+
+def main(argv=None):
+    nombres = [p.__name__ for p in PANTALLAS]
+    parser = argparse.ArgumentParser(description="KYREL - Rendimiento por pantalla")
+    parser.add_argument("--ventas", type=int, nargs="+", default=[1000, 100000], help="Escalas a medir")
+    parser.add_argument("--pantallas", nargs="+", choices=nombres, default=nombres)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--guardar", metavar="BASE.json", help="Guardar los resultados como línea base")
+    parser.add_argument("--comparar", metavar="BASE.json", help="Comparar con una línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="Fracción más lenta que la base que cuenta como regresión (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    os.environ["KYREL_SERVIDOR"] = "no"
+    base = None
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+
+    pantallas = [p for p in PANTALLAS if p.__name__ in args.pantallas]
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for ventas in args.ventas:
+            contexto = preparar_escala(directorio, ventas)
+            print(f"\n{ventas:,} ventas ({os.path.getsize(funciones.DATOS_FILE) / 1e6:.1f} MB)")
+            tiempos = resultados[str(ventas)] = {}
+            for pantalla in pantallas:
+                segundos = tiempos[pantalla.__name__] = medir(pantalla, contexto, args.repeticiones)
+                anterior = (base or {}).get("resultados", {}).get(str(ventas), {}).get(pantalla.__name__)
+                referencia = f"  base {anterior * 1000:9.2f} ms  ({segundos / anterior:5.2f}x)" if anterior else ""
+                print(f"  {pantalla.__name__:<22} {segundos * 1000:9.2f} ms{referencia}")
+            funciones._almacen = None
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": columnar.np is not None,
+                "repeticiones": args.repeticiones,
+                "resultados": resultados,
+            }, f, indent=2)
+        print(f"\nLínea base guardada en {args.guardar}")
+
+    if base is not None:
+        regresiones = comparar(resultados, base, args.tolerancia)
+        if regresiones:
+            print(f"\n{len(regresiones)} regresión(es) de más del {args.tolerancia:.0%}:")
+            for ventas, nombre, anterior, segundos in regresiones:
+                print(f"  {ventas:>9} ventas  {nombre:<22} {anterior * 1000:.2f} ms -> {segundos * 1000:.2f} ms")
+            return 1
+        print(f"\nSin regresiones respecto a {args.comparar}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
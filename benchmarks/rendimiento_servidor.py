@@ -0,0 +1,125 @@
+"""
+KYREL - Rendimiento del Servidor
+Compara peticiones por segundo con el servidor local (servidor.py) frente al
+acceso directo al archivo, donde cada petición es un comando independiente
+que vuelve a leer los datos (como kyrel.py lanzado desde un script).
+
+Cada cliente hace consultas de stock y del dashboard y, cada cierto número,
+una entrada o salida de stock.
+
+Uso:
+    python -m benchmarks.rendimiento_servidor --clientes 4 --peticiones 500
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+
+import cliente
+import funciones
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configurar(directorio, direccion):
+    """Apunta funciones al directorio de trabajo y elige servidor o archivo"""
+    funciones.BACKEND = "json"
+    funciones.DATOS_FILE = os.path.join(directorio, "datos.json")
+    funciones._almacen = None
+    os.environ["KYREL_SERVIDOR"] = direccion
+
+
+def peticion(azar, productos, escritura):
+    if escritura:
+        try:
+            funciones.ejecutar(funciones.mover_stock, azar.choice(productos),
+                               azar.choice(("Entrada", "Salida")), 1)
+        except funciones.OperacionInvalida:
+            pass
+    elif azar.random() < 0.5:
+        funciones.buscar_stock("cami")
+    else:
+        funciones.obtener_metricas_dashboard()
+
+
+def trabajador(directorio, direccion, peticiones, cada_escritura, productos, semilla):
+    """Hace `peticiones` peticiones; devuelve los segundos que tardó"""
+    configurar(directorio, direccion)
+    azar = random.Random(semilla)
+    inicio = time.perf_counter()
+    for i in range(peticiones):
+        if direccion == "no":
+            # Sin servidor cada comando empieza con la caché fría
+            funciones._almacen = None
+        peticion(azar, productos, i % cada_escritura == 0)
+    return time.perf_counter() - inicio
+
+
+def medir(directorio, direccion, args, productos):
+    with multiprocessing.Pool(args.clientes) as pool:
+        inicio = time.perf_counter()
+        pool.starmap(trabajador, [
+            (directorio, direccion, args.peticiones, args.escrituras, productos, semilla)
+            for semilla in range(args.clientes)
+        ])
+        segundos = time.perf_counter() - inicio
+    total = args.clientes * args.peticiones
+    return total, segundos
+
+
+def esperar_socket(ruta, proceso, limite=10.0):
+    fin = time.monotonic() + limite
+    while not os.path.exists(ruta):
+        if proceso.poll() is not None or time.monotonic() > fin:
+            raise RuntimeError("El servidor no arrancó")
+        time.sleep(0.05)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYREL - Peticiones/s con y sin servidor")
+    parser.add_argument("--clientes", type=int, default=4)
+    parser.add_argument("--peticiones", type=int, default=500, help="Peticiones por cliente")
+    parser.add_argument("--escrituras", type=int, default=10, help="Una escritura cada N peticiones")
+    parser.add_argument("--datos", default=funciones.DATOS_FILE, help="datos.json de origen")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        destino = os.path.join(directorio, "datos.json")
+        shutil.copy(args.datos, destino)
+        configurar(directorio, "no")
+        productos = sorted(p["id"] for p in funciones.obtener_todos_productos())
+
+        resultados["Archivo (sin servidor)"] = medir(directorio, "no", args, productos)
+        funciones._almacen = None
+        funciones.consolidar_datos()
+
+        socket_ruta = destino + ".sock"
+        servidor = subprocess.Popen(
+            [sys.executable, os.path.join(RAIZ, "servidor.py"), "--unix", socket_ruta],
+            cwd=directorio, stdout=subprocess.DEVNULL,
+        )
+        try:
+            esperar_socket(socket_ruta, servidor)
+            resultados["Servidor local"] = medir(directorio, f"unix:{socket_ruta}", args, productos)
+        finally:
+            servidor.terminate()
+            servidor.wait()
+        cliente.desconectar()
+
+    print(f"Clientes: {args.clientes}  peticiones/cliente: {args.peticiones}  "
+          f"escrituras: 1 de cada {args.escrituras}")
+    for nombre, (total, segundos) in resultados.items():
+        print(f"  {nombre:<24} {total:>7} peticiones en {segundos:6.2f} s  "
+              f"({total / segundos if segundos else 0:>9,.0f} pet/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
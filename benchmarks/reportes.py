@@ -0,0 +1,78 @@
+"""
+KYREL - Rendimiento de Reportes
+Tiempo total de reportes.exportar en serie (un proceso) frente al pool de
+procesos, por sede y por mes, sobre datos sintéticos (ver
+benchmarks/generador.py). Con --archivado los meses cerrados se archivan
+antes, y en la partición por mes cada proceso lee su propio archivo de mes.
+Comprueba además que los totales del resumen sean iguales en serie y en
+paralelo.
+
+Uso:
+    python -m benchmarks.reportes --ventas 200000
+    python -m benchmarks.reportes --ventas 1000000 --procesos 1 2 4 8 --archivado
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import historico
+import reportes
+from almacen import Almacen
+from benchmarks.generador import escala, generar_archivo
+
+
+def medir(almacen, directorio, por, procesos, repeticiones):
+    """Mejor tiempo en segundos de `repeticiones` exportaciones y sus totales"""
+    tiempos = []
+    totales = None
+    for intento in range(repeticiones):
+        salida = os.path.join(directorio, f"{por}_{procesos}_{intento}")
+        inicio = time.perf_counter()
+        resultado = reportes.exportar(almacen, salida, por=por, procesos=procesos)
+        tiempos.append(time.perf_counter() - inicio)
+        totales = resultado["totales"]
+    return min(tiempos), totales
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYREL - Reportes en serie vs en paralelo")
+    parser.add_argument("--ventas", type=int, default=200000)
+    parser.add_argument("--procesos", type=int, nargs="+", default=[os.cpu_count() or 1],
+                        help="Tamaños del pool a comparar con la ejecución en serie")
+    parser.add_argument("--por", nargs="+", choices=["sede", "mes"], default=["sede", "mes"])
+    parser.add_argument("--archivado", action="store_true", help="Archivar los meses cerrados antes de medir")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    os.environ["KYREL_SERVIDOR"] = "no"
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "datos.json")
+        generar_archivo(ruta, **escala(args.ventas))
+        almacen = Almacen(ruta)
+        if args.archivado:
+            meses = historico.archivar(almacen, max(v["fecha"] for v in almacen.cargar()["ventas"])[:7])
+            print(f"{len(meses)} meses archivados")
+        almacen.cargar()
+        print(f"{args.ventas:,} ventas, {os.cpu_count()} núcleos\n")
+        print(f"{'Partición':<10} {'Procesos':>8} {'Tiempo':>9} {'Aceleración':>12}")
+
+        errores = 0
+        for por in args.por:
+            serie, totales_serie = medir(almacen, directorio, por, 1, args.repeticiones)
+            print(f"{por:<10} {'serie':>8} {serie:>8.3f}s {1:>11.2f}x")
+            for procesos in args.procesos:
+                if procesos == 1:
+                    continue
+                segundos, totales = medir(almacen, directorio, por, procesos, args.repeticiones)
+                print(f"{por:<10} {procesos:>8} {segundos:>8.3f}s {serie / segundos:>11.2f}x")
+                if totales != totales_serie:
+                    print(f"ERROR: los totales por {por} con {procesos} procesos no coinciden con la serie")
+                    errores += 1
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+KYREL - Cliente del Servidor
+Conexión de un terminal con el servidor local (servidor.py). Cada petición
+es una línea JSON {"op", "args", "kwargs"} y cada respuesta otra línea con
+{"ok": true, "resultado": ...} o {"ok": false, "tipo", "error"}.
+
+Dirección del servidor (variable KYREL_SERVIDOR):
+    unix:/ruta/al/socket     socket Unix
+    tcp:127.0.0.1:7070       TCP local
+    no                       no usar servidor
+Sin la variable se usa el socket Unix `<archivo de datos>.sock` si existe.
+Si no hay servidor los terminales trabajan directamente con el archivo.
+"""
+
+import os
+import json
+import time
+import socket
+
+# Tras un intento fallido no se vuelve a probar la conexión durante este tiempo
+ESPERA_RECONEXION = 5.0
+TIMEOUT = 30.0
+
+
+class ErrorServidor(Exception):
+    """El servidor respondió con un error que no es de validación"""
+
+
+class PeticionNoEntregada(ConnectionError):
+    """La petición no llegó a enviarse: es seguro ejecutarla en otro lado"""
+
+
+# Excepciones que se reconstruyen tal cual en el cliente, por nombre de tipo
+ERRORES = {}
+
+
+def parsear_direccion(direccion):
+    """'unix:/ruta' -> (AF_UNIX, '/ruta'); 'tcp:host:puerto' -> (AF_INET, (host, puerto))"""
+    tipo, _, resto = direccion.partition(":")
+    if tipo == "unix":
+        return socket.AF_UNIX, resto
+    if tipo == "tcp":
+        host, _, puerto = resto.rpartition(":")
+        return socket.AF_INET, (host or "127.0.0.1", int(puerto))
+    raise ValueError(f"Dirección de servidor inválida: {direccion}")
+
+
+def direccion_por_defecto(ruta_datos):
+    return f"unix:{ruta_datos}.sock"
+
+
+class Cliente:
+    """Conexión síncrona con el servidor (una petición a la vez)"""
+
+    def __init__(self, direccion):
+        self.direccion = direccion
+        # Un proceso hijo (fork) no debe compartir el socket con el padre
+        self.pid = os.getpid()
+        familia, destino = parsear_direccion(direccion)
+        self.socket = socket.socket(familia, socket.SOCK_STREAM)
+        self.socket.settimeout(TIMEOUT)
+        try:
+            self.socket.connect(destino)
+        except OSError:
+            self.socket.close()
+            raise
+        self.archivo = self.socket.makefile('rwb')
+
+    def llamar(self, op, *args, **kwargs):
+        """Ejecuta `op` en el servidor y devuelve su resultado.
+
+        Si la operación falló allí se relanza la excepción registrada para
+        su tipo en ERRORES (por defecto ErrorServidor). Si no se pudo enviar
+        se lanza PeticionNoEntregada; si se pierde la conexión después de
+        enviarla, OSError: el servidor pudo haberla confirmado.
+        """
+        peticion = {"op": op, "args": args, "kwargs": kwargs}
+        try:
+            self.archivo.write(json.dumps(peticion, ensure_ascii=False).encode('utf-8') + b"\n")
+            self.archivo.flush()
+        except OSError as e:
+            raise PeticionNoEntregada(f"No se pudo enviar la petición al servidor: {e}") from e
+        linea = self.archivo.readline()
+        if not linea:
+            raise ConnectionError("El servidor cerró la conexión")
+        try:
+            respuesta = json.loads(linea)
+        except ValueError:
+            raise ConnectionError("Respuesta incompleta del servidor")
+        if respuesta.get("ok"):
+            return respuesta.get("resultado")
+        error = ERRORES.get(respuesta.get("tipo"), ErrorServidor)
+        raise error(respuesta.get("error", "Error del servidor"))
+
+    def cerrar(self):
+        try:
+            self.archivo.close()
+            self.socket.close()
+        except OSError:
+            pass
+
+
+# ============================================================
+# CONEXIÓN COMPARTIDA DEL PROCESO
+# ============================================================
+
+_cliente = None
+_ultimo_fallo = None
+_habilitado = True
+
+
+def deshabilitar():
+    """El propio servidor nunca se conecta a sí mismo"""
+    global _habilitado
+    _habilitado = False
+    desconectar()
+
+
+def desconectar():
+    global _cliente
+    if _cliente is not None:
+        _cliente.cerrar()
+    _cliente = None
+
+
+def obtener_cliente(ruta_datos):
+    """Cliente conectado al servidor, o None para trabajar con el archivo"""
+    global _cliente, _ultimo_fallo
+    if not _habilitado:
+        return None
+    direccion = os.environ.get("KYREL_SERVIDOR")
+    if direccion == "no":
+        return None
+    if direccion is None:
+        direccion = direccion_por_defecto(ruta_datos)
+        if not os.path.exists(direccion[len("unix:"):]):
+            desconectar()
+            return None
+    if _cliente is not None and _cliente.pid != os.getpid():
+        _cliente = None  # heredado del proceso padre: sigue siendo suyo
+    if _cliente is not None and _cliente.direccion == direccion:
+        return _cliente
+    desconectar()
+    if _ultimo_fallo is not None and time.monotonic() - _ultimo_fallo < ESPERA_RECONEXION:
+        return None
+    try:
+        _cliente = Cliente(direccion)
+    except OSError:
+        _ultimo_fallo = time.monotonic()
+        return None
+    return _cliente
@@ -0,0 +1,142 @@
+"""
+KYREL - Vista Columnar
+Representación compacta de las ventas para la analítica vectorizada:
+columnas numéricas en `array` y columnas categóricas (cliente, carnet)
+codificadas como enteros pequeños con su tabla de valores.
+
+Si NumPy está disponible las columnas se exponen como vistas ndarray (sin
+copia) para que analitica.py calcule con ellas; si no, analitica.py recorre
+las ventas en Python y esta vista no se usa.
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Categorias:
+    """Tabla de valores distintos: valor <-> código entero"""
+
+    def __init__(self):
+        self.valores = []
+        self.codigos = {}
+
+    def codificar(self, valor):
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def __len__(self):
+        return len(self.valores)
+
+
+def fecha_a_entero(fecha):
+    """'2025-11-13' -> 20251113"""
+    return int(fecha[0:4]) * 10000 + int(fecha[5:7]) * 100 + int(fecha[8:10])
+
+
+def entero_a_fecha(valor):
+    """20251113 -> '2025-11-13'"""
+    valor = int(valor)
+    return f"{valor // 10000:04d}-{valor // 100 % 100:02d}-{valor % 100:02d}"
+
+
+class TablaColumnar:
+    """Conjunto de columnas de igual longitud"""
+
+    def __init__(self, columnas, categorias):
+        self.columnas = columnas
+        self.categorias = categorias
+        self.filas = len(next(iter(columnas.values()))) if columnas else 0
+
+    def __len__(self):
+        return self.filas
+
+    def columna(self, nombre):
+        """Columna como ndarray (NumPy) o como array"""
+        datos = self.columnas[nombre]
+        if np is not None:
+            return np.frombuffer(datos, dtype=datos.typecode) if len(datos) else np.array([], dtype=datos.typecode)
+        return datos
+
+    def codigo(self, nombre, valor):
+        """Código de un valor en una columna categórica (None si no aparece)"""
+        return self.categorias[nombre].codigos.get(valor)
+
+
+def ventas_columnar(ventas):
+    """Vista columnar de un iterable de ventas.
+
+    Las fechas se guardan como enteros AAAAMMDD y los clientes normalizados
+    (sin espacios extremos ni mayúsculas) como códigos; -1 si no hay cliente.
+    """
+    columnas = {
+        "id": array('q'),
+        "factura": array('q'),
+        "fecha": array('l'),
+        "producto_id": array('q'),
+        "cantidad": array('q'),
+        "total": array('d'),
+        "cliente": array('l'),
+        "empleado": array('l'),
+    }
+    categorias = {"cliente": Categorias(), "empleado": Categorias()}
+    tabla = TablaColumnar(columnas, categorias)
+    extender_ventas(tabla, ventas)
+    return tabla
+
+
+def extender_ventas(tabla, ventas):
+    """Agrega al final de una vista de ventas las filas de `ventas`"""
+    columnas, categorias = tabla.columnas, tabla.categorias
+    for v in ventas:
+        columnas["id"].append(v["id"])
+        columnas["factura"].append(v.get("factura", v["id"]))
+        columnas["fecha"].append(fecha_a_entero(v["fecha"]))
+        producto_id = v.get("producto_id")
+        columnas["producto_id"].append(-1 if producto_id is None else producto_id)
+        columnas["cantidad"].append(v.get("cantidad", 0))
+        columnas["total"].append(v["total"])
+        cliente = (v.get("cliente") or "").strip().casefold()
+        columnas["cliente"].append(categorias["cliente"].codificar(cliente) if cliente else -1)
+        carnet = (v.get("empleado_carnet") or "").upper()
+        columnas["empleado"].append(categorias["empleado"].codificar(carnet) if carnet else -1)
+    tabla.filas = len(columnas["id"])
+
+
+_cache = {}
+
+def vista_ventas(almacen):
+    """Vista columnar de las ventas, reconstruida solo si cambiaron los datos.
+
+    Las ventas solo crecen: con los datos en memoria, la vista se extiende
+    con las ventas nuevas en lugar de reconstruirse (una reconstrucción
+    cuesta más que el recorrido en Python que evita el cálculo vectorizado).
+    Sin copia en memoria se arma leyendo las ventas en streaming.
+    """
+    if almacen.datos is None:
+        clave = almacen.marca_datos()
+        if _cache.get("ventas", (None,))[0] != clave:
+            _cache["ventas"] = (clave, ventas_columnar(almacen.iterar("ventas")), None)
+        return _cache["ventas"][1]
+
+    # La copia en memoria se pone al día (el diario se reproduce sobre la
+    # misma lista); otra lista (recarga, archivado) obliga a reconstruir
+    ventas = almacen.cargar().get("ventas", [])
+    _, tabla, origen = _cache.get("ventas", (None, None, None))
+    if origen is not ventas or len(ventas) < len(tabla):
+        tabla = ventas_columnar(ventas)
+    elif len(ventas) > len(tabla):
+        try:
+            extender_ventas(tabla, ventas[len(tabla):])
+        except BufferError:
+            # Alguien conserva una vista ndarray de las columnas: no se
+            # pueden agrandar, se arma una tabla nueva
+            tabla = ventas_columnar(ventas)
+    _cache["ventas"] = (None, tabla, ventas)
+    return tabla
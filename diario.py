@@ -0,0 +1,133 @@
+"""
+KYREL - Diario de Cambios
+Registro solo-anexar (JSON por línea) de las operaciones confirmadas desde
+el último punto de control de datos.json
+"""
+
+import os
+import json
+
+import perfil
+from agregados import agregados_de, producto_agregado, stock_ajustado, venta_agregada
+
+
+class DiarioDanado(Exception):
+    """Una confirmación completa del diario no se puede leer.
+
+    No deriva de ValueError a propósito: saltarla perdería esa confirmación
+    y el siguiente punto de control haría la pérdida definitiva.
+    """
+
+
+class Diario:
+    """Archivo de diario asociado a un archivo de datos.
+
+    Cada línea es una confirmación: {"version": n, "ops": [...]}, donde
+    `version` es el valor de configuracion.version_datos tras aplicarla.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def firma(self):
+        """Identifica el estado del diario en disco (inodo, mtime, tamaño)"""
+        try:
+            st = os.stat(self.ruta)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def leer(self, desde=0):
+        """Lee las confirmaciones a partir del byte `desde`.
+
+        Devuelve (entradas, posicion_final). Una última línea incompleta
+        (escritura interrumpida) se ignora y no avanza la posición; una línea
+        completa ilegible lanza DiarioDanado.
+        """
+        entradas = []
+        try:
+            with open(self.ruta, 'rb') as f, perfil.medicion("io", "leer_diario") as medida:
+                f.seek(desde)
+                contenido = f.read()
+                medida["bytes_leidos"] = len(contenido)
+        except OSError:
+            return entradas, desde
+
+        posicion = desde
+        for linea in contenido.splitlines(keepends=True):
+            if not linea.endswith(b"\n"):
+                break
+            try:
+                entradas.append(json.loads(linea))
+            except ValueError as e:
+                raise DiarioDanado(f"{self.ruta}: confirmación ilegible en el byte {posicion}: {e}")
+            posicion += len(linea)
+        return entradas, posicion
+
+    def anexar(self, entrada):
+        """Agrega una confirmación al final del diario.
+
+        Devuelve (tamaño_antes, tamaño_despues) para que el llamador pueda
+        detectar si otro proceso escribió entre medio. Si una escritura
+        anterior quedó interrumpida, su línea incompleta se descarta antes:
+        pegada a esta confirmación formaría una línea completa ilegible.
+        """
+        linea = json.dumps(entrada, ensure_ascii=False) + "\n"
+        with perfil.medicion("io", "anexar_diario") as medida:
+            with open(self.ruta, 'a+b') as f:
+                antes = f.seek(0, os.SEEK_END)
+                if antes:
+                    f.seek(antes - 1)
+                    if f.read(1) != b"\n":
+                        antes = _fin_ultima_linea(f, antes)
+                        f.truncate(antes)
+                f.write(linea.encode('utf-8'))
+                f.flush()
+                despues = f.tell()
+            medida["bytes_escritos"] = despues - antes
+        return antes, despues
+
+    def truncar(self):
+        """Elimina el diario tras un punto de control"""
+        try:
+            os.remove(self.ruta)
+        except FileNotFoundError:
+            pass
+
+
+def _fin_ultima_linea(f, tamano):
+    """Posición justo después del último salto de línea de `f` (0 si no hay)"""
+    fin = tamano
+    while fin > 0:
+        inicio = max(0, fin - 65536)
+        f.seek(inicio)
+        i = f.read(fin - inicio).rfind(b"\n")
+        if i >= 0:
+            return inicio + i + 1
+        fin = inicio
+    return 0
+
+
+def aplicar_operacion(datos, indices, op):
+    """Reaplica una operación del diario sobre los datos en memoria"""
+    tipo = op["op"]
+    if tipo == "insertar":
+        agregados = agregados_de(datos)
+        coleccion = op["coleccion"]
+        datos.setdefault(coleccion, []).append(op["registro"])
+        indices.agregar(coleccion, op["registro"])
+        if coleccion == "productos":
+            producto_agregado(agregados, op["registro"])
+        elif coleccion == "ventas":
+            venta_agregada(agregados, op["registro"])
+    elif tipo == "stock":
+        producto = indices.productos_por_id.get(op["producto_id"])
+        if producto is not None:
+            stock_ajustado(agregados_de(datos), producto, op["cantidad"] - producto["cantidad"])
+            producto["cantidad"] = op["cantidad"]
+    elif tipo == "actualizar":
+        registro = indices.buscar(op["coleccion"], op["clave"])
+        if registro is not None:
+            registro.update(op["campos"])
+    elif tipo == "config":
+        datos.setdefault("configuracion", {}).update(op["campos"])
@@ -0,0 +1,26 @@
+"""
+KYREL - Fechas en la Línea de Comandos
+Tipos de argparse para los rangos de fechas y meses de los comandos
+"""
+
+import re
+import argparse
+from datetime import date
+
+
+def fecha_parcial(texto):
+    """Tipo de argparse: AAAA-MM-DD, AAAA-MM o AAAA"""
+    if not re.fullmatch(r"\d{4}(-\d{2}(-\d{2})?)?", texto):
+        raise argparse.ArgumentTypeError(f"fecha inválida '{texto}' (usa AAAA-MM-DD, AAAA-MM o AAAA)")
+    try:
+        date.fromisoformat(texto + "-01-01"[len(texto) - 4:])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{texto}'")
+    return texto
+
+
+def mes(texto):
+    """Tipo de argparse: AAAA-MM"""
+    if not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", texto):
+        raise argparse.ArgumentTypeError(f"mes inválido '{texto}' (usa AAAA-MM)")
+    return texto
@@ -4,11 +4,33 @@ Todas las funciones de lógica de negocio
 """
 
 import os
-import json
+import time
+import random
+import functools
+from collections import deque
 from datetime import datetime
 
+from almacen import crear_almacen, ConflictoVersion
+from indices import clave_carnet
+from agregados import factura_de
+import historico
+from agrupacion import agrupar, contar
+from navegacion import pantalla, reemplazar
+import terminal
+import cliente
+import perfil
+
 DATOS_FILE = "datos.json"
 
+# Veces que se reaplica una operación si otro terminal confirmó entre medio
+# (solo sin cerrojo entre procesos; con él no hay conflictos)
+MAX_REINTENTOS = 5
+
+# Backend de almacenamiento: "json" (por defecto), "sqlite" o "binario"
+BACKEND = os.environ.get("KYREL_BACKEND", "json")
+SQLITE_FILE = os.environ.get("KYREL_SQLITE_FILE", "datos.db")
+BINARIO_FILE = os.environ.get("KYREL_BINARIO_FILE", "datos.bin")
+
 class Colors:
     HEADER = '\033[95m'
     BLUE = '\033[94m'
@@ -20,107 +42,562 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+# Sin colores si la salida no es una terminal o si NO_COLOR está definida
+if not terminal.colores_activos():
+    for _nombre in [n for n in vars(Colors) if n.isupper()]:
+        setattr(Colors, _nombre, "")
 
-def cargar_datos():
-    """Carga los datos desde el archivo JSON"""
-    if not os.path.exists(DATOS_FILE):
-        return {
-            "productos": [],
-            "ventas": [],
-            "empleados": [],
-            "asistencias": [],
-            "incapacidades": [],
-            "movimientos": [],
-            "configuracion": {
-                "proximo_id_producto": 1,
-                "proximo_id_venta": 1,
-                "proximo_id_movimiento": 1
-            }
-        }
-    
+
+_almacen = None
+
+def ruta_datos():
+    """Archivo de datos del backend configurado"""
+    if BACKEND == "sqlite":
+        return SQLITE_FILE
+    if BACKEND == "binario":
+        return BINARIO_FILE
+    return DATOS_FILE
+
+def obtener_almacen():
+    """Devuelve el almacén compartido del proceso para el backend configurado"""
+    global _almacen
+    ruta = ruta_datos()
+    if _almacen is None or _almacen.ruta != ruta:
+        _almacen = crear_almacen(BACKEND, ruta)
+    return _almacen
+
+# ============================================================
+# SERVIDOR LOCAL (opcional)
+# ============================================================
+# Con servidor.py en marcha, las consultas y operaciones marcadas con @remoto
+# se ejecutan allí sobre una única copia de los datos para todos los
+# terminales; sin servidor se ejecutan en este proceso contra el archivo.
+
+# Funciones que el servidor puede ejecutar, por nombre
+FUNCIONES_REMOTAS = {}
+
+def _argumento_remoto(valor):
+    # Las funciones viajan por nombre; el servidor las resuelve con FUNCIONES_ARGUMENTO
+    return valor.__name__ if callable(valor) else valor
+
+def llamar_servidor(conexion, nombre, *args, **kwargs):
+    """Llama a `nombre` en el servidor. Devuelve (True, resultado), o
+    (False, None) si la petición no llegó a enviarse y puede ejecutarse en
+    este proceso. Una vez enviada, cualquier falla se informa como
+    OperacionInvalida: el servidor pudo haberla confirmado y repetirla
+    aquí la duplicaría."""
     try:
-        with open(DATOS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return {
-            "productos": [],
-            "ventas": [],
-            "empleados": [],
-            "asistencias": [],
-            "incapacidades": [],
-            "movimientos": [],
-            "configuracion": {
-                "proximo_id_producto": 1,
-                "proximo_id_venta": 1,
-                "proximo_id_movimiento": 1
-            }
-        }
+        return True, conexion.llamar(nombre, *args, **kwargs)
+    except cliente.PeticionNoEntregada:
+        cliente.desconectar()
+        return False, None
+    except OSError:
+        cliente.desconectar()
+        raise OperacionInvalida("Se perdió la conexión con el servidor; verifica si la operación quedó registrada")
+    except cliente.ErrorServidor as e:
+        raise OperacionInvalida(f"Error en el servidor: {e}")
+
+def remoto(funcion):
+    """Ejecuta `funcion` en el servidor si hay uno disponible; si no (o si
+    la petición no se pudo enviar), en este proceso"""
+    nombre = funcion.__name__
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        conexion = cliente.obtener_cliente(ruta_datos())
+        if conexion is not None:
+            enviada, resultado = llamar_servidor(conexion, nombre, *map(_argumento_remoto, args), **kwargs)
+            if enviada:
+                return resultado
+        return funcion(*args, **kwargs)
+
+    FUNCIONES_REMOTAS[nombre] = envoltura
+    return envoltura
+
+@perfil.medido("datos")
+def cargar_datos():
+    """Carga los datos desde el almacén en memoria (relee el JSON solo si cambió)"""
+    return obtener_almacen().cargar()
 
+@perfil.medido("datos")
 def guardar_datos(datos):
-    """Guarda los datos en el archivo JSON"""
+    """Guarda los datos en el archivo JSON y actualiza el almacén en memoria"""
+    almacen = obtener_almacen()
     try:
-        # Escribir a un archivo temporal primero
-        temp_file = DATOS_FILE + ".tmp"
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(datos, f, indent=2, ensure_ascii=False)
-        
-        # Reemplazar el archivo original
-        import shutil
-        shutil.move(temp_file, DATOS_FILE)
+        almacen.guardar(datos)
         return True
     except Exception as e:
+        # La copia en memoria pudo quedar a medio modificar: volver a disco
+        almacen.invalidar()
         print(f"{Colors.RED}Error al guardar datos: {e}{Colors.END}")
         return False
 
+def consolidar_datos():
+    """Consolida el diario de cambios en datos.json (punto de control)"""
+    try:
+        obtener_almacen().punto_de_control()
+        return True
+    except Exception as e:
+        print(f"{Colors.RED}Error al consolidar datos: {e}{Colors.END}")
+        return False
+
+def obtener_indices(datos=None):
+    """Obtiene los índices secundarios de los datos (por defecto, los cargados)"""
+    if datos is None:
+        datos = cargar_datos()
+    return obtener_almacen().indices_de(datos)
+
+@remoto
+@perfil.medido("consulta")
 def obtener_producto_por_id(producto_id):
     """Obtiene un producto por su ID"""
-    datos = cargar_datos()
-    for producto in datos["productos"]:
-        if producto["id"] == int(producto_id):
-            return producto
-    return None
+    return obtener_indices().productos_por_id.get(int(producto_id))
 
+@remoto
+@perfil.medido("consulta")
 def obtener_productos_por_sede_categoria(sede, categoria):
     """Obtiene productos filtrados por sede y categoría"""
-    datos = cargar_datos()
-    return [p for p in datos["productos"] if p["sede"] == sede and p["categoria"] == categoria]
+    return list(obtener_indices().productos_por_sede_categoria.get((sede, categoria), []))
 
+@remoto
+@perfil.medido("consulta")
 def obtener_todos_productos():
     """Obtiene todos los productos"""
-    datos = cargar_datos()
-    return datos["productos"]
+    return list(obtener_almacen().iterar("productos"))
 
+@remoto
+@perfil.medido("consulta")
 def obtener_empleado_por_carnet(carnet):
     """Obtiene un empleado por su carnet"""
-    datos = cargar_datos()
-    for empleado in datos.get("empleados", []):
-        if empleado["carnet"].upper() == carnet.upper():
-            return empleado
-    return None
+    return obtener_indices().empleados_por_carnet.get(clave_carnet(carnet))
+
+@remoto
+@perfil.medido("consulta")
+def obtener_venta_por_id(venta_id):
+    """Obtiene una venta (factura) por su número, también si está archivada"""
+    return obtener_almacen().buscar("ventas", int(venta_id))
+
+@remoto
+@perfil.medido("consulta")
+def obtener_ventas_por_carnet(carnet):
+    """Obtiene las ventas atendidas por un empleado"""
+    return list(obtener_indices().ventas_por_carnet.get(clave_carnet(carnet), []))
+
+@remoto
+@perfil.medido("consulta")
+def obtener_asistencias_por_carnet(carnet):
+    """Obtiene los registros de asistencia de un empleado"""
+    return list(obtener_indices().asistencias_por_carnet.get(clave_carnet(carnet), []))
 
-def agregar_movimiento(datos, producto_id, tipo, cantidad, sede):
+@remoto
+@perfil.medido("consulta")
+def obtener_en_rango(coleccion, desde=None, hasta=None, particion=None):
+    """Ventas, movimientos o asistencias entre dos fechas (AAAA-MM-DD, AAAA-MM
+    o AAAA, inclusive) en orden de fecha; `particion` es el carnet del
+    empleado (ventas, asistencias) o la sede (movimientos)"""
+    return obtener_almacen().en_rango(coleccion, desde, hasta, particion)
+
+@remoto
+@perfil.medido("consulta")
+def obtener_incapacidades(desde=None, hasta=None, carnet=None):
+    """Incapacidades que se cruzan con un rango de fechas (con desde = hasta,
+    las vigentes ese día), opcionalmente de un solo empleado"""
+    return list(obtener_indices().incapacidades_en_rango(desde, hasta, carnet))
+
+@remoto
+@perfil.medido("consulta")
+def obtener_resumen_asistencia(desde=None, hasta=None, carnet=None):
+    """{carnet: [registros, presentes, ausencias justificadas]} entre dos
+    fechas; una ausencia es justificada si ese día el empleado tenía una
+    incapacidad vigente"""
+    indices = obtener_indices()
+    cuentas = {}
+    for registro in obtener_almacen().en_rango("asistencias", desde, hasta, carnet):
+        clave = clave_carnet(registro["empleado_carnet"])
+        cuenta = cuentas.setdefault(clave, [0, 0, 0])
+        cuenta[0] += 1
+        if registro["presente"]:
+            cuenta[1] += 1
+        elif indices.en_incapacidad(clave, registro["fecha"]):
+            cuenta[2] += 1
+    return cuentas
+
+def fecha_hoy():
+    """Fecha actual en formato AAAA-MM-DD"""
+    return datetime.now().strftime("%Y-%m-%d")
+
+def agregar_movimiento(datos, producto_id, tipo, cantidad, sede, fecha=None):
     """Registra un movimiento de inventario"""
+    almacen = obtener_almacen()
     movimiento = {
-        "id": datos["configuracion"]["proximo_id_movimiento"],
-        "fecha": datetime.now().strftime("%Y-%m-%d"),
+        "id": almacen.siguiente_id(datos, "proximo_id_movimiento"),
+        "fecha": fecha or fecha_hoy(),
         "producto_id": producto_id,
         "tipo": tipo,
         "cantidad": cantidad,
         "sede": sede
     }
-    datos["movimientos"].append(movimiento)
-    datos["configuracion"]["proximo_id_movimiento"] += 1
+    almacen.insertar(datos, "movimientos", movimiento)
+
+# ============================================================
+# OPERACIONES (sin interfaz)
+# ============================================================
+# Validan todo antes de modificar los datos en memoria; el llamador decide
+# cuándo confirmar: con ejecutar (una operación, con reintentos), con
+# ejecutar_lote (varias en una sola escritura) o con guardar_datos (un lote
+# bajo el cerrojo del almacén).
+
+class OperacionInvalida(ValueError):
+    """Operación rechazada por validación (el mensaje es para el usuario)"""
+
+cliente.ERRORES["OperacionInvalida"] = OperacionInvalida
+
+def ejecutar(operacion, *args, **kwargs):
+    """Aplica `operacion(datos, *args, **kwargs)` sobre los datos vigentes y
+    la confirma.
+
+    Si otro terminal confirmó cambios entre la lectura y la confirmación,
+    la operación se reaplica sobre los datos releídos (validándose de nuevo)
+    en lugar de pisar esos cambios. Los errores se informan como
+    OperacionInvalida. Con servidor, se ejecuta allí.
+    """
+    conexion = cliente.obtener_cliente(ruta_datos())
+    if conexion is not None:
+        enviada, resultado = llamar_servidor(conexion, "ejecutar", operacion.__name__, *args, **kwargs)
+        if enviada:
+            return resultado
+
+    resultado, = ejecutar_lote([(operacion, args, kwargs)])
+    if isinstance(resultado, OperacionInvalida):
+        raise resultado
+    return resultado
+
+@perfil.medido("datos")
+def ejecutar_lote(llamadas):
+    """Aplica varias operaciones `(operacion, args, kwargs)` y las confirma
+    juntas en una sola escritura (confirmación agrupada).
+
+    Lectura, aplicación y confirmación ocurren bajo el cerrojo del almacén,
+    así que ningún otro terminal confirma entre medio. Devuelve el resultado
+    de cada una, o la OperacionInvalida que la rechazó: una operación
+    rechazada no modificó nada y no impide confirmar las demás. Sin cerrojo
+    entre procesos (fcntl no disponible), ante un conflicto con otro
+    terminal se reaplica todo el lote.
+    """
+    almacen = obtener_almacen()
+    for intento in range(MAX_REINTENTOS):
+        if intento:
+            # Espera breve y aleatoria para no chocar de nuevo con el mismo terminal
+            time.sleep(random.uniform(0, 0.005 * intento))
+        with almacen.bloqueo():
+            datos = almacen.cargar()
+            resultados = []
+            for operacion, args, kwargs in llamadas:
+                try:
+                    resultados.append(operacion(datos, *args, **kwargs))
+                except OperacionInvalida as e:
+                    resultados.append(e)
+                except Exception:
+                    # Pudo quedar a medio aplicar: no confirmar nada del lote
+                    almacen.invalidar()
+                    raise
+            if all(isinstance(r, OperacionInvalida) for r in resultados):
+                # Nada que confirmar (guardar sin cambios reescribiría el archivo)
+                return resultados
+            try:
+                almacen.guardar(datos)
+                return resultados
+            except ConflictoVersion:
+                continue
+            except Exception as e:
+                almacen.invalidar()
+                raise OperacionInvalida(f"Error al guardar datos: {e}")
+    raise OperacionInvalida("Otros terminales están modificando los datos; intenta de nuevo")
+
+def crear_producto(datos, nombre, categoria, sede, cantidad, precio, fecha=None):
+    """Agrega un producto nuevo con su movimiento de entrada"""
+    nombre = (nombre or "").strip()
+    if not nombre:
+        raise OperacionInvalida("Nombre no puede estar vacío")
+    if not categoria or not sede:
+        raise OperacionInvalida("Sede y categoría son obligatorias")
+    if cantidad < 0 or precio < 0:
+        raise OperacionInvalida("Cantidad y precio deben ser positivos")
+
+    almacen = obtener_almacen()
+    producto = {
+        "id": almacen.siguiente_id(datos, "proximo_id_producto"),
+        "nombre": nombre,
+        "categoria": categoria,
+        "sede": sede,
+        "cantidad": cantidad,
+        "precio": precio
+    }
+    almacen.insertar(datos, "productos", producto)
+    agregar_movimiento(datos, producto["id"], "Entrada", cantidad, sede, fecha)
+    return producto
+
+def mover_stock(datos, producto_id, tipo, cantidad, fecha=None):
+    """Suma ("Entrada") o resta ("Salida") unidades al stock de un producto"""
+    if tipo not in ("Entrada", "Salida"):
+        raise OperacionInvalida(f"Tipo de movimiento inválido: {tipo}")
+    if cantidad <= 0:
+        raise OperacionInvalida("Cantidad debe ser mayor a 0")
+    producto = obtener_indices(datos).productos_por_id.get(producto_id)
+    if not producto:
+        raise OperacionInvalida(f"Producto con ID #{producto_id} no encontrado")
+    if tipo == "Salida" and producto["cantidad"] < cantidad:
+        raise OperacionInvalida(f"No hay suficiente stock. Disponible: {producto['cantidad']}")
+
+    obtener_almacen().ajustar_stock(datos, producto, cantidad if tipo == "Entrada" else -cantidad)
+    agregar_movimiento(datos, producto_id, tipo, cantidad, producto["sede"], fecha)
+    return producto
+
+def vender_factura(datos, cliente, empleado_carnet, lineas, fecha=None):
+    """Registra una factura con varias líneas `(producto_id, cantidad)`: una
+    venta por línea con IDs consecutivos (todas con el mismo número de
+    "factura", el ID de la primera, que además guarda su "num_lineas"), el
+    stock, los movimientos y una venta más para el empleado. Si alguna
+    línea no es válida no se registra nada. Devuelve (ventas, empleado)"""
+    cliente = (cliente or "").strip()
+    empleado_carnet = (empleado_carnet or "").strip().upper()
+    if not cliente:
+        raise OperacionInvalida("Nombre del cliente no puede estar vacío")
+    if not empleado_carnet:
+        raise OperacionInvalida("Carnet del empleado no puede estar vacío")
+    if not lineas:
+        raise OperacionInvalida("La factura no tiene productos")
+    indices = obtener_indices(datos)
+    empleado = indices.empleados_por_carnet.get(clave_carnet(empleado_carnet))
+    if not empleado:
+        raise OperacionInvalida(f"Empleado con carnet {empleado_carnet} no encontrado")
+    pedidas = {}
+    for producto_id, cantidad in lineas:
+        if cantidad <= 0:
+            raise OperacionInvalida("Cantidad debe ser mayor a 0")
+        producto = indices.productos_por_id.get(producto_id)
+        if not producto:
+            raise OperacionInvalida(f"Producto con ID #{producto_id} no encontrado")
+        pedidas[producto_id] = pedidas.get(producto_id, 0) + cantidad
+        if producto["cantidad"] < pedidas[producto_id]:
+            raise OperacionInvalida(f"Stock insuficiente de {producto['nombre']}. Disponible: {producto['cantidad']}")
+
+    almacen = obtener_almacen()
+    ventas = []
+    for producto_id, cantidad in lineas:
+        producto = indices.productos_por_id[producto_id]
+        venta = {
+            "id": almacen.siguiente_id(datos, "proximo_id_venta"),
+            "fecha": fecha or fecha_hoy(),
+            "cliente": cliente,
+            "producto_id": producto_id,
+            "cantidad": cantidad,
+            "total": cantidad * producto["precio"],
+            "empleado_carnet": empleado_carnet
+        }
+        if ventas:
+            venta["factura"] = ventas[0]["id"]
+        else:
+            venta["factura"] = venta["id"]
+            venta["num_lineas"] = len(lineas)
+        almacen.insertar(datos, "ventas", venta)
+        almacen.ajustar_stock(datos, producto, -cantidad)
+        agregar_movimiento(datos, producto_id, "Venta", cantidad, producto["sede"], fecha)
+        ventas.append(venta)
+    almacen.actualizar(datos, "empleados", empleado,
+                       {"ventas_realizadas": empleado.get("ventas_realizadas", 0) + 1})
+    return ventas, empleado
+
+def vender(datos, cliente, empleado_carnet, producto_id, cantidad, fecha=None):
+    """Registra una venta de un solo producto. Devuelve (venta, producto, empleado)"""
+    ventas, empleado = vender_factura(datos, cliente, empleado_carnet, [(producto_id, cantidad)], fecha)
+    return ventas[0], obtener_indices(datos).productos_por_id[producto_id], empleado
+
+def buscar_venta(datos, venta_id):
+    """Venta de `datos` por su ID o, si su mes ya se archivó, del histórico"""
+    venta = obtener_indices(datos).ventas_por_id.get(venta_id)
+    if venta is None and datos.get(historico.CLAVE):
+        directorio = historico.directorio_historico(obtener_almacen().ruta)
+        venta = historico.buscar(directorio, datos[historico.CLAVE], "ventas", venta_id)
+    return venta
+
+def lineas_factura(datos, factura_id):
+    """Ventas (líneas) de una factura, en orden, también si está archivada;
+    vacía si no existe"""
+    return _lineas_factura(lambda venta_id: buscar_venta(datos, venta_id), factura_id)
+
+def _lineas_factura(buscar, factura_id):
+    # Las líneas tienen IDs consecutivos desde la primera, que guarda cuántas son
+    primera = buscar(factura_id)
+    if primera is None or factura_de(primera) != factura_id:
+        return []
+    lineas = [primera]
+    for venta_id in range(factura_id + 1, factura_id + primera.get("num_lineas", 1)):
+        venta = buscar(venta_id)
+        if venta is not None:
+            lineas.append(venta)
+    return lineas
+
+class Carrito:
+    """Factura en preparación en un terminal. Reserva en memoria el stock de
+    cada línea para no vender más de lo que había al agregarla; el stock se
+    vuelve a validar al confirmar la factura con vender_factura."""
+
+    def __init__(self):
+        self.lineas = []
+
+    def reservado(self, producto_id):
+        return sum(l["cantidad"] for l in self.lineas if l["producto_id"] == producto_id)
+
+    def agregar(self, producto, cantidad):
+        """Agrega (o suma a una línea existente) `cantidad` de `producto`"""
+        if cantidad <= 0:
+            raise OperacionInvalida("Cantidad debe ser mayor a 0")
+        disponible = producto["cantidad"] - self.reservado(producto["id"])
+        if cantidad > disponible:
+            raise OperacionInvalida(f"Stock insuficiente. Disponible: {disponible}")
+        for linea in self.lineas:
+            if linea["producto_id"] == producto["id"]:
+                linea["cantidad"] += cantidad
+                return linea
+        linea = {"producto_id": producto["id"], "nombre": producto["nombre"],
+                 "precio": producto["precio"], "cantidad": cantidad}
+        self.lineas.append(linea)
+        return linea
+
+    def total(self):
+        return sum(l["cantidad"] * l["precio"] for l in self.lineas)
+
+    def para_vender(self):
+        """Líneas en el formato de vender_factura"""
+        return [(l["producto_id"], l["cantidad"]) for l in self.lineas]
+
+def devolver(datos, factura_id, cantidad, fecha=None, producto_id=None):
+    """Devuelve unidades de una factura al stock; en facturas con varias
+    líneas, `producto_id` indica cuál. La factura puede estar en un mes
+    archivado: la devolución se registra como movimiento del mes en curso.
+    Devuelve (venta, producto)"""
+    if cantidad <= 0:
+        raise OperacionInvalida("Cantidad debe ser mayor a 0")
+    indices = obtener_indices(datos)
+    venta = buscar_venta(datos, factura_id)
+    if not venta:
+        raise OperacionInvalida(f"Factura #{factura_id} no encontrada")
+    if producto_id is not None and venta["producto_id"] != producto_id:
+        venta = next((v for v in lineas_factura(datos, factura_de(venta)) if v["producto_id"] == producto_id), None)
+        if not venta:
+            raise OperacionInvalida(f"El producto #{producto_id} no está en la factura #{factura_id}")
+    if cantidad > venta["cantidad"]:
+        raise OperacionInvalida(f"Cantidad a devolver excede cantidad vendida ({venta['cantidad']})")
+    producto = indices.productos_por_id.get(venta["producto_id"])
+    if not producto:
+        raise OperacionInvalida("Producto no encontrado")
+
+    obtener_almacen().ajustar_stock(datos, producto, cantidad)
+    agregar_movimiento(datos, venta["producto_id"], "Devolución", cantidad, producto["sede"], fecha)
+    return venta, producto
+
+FUNCIONES_REMOTAS["ejecutar"] = ejecutar
+
+# Operaciones que el servidor acepta en `ejecutar`, por nombre
+MUTACIONES = {f.__name__: f for f in (crear_producto, mover_stock, vender, vender_factura, devolver)}
+
+# ============================================================
+# CONSULTAS (sin interfaz)
+# ============================================================
+# Leen solo las colecciones que necesitan; las usan las pantallas y kyrel.py.
+
+@remoto
+@perfil.medido("consulta")
+def obtener_metricas_dashboard(ultimos=4, fecha=None):
+    """Métricas del dashboard general (ventas del día `fecha`, hoy por
+    defecto) y los últimos movimientos de inventario"""
+    fecha = fecha or fecha_hoy()
+    almacen = obtener_almacen()
+    agregados = almacen.agregados()
+    sedes = almacen.unidades_por_sede()
+    movimientos = list(deque(almacen.iterar("movimientos"), maxlen=ultimos))
+    ids = {mov["producto_id"] for mov in movimientos}
+    nombres = {p["id"]: p["nombre"] for p in almacen.iterar("productos") if p["id"] in ids}
+    return {
+        "fecha": fecha,
+        "unidades_en_stock": sum(sedes.values()),
+        "ventas_hoy": round(almacen.total_ventas_dia(fecha), 2),
+        "facturas": agregados["facturas"],
+        "productos": agregados["productos"],
+        "unidades_por_sede": sedes,
+        "ultimos_movimientos": [
+            dict(mov, producto=nombres.get(mov["producto_id"])) for mov in reversed(movimientos)
+        ],
+    }
+
+@remoto
+@perfil.medido("consulta")
+def buscar_stock(texto, limite=None):
+    """Stock por sede de los productos cuyo nombre contiene `texto` (sin
+    distinguir tildes): {nombre: {sede: cantidad}}, del nombre más al menos
+    relevante y con a lo sumo `limite` nombres"""
+    stock = {}
+    for p in obtener_indices().nombres.buscar(texto):
+        if p["nombre"] not in stock and limite is not None and len(stock) >= limite:
+            continue
+        stock.setdefault(p["nombre"], {})[p["sede"]] = p["cantidad"]
+    return stock
+
+@remoto
+@perfil.medido("consulta")
+def obtener_detalle_factura(numero):
+    """Venta `numero` con los nombres de producto y empleado y las líneas de
+    toda su factura (`lineas`, `total_factura`), o None"""
+    almacen = obtener_almacen()
+    venta = almacen.buscar("ventas", int(numero))
+    if not venta:
+        return None
+    if factura_de(venta) == venta["id"] and venta.get("num_lineas", 1) == 1:
+        lineas = [venta]  # factura de una sola línea: no hay más que buscar
+    else:
+        lineas = _lineas_factura(lambda clave: almacen.buscar("ventas", clave), factura_de(venta))
+    nombres = {}
+    for linea in lineas:
+        producto = almacen.buscar("productos", linea.get("producto_id"))
+        nombres[linea["id"]] = producto["nombre"] if producto else None
+    empleado = almacen.buscar("empleados", venta.get("empleado_carnet", ""))
+    return dict(
+        venta,
+        factura=factura_de(venta),
+        producto=nombres.get(venta["id"]),
+        lineas=[dict(l, producto=nombres[l["id"]]) for l in lineas],
+        total_factura=round(sum(l["total"] for l in lineas), 2),
+        empleado=empleado["nombre"] if empleado else None
+    )
+
+@remoto
+@perfil.medido("consulta")
+def obtener_total_ventas_empleado(carnet):
+    """Monto total vendido por un empleado"""
+    return obtener_almacen().total_ventas_empleado(carnet)
+
+@remoto
+@perfil.medido("consulta")
+def listar_empleados_sede(sede=None):
+    """Empleados (de una sede, sin distinguir mayúsculas, si se indica)"""
+    empleados = obtener_almacen().iterar("empleados")
+    if sede is None:
+        return list(empleados)
+    sede = sede.casefold()
+    return [e for e in empleados if e["sede"].casefold() == sede]
 
 # ============================================================
 # FUNCIONES DE UTILIDAD
 # ============================================================
 
 def limpiar_pantalla():
-    """Limpia la pantalla de la consola"""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    """Limpia la pantalla de la consola (empieza un cuadro nuevo)"""
+    terminal.limpiar()
 
 def mostrar_header(titulo):
-    """Muestra el encabezado de cada vista"""
+    """Muestra el encabezado de cada vista en un cuadro nuevo"""
+    terminal.limpiar()
     print("\n" + "="*60)
     print(f"{Colors.BOLD}{Colors.CYAN}{titulo.center(60)}{Colors.END}")
     print(f"{Colors.YELLOW}Fecha: {datetime.now().strftime('%d %b %Y - %I:%M %p')}{Colors.END}")
@@ -130,6 +607,32 @@ def pausar():
     """Pausa la ejecución hasta que el usuario presione Enter"""
     input(f"\n{Colors.CYAN}Presiona Enter para continuar...{Colors.END}")
 
+# View-models de las pantallas: cada pantalla se divide en un modelo_* puro
+# (calcula lo que se muestra a partir del almacén, sin imprimir) y un
+# dibujar_* que solo lo imprime. Los modelos se reconstruyen solo si cambió
+# la marca de datos del almacén, que cambia con cada confirmación (de este o
+# de otro terminal), así volver a un menú sin cambios no recalcula nada.
+# Guardan copias pequeñas (no los registros vivos) y hay un tope de entradas,
+# así una sesión de kiosco mantiene la memoria estable.
+MAX_MODELOS = 32
+_modelos = {}
+
+@remoto
+def modelo_cacheado(constructor, *args):
+    """View-model `constructor(*args)`, reutilizado entre visitas mientras
+    no cambien los datos"""
+    clave = (constructor.__name__, args)
+    marca = obtener_almacen().marca_datos()
+    guardado = _modelos.get(clave)
+    if guardado is not None and guardado[0] == marca:
+        return guardado[1]
+    modelo = constructor(*args)
+    _modelos.pop(clave, None)
+    if len(_modelos) >= MAX_MODELOS:
+        del _modelos[next(iter(_modelos))]
+    _modelos[clave] = (marca, modelo)
+    return modelo
+
 def leer_opcion(prompt, opciones_validas):
     """Lee una opción del usuario y valida que sea correcta"""
     while True:
@@ -142,75 +645,75 @@ def leer_opcion(prompt, opciones_validas):
 # DASHBOARD
 # ============================================================
 
-def dashboard():
-    """Vista del Dashboard General"""
-    mostrar_header("DASHBOARD GENERAL")
-    
-    datos = cargar_datos()
-    total_productos = sum(p["cantidad"] for p in datos["productos"])
-    total_ventas_hoy = sum(v["total"] for v in datos["ventas"] if v["fecha"] == datetime.now().strftime("%Y-%m-%d"))
-    
+def modelo_dashboard(fecha):
+    """Métricas del dashboard general para el día `fecha`"""
+    return obtener_metricas_dashboard(fecha=fecha)
+
+def dibujar_dashboard(metricas):
     print(f"{Colors.BOLD}📊 MÉTRICAS DEL DÍA{Colors.END}")
     print("-" * 60)
-    print(f"  {Colors.GREEN}► Total unidades en stock:{Colors.END}       {total_productos}")
-    print(f"  {Colors.GREEN}► Ventas registradas hoy:{Colors.END}        ${total_ventas_hoy:.2f}")
-    print(f"  {Colors.GREEN}► Facturas emitidas:{Colors.END}             {len(datos['ventas'])}")
-    print(f"  {Colors.GREEN}► Modelos de productos:{Colors.END}          {len(datos['productos'])}")
+    print(f"  {Colors.GREEN}► Total unidades en stock:{Colors.END}       {metricas['unidades_en_stock']}")
+    print(f"  {Colors.GREEN}► Ventas registradas hoy:{Colors.END}        ${metricas['ventas_hoy']:.2f}")
+    print(f"  {Colors.GREEN}► Facturas emitidas:{Colors.END}             {metricas['facturas']}")
+    print(f"  {Colors.GREEN}► Modelos de productos:{Colors.END}          {metricas['productos']}")
     print()
     
     print(f"{Colors.BOLD}📈 PRODUCTOS POR SEDE{Colors.END}")
     print("-" * 60)
-    sedes = {}
-    for p in datos["productos"]:
-        sedes[p["sede"]] = sedes.get(p["sede"], 0) + p["cantidad"]
-    
-    for sede, cantidad in sedes.items():
+    for sede, cantidad in metricas["unidades_por_sede"].items():
         barra = "█" * (cantidad // 5)
         print(f"  {sede:12} │ {barra} {cantidad}")
     print()
     
     print(f"{Colors.BOLD}📦 ÚLTIMOS MOVIMIENTOS DE INVENTARIO{Colors.END}")
     print("-" * 60)
-    movimientos = datos["movimientos"][-4:]  # Últimos 4
     print(f"  {'Producto':<20} {'Sede':<10} {'Tipo':<10} {'Cant.':<8} {'Fecha':<12}")
     print("  " + "-" * 58)
-    for mov in reversed(movimientos):
-        producto = obtener_producto_por_id(mov["producto_id"])
-        nombre = producto["nombre"][:19] if producto else f"ID {mov['producto_id']}"
+    for mov in metricas["ultimos_movimientos"]:
+        nombre = mov["producto"][:19] if mov["producto"] else f"ID {mov['producto_id']}"
         print(f"  {nombre:<20} {mov['sede']:<10} {mov['tipo']:<10} {mov['cantidad']:<8} {mov['fecha']:<12}")
-    
+
+def dashboard():
+    """Vista del Dashboard General"""
+    mostrar_header("DASHBOARD GENERAL")
+    dibujar_dashboard(modelo_cacheado(modelo_dashboard, fecha_hoy()))
     pausar()
 
 # ============================================================
 # INVENTARIO
 # ============================================================
 
-def inventario_principal():
-    """Vista principal del inventario por sede"""
-    mostrar_header("INVENTARIO POR SEDE")
-    
-    datos = cargar_datos()
-    total_camisas = sum(p["cantidad"] for p in datos["productos"] if p["categoria"] == "Camisas")
-    total_sacos = sum(p["cantidad"] for p in datos["productos"] if p["categoria"] == "Sacos")
-    
+def modelo_inventario():
+    """Totales por categoría y por sede para la vista de inventario"""
+    almacen = obtener_almacen()
+    categorias = almacen.unidades_por_categoria()
+    return {
+        "total_camisas": categorias.get("Camisas", 0),
+        "total_sacos": categorias.get("Sacos", 0),
+        "unidades_por_sede": sorted(almacen.unidades_por_sede().items()),
+    }
+
+def dibujar_inventario(modelo):
     print(f"{Colors.BOLD}📊 RESUMEN TOTAL{Colors.END}")
     print("-" * 60)
-    print(f"  {Colors.GREEN}► Camisas Totales:{Colors.END}  {total_camisas}")
-    print(f"  {Colors.GREEN}► Sacos Totales:{Colors.END}    {total_sacos}")
+    print(f"  {Colors.GREEN}► Camisas Totales:{Colors.END}  {modelo['total_camisas']}")
+    print(f"  {Colors.GREEN}► Sacos Totales:{Colors.END}    {modelo['total_sacos']}")
     print()
     
     print(f"{Colors.BOLD}📈 INVENTARIO POR SEDE{Colors.END}")
     print("-" * 60)
-    sedes_cantidad = {}
-    for p in datos["productos"]:
-        sedes_cantidad[p["sede"]] = sedes_cantidad.get(p["sede"], 0) + p["cantidad"]
     
     emojis = {"Norte": "🟡", "Centro": "🔴", "Sur": "🟢"}
-    for sede, cantidad in sorted(sedes_cantidad.items()):
+    for sede, cantidad in modelo["unidades_por_sede"]:
         barra = "█" * (cantidad // 5)
         emoji = emojis.get(sede, "⚪")
         print(f"  {emoji} {sede:12} │ {barra} {cantidad}")
     print()
+
+def inventario_principal():
+    """Vista principal del inventario por sede"""
+    mostrar_header("INVENTARIO POR SEDE")
+    dibujar_inventario(modelo_cacheado(modelo_inventario))
     
     print(f"{Colors.BOLD}🔍 BÚSQUEDA DE INVENTARIO{Colors.END}")
     print("-" * 60)
@@ -236,26 +739,37 @@ def inventario_principal():
     items = {"1": "Camisas", "2": "Sacos"}
     item = items[opcion_item]
     
-    mostrar_resultados_inventario(sede, item)
+    # "Volver" en los resultados regresa al menú principal, no a esta pantalla
+    return reemplazar(mostrar_resultados_inventario, sede, item)
 
-def mostrar_resultados_inventario(sede, item):
-    """Muestra los resultados de la búsqueda de inventario"""
-    items_data = obtener_productos_por_sede_categoria(sede, item)
-    cantidad_total = sum(p["cantidad"] for p in items_data)
-    
-    mostrar_header(f"INVENTARIO: {item} en Sede {sede}")
-    
-    print(f"{Colors.BOLD}{Colors.GREEN}Cantidad Total: {cantidad_total}{Colors.END}\n")
+def modelo_resultados_inventario(sede, item):
+    """Productos de una sede y categoría con su cantidad total"""
+    productos = [
+        (p["id"], p["nombre"], p["cantidad"], p["precio"])
+        for p in obtener_productos_por_sede_categoria(sede, item)
+    ]
+    return {
+        "productos": productos,
+        "cantidad_total": sum(p[2] for p in productos),
+    }
+
+def dibujar_resultados_inventario(modelo):
+    print(f"{Colors.BOLD}{Colors.GREEN}Cantidad Total: {modelo['cantidad_total']}{Colors.END}\n")
     
     print(f"{Colors.BOLD}📦 MODELOS DISPONIBLES{Colors.END}")
     print("-" * 60)
     print(f"  {'ID':<6} {'Nombre':<30} {'Cantidad':<10} {'Precio':<10}")
     print("  " + "-" * 58)
     
-    for producto in items_data:
-        print(f"  #{producto['id']:<5} {producto['nombre']:<30} {producto['cantidad']:<10} ${producto['precio']:<9.2f}")
-    
+    for producto_id, nombre, cantidad, precio in modelo["productos"]:
+        print(f"  #{producto_id:<5} {nombre:<30} {cantidad:<10} ${precio:<9.2f}")
     print()
+
+def mostrar_resultados_inventario(sede, item):
+    """Muestra los resultados de la búsqueda de inventario"""
+    mostrar_header(f"INVENTARIO: {item} en Sede {sede}")
+    dibujar_resultados_inventario(modelo_cacheado(modelo_resultados_inventario, sede, item))
+    
     print(f"{Colors.BOLD}OPCIONES:{Colors.END}")
     print("1. Agregar producto nuevo")
     print("2. Modificar cantidad de producto existente")
@@ -265,11 +779,9 @@ def mostrar_resultados_inventario(sede, item):
     opcion = leer_opcion("Selecciona una opción (0-2): ", ["0", "1", "2"])
     
     if opcion == "1":
-        agregar_producto(sede, item)
-        mostrar_resultados_inventario(sede, item)
+        return pantalla(agregar_producto, sede, item)
     elif opcion == "2":
-        modificar_producto(sede, item)
-        mostrar_resultados_inventario(sede, item)
+        return pantalla(modificar_producto, sede, item)
 
 def agregar_producto(sede, item):
     """Formulario para agregar un nuevo producto"""
@@ -296,36 +808,13 @@ def agregar_producto(sede, item):
         pausar()
         return
     
-    # Cargar datos actuales
-    datos = cargar_datos()
-    
-    # Crear nuevo producto con ID auto-increment
-    nuevo_producto = {
-        "id": datos["configuracion"]["proximo_id_producto"],
-        "nombre": nombre,
-        "categoria": item,
-        "sede": sede,
-        "cantidad": cantidad,
-        "precio": precio
-    }
-    
-    # Agregar producto a la lista
-    datos["productos"].append(nuevo_producto)
-    
-    # Incrementar el próximo ID
-    datos["configuracion"]["proximo_id_producto"] += 1
-    
-    # Registrar movimiento de entrada
-    agregar_movimiento(
-        datos,
-        nuevo_producto["id"],
-        "Entrada",
-        cantidad,
-        sede
-    )
-    
-    # Guardar datos (una sola vez al final)
-    guardar_datos(datos)
+    # Crear producto (ID auto-increment) y su movimiento de entrada
+    try:
+        nuevo_producto = ejecutar(crear_producto, nombre, item, sede, cantidad, precio)
+    except OperacionInvalida as e:
+        print(f"{Colors.RED}✗ {e}{Colors.END}")
+        pausar()
+        return
     
     print(f"\n{Colors.GREEN}✓ Producto agregado exitosamente con ID #{nuevo_producto['id']}{Colors.END}")
     print(f"  Nombre: {nombre}")
@@ -364,15 +853,8 @@ def modificar_producto(sede, item):
         pausar()
         return
     
-    # Cargar datos
-    datos = cargar_datos()
-    
-    # Buscar producto en los datos cargados
-    producto = None
-    for p in datos["productos"]:
-        if p["id"] == producto_id:
-            producto = p
-            break
+    # Buscar producto
+    producto = obtener_producto_por_id(producto_id)
     
     if not producto:
         print(f"{Colors.RED}✗ Producto con ID #{producto_id} no encontrado{Colors.END}")
@@ -386,31 +868,15 @@ def modificar_producto(sede, item):
         pausar()
         return
     
-    # Modificar cantidad
-    if opcion == "1":
-        producto["cantidad"] += cantidad
-        tipo_movimiento = "Entrada"
-        operacion = "agregada"
-    else:
-        if producto["cantidad"] < cantidad:
-            print(f"{Colors.RED}✗ No hay suficiente stock. Disponible: {producto['cantidad']}{Colors.END}")
-            pausar()
-            return
-        producto["cantidad"] -= cantidad
-        tipo_movimiento = "Salida"
-        operacion = "eliminada"
-    
-    # Registrar movimiento
-    agregar_movimiento(
-        datos,
-        producto_id,
-        tipo_movimiento,
-        cantidad,
-        sede
-    )
-    
-    # Guardar cambios (una sola vez al final)
-    guardar_datos(datos)
+    # Modificar cantidad y registrar movimiento
+    tipo_movimiento = "Entrada" if opcion == "1" else "Salida"
+    operacion = "agregada" if opcion == "1" else "eliminada"
+    try:
+        producto = ejecutar(mover_stock, producto_id, tipo_movimiento, cantidad)
+    except OperacionInvalida as e:
+        print(f"{Colors.RED}✗ {e}{Colors.END}")
+        pausar()
+        return
     
     print(f"\n{Colors.GREEN}✓ Operación completada exitosamente{Colors.END}")
     print(f"  Producto: {producto['nombre']}")
@@ -423,48 +889,84 @@ def modificar_producto(sede, item):
 # VENTAS
 # ============================================================
 
-def ventas_dashboard():
-    """Vista del módulo de ventas"""
-    mostrar_header("REGISTRO DE VENTAS")
+MESES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+@remoto
+@perfil.medido("consulta")
+def obtener_resumen_ventas(top_n=None, fecha=None):
+    """Obtiene las métricas de ventas del día `fecha`, hoy por defecto
+    (calculadas en una sola pasada)"""
+    # Importación diferida: analitica carga NumPy, que solo hace falta aquí
+    from analitica import resumen_ventas, TOP_PRODUCTOS
+    return resumen_ventas(obtener_almacen(), fecha or fecha_hoy(), top_n or TOP_PRODUCTOS)
+
+def formatear_variacion(porcentaje, referencia):
+    """Texto de variación porcentual, p. ej. '(+10% vs ayer)'"""
+    if porcentaje is None:
+        return f"(sin datos {referencia})"
+    return f"({porcentaje:+.0f}% vs {referencia})"
+
+def modelo_ventas(fecha):
+    """Resumen de ventas del día `fecha` con los nombres de los productos más vendidos"""
+    resumen = obtener_resumen_ventas(fecha=fecha)
+    top = []
+    for item in resumen["top_productos"]:
+        producto = obtener_producto_por_id(item["producto_id"]) if item["producto_id"] is not None else None
+        top.append(dict(item, nombre=producto["nombre"] if producto else None))
+    return dict(resumen, top_productos=top)
+
+def dibujar_ventas(resumen):
+    hoy = resumen["hoy"]
+    variacion = resumen["variacion_dia"]
     
     print(f"{Colors.BOLD}💰 VENTAS EN EL DÍA{Colors.END}")
     print("-" * 60)
-    print(f"  {Colors.GREEN}► Ventas totales:{Colors.END}         $5,000  (+10% vs ayer)")
-    print(f"  {Colors.GREEN}► Total de facturas:{Colors.END}      500     (+3% vs ayer)")
-    print(f"  {Colors.GREEN}► Productos vendidos:{Colors.END}     9       (+2% vs ayer)")
-    print(f"  {Colors.GREEN}► Nuevos clientes:{Colors.END}        12      (+5% vs ayer)")
+    # Variación de cada cifra respecto a ayer, ya formateada
+    frente = {campo: formatear_variacion(cambio, "ayer") for campo, cambio in variacion.items()}
+    total = "$" + format(hoy["total"], ",.2f")
+    nuevos = hoy["nuevos_clientes"]
+    print(f"  {Colors.GREEN}► Ventas totales:{Colors.END}         {total:<12} {frente['total']}")
+    print(f"  {Colors.GREEN}► Total de facturas:{Colors.END}      {hoy['facturas']:<12} {frente['facturas']}")
+    print(f"  {Colors.GREEN}► Productos vendidos:{Colors.END}     {hoy['unidades']:<12} {frente['unidades']}")
+    print(f"  {Colors.GREEN}► Nuevos clientes:{Colors.END}        {nuevos:<12} {frente['nuevos_clientes']}")
     print()
     
     print(f"{Colors.BOLD}💵 GANANCIAS TOTALES{Colors.END}")
     print("-" * 60)
-    print(f"  {Colors.GREEN}Total: $6,078.76{Colors.END}")
-    print(f"  Rentabilidad: 48% más que el mes pasado")
+    print(f"  {Colors.GREEN}Total: ${resumen['total_general']:,.2f}{Colors.END}")
+    if resumen["variacion_mes"] is None:
+        print(f"  Este mes: ${resumen['mes_actual']:,.2f} (sin ventas el mes pasado)")
+    else:
+        comparacion = "más" if resumen["variacion_mes"] >= 0 else "menos"
+        print(f"  Rentabilidad: {abs(resumen['variacion_mes']):.0f}% {comparacion} que el mes pasado")
     print()
     
     print(f"{Colors.BOLD}🏆 TOP PRODUCTOS{Colors.END}")
     print("-" * 60)
-    productos_top = [
-        ("01", "Camiseta Básica H&M", "46%", 46),
-        ("02", "Jean tipo Denim M", "17%", 17),
-        ("03", "Camiseta Oversize", "19%", 19),
-        ("04", "Gorra Los Cadillacs", "29%", 29),
-    ]
     print(f"  {'#':<4} {'Nombre':<25} {'Ventas':<10} {'Popularidad':<15}")
     print("  " + "-" * 58)
-    for pid, nombre, ventas, pop in productos_top:
-        barra = "█" * (pop // 5)
-        print(f"  {pid:<4} {nombre:<25} {ventas:<10} {barra}")
+    for posicion, item in enumerate(resumen["top_productos"], 1):
+        nombre = item["nombre"][:24] if item["nombre"] else f"ID {item['producto_id']}"
+        popularidad = item["ingresos"] / resumen["total_general"] * 100 if resumen["total_general"] else 0
+        barra = "█" * int(popularidad // 5)
+        ingresos = "$" + format(item["ingresos"], ",.2f")
+        print(f"  {posicion:02d}   {nombre:<25} {ingresos:<10} {barra} {popularidad:.0f}%")
     print()
     
-    print(f"{Colors.BOLD}📊 VISITANTES POR MES{Colors.END}")
+    anio = hoy["fecha"][:4]
+    print(f"{Colors.BOLD}📊 VENTAS POR MES ({anio}){Colors.END}")
     print("-" * 60)
-    visitantes = [("Ene", 300), ("Feb", 280), ("Mar", 350), ("Abr", 420), ("May", 390), 
-                  ("Jun", 450), ("Jul", 410), ("Ago", 480), ("Sep", 430), ("Oct", 460), 
-                  ("Nov", 410), ("Dic", 440)]
-    for mes, cant in visitantes:
-        barra = "█" * (cant // 20)
-        print(f"  {mes:4} │ {barra} {cant}")
+    totales_mes = [resumen["por_mes"].get(f"{anio}-{i:02d}", 0) for i in range(1, 13)]
+    maximo = max(totales_mes) or 1
+    for mes, total in zip(MESES, totales_mes):
+        barra = "█" * int(total / maximo * 30)
+        print(f"  {mes:4} │ {barra} ${total:,.2f}")
     print()
+
+def ventas_dashboard():
+    """Vista del módulo de ventas"""
+    mostrar_header("REGISTRO DE VENTAS")
+    dibujar_ventas(modelo_cacheado(modelo_ventas, fecha_hoy()))
     
     print(f"{Colors.BOLD}ACCIONES DISPONIBLES:{Colors.END}")
     print("1. Registrar una venta")
@@ -476,18 +978,8 @@ def ventas_dashboard():
     
     opcion = leer_opcion("Selecciona una opción (0-4): ", ["0", "1", "2", "3", "4"])
     
-    if opcion == "0":
-        return
-    elif opcion == "1":
-        registrar_venta()
-    elif opcion == "2":
-        buscar_factura()
-    elif opcion == "3":
-        procesar_devolucion()
-    elif opcion == "4":
-        consultar_stock()
-    
-    ventas_dashboard()
+    acciones = {"1": registrar_venta, "2": buscar_factura, "3": procesar_devolucion, "4": consultar_stock}
+    return acciones.get(opcion)
 
 def registrar_venta():
     """Formulario para registrar una nueva venta"""
@@ -515,93 +1007,50 @@ def registrar_venta():
         pausar()
         return
     
-    try:
-        producto_id = int(input("ID del producto: "))
-        cantidad = int(input("Cantidad: "))
-        
-        if cantidad <= 0:
-            print(f"{Colors.RED}✗ Cantidad debe ser mayor a 0{Colors.END}")
-            pausar()
-            return
-    except ValueError:
-        print(f"{Colors.RED}✗ ID y cantidad deben ser valores numéricos válidos{Colors.END}")
-        pausar()
-        return
-    
-    # Cargar datos
-    datos = cargar_datos()
-    
-    # Buscar producto en los datos cargados
-    producto = None
-    for p in datos["productos"]:
-        if p["id"] == producto_id:
-            producto = p
+    # Armar la factura: el stock de cada línea queda reservado en el carrito
+    carrito = Carrito()
+    print(f"\n{Colors.CYAN}Agrega productos a la factura (Enter sin ID para terminar){Colors.END}")
+    while True:
+        entrada = input("\nID del producto: ").strip()
+        if not entrada:
             break
-    
-    if not producto:
-        print(f"{Colors.RED}✗ Producto con ID #{producto_id} no encontrado{Colors.END}")
+        try:
+            producto_id = int(entrada)
+            cantidad = int(input("Cantidad: "))
+        except ValueError:
+            print(f"{Colors.RED}✗ ID y cantidad deben ser valores numéricos válidos{Colors.END}")
+            continue
+        producto = obtener_producto_por_id(producto_id)
+        if not producto:
+            print(f"{Colors.RED}✗ Producto con ID #{producto_id} no encontrado{Colors.END}")
+            continue
+        try:
+            linea = carrito.agregar(producto, cantidad)
+        except OperacionInvalida as e:
+            print(f"{Colors.RED}✗ {e}{Colors.END}")
+            continue
+        print(f"  {Colors.GREEN}+ {linea['nombre']} x{linea['cantidad']}{Colors.END}   "
+              f"Subtotal factura: ${carrito.total():.2f}")
+    
+    if not carrito.lineas:
+        print(f"{Colors.RED}✗ La factura no tiene productos{Colors.END}")
         pausar()
         return
     
-    # Verificar stock
-    if producto["cantidad"] < cantidad:
-        print(f"{Colors.RED}✗ Stock insuficiente. Disponible: {producto['cantidad']}{Colors.END}")
+    # Registrar toda la factura en una sola escritura
+    try:
+        ventas, empleado = ejecutar(vender_factura, cliente, empleado_carnet, carrito.para_vender())
+    except OperacionInvalida as e:
+        print(f"{Colors.RED}✗ {e}{Colors.END}")
         pausar()
         return
     
-    # Buscar empleado en los datos cargados para actualizar ventas
-    empleado_data = None
-    for e in datos.get("empleados", []):
-        if e["carnet"].upper() == empleado_carnet.upper():
-            empleado_data = e
-            break
-    
-    # Calcular total
-    total = cantidad * producto["precio"]
-    
-    # Crear nueva venta
-    nueva_venta = {
-        "id": datos["configuracion"]["proximo_id_venta"],
-        "fecha": datetime.now().strftime("%Y-%m-%d"),
-        "cliente": cliente,
-        "producto_id": producto_id,
-        "cantidad": cantidad,
-        "total": total,
-        "empleado_carnet": empleado_carnet
-    }
-    
-    # Agregar venta
-    datos["ventas"].append(nueva_venta)
-    
-    # Actualizar stock del producto
-    producto["cantidad"] -= cantidad
-    
-    # Actualizar ventas realizadas del empleado
-    if empleado_data:
-        empleado_data["ventas_realizadas"] += 1
-    
-    # Incrementar próximo ID
-    datos["configuracion"]["proximo_id_venta"] += 1
-    
-    # Registrar movimiento
-    agregar_movimiento(
-        datos,
-        producto_id,
-        "Venta",
-        cantidad,
-        producto["sede"]
-    )
-    
-    # Guardar datos (una sola vez al final)
-    guardar_datos(datos)
-    
-    print(f"\n{Colors.GREEN}✓ Venta registrada exitosamente #{nueva_venta['id']}{Colors.END}")
+    print(f"\n{Colors.GREEN}✓ Venta registrada exitosamente #{ventas[0]['id']}{Colors.END}")
     print(f"  Cliente: {cliente}")
-    print(f"  Producto: {producto['nombre']}")
-    print(f"  Cantidad: {cantidad}")
-    print(f"  Precio unitario: ${producto['precio']:.2f}")
-    print(f"  {Colors.BOLD}Total: ${total:.2f}{Colors.END}")
-    print(f"  Stock restante: {producto['cantidad']}")
+    print(f"  {'Producto':<25} {'Cant.':<6} {'Precio':<10} {'Total':<10}")
+    for venta, linea in zip(ventas, carrito.lineas):
+        print(f"  {linea['nombre'][:24]:<25} {venta['cantidad']:<6} ${linea['precio']:<9.2f} ${venta['total']:<9.2f}")
+    print(f"  {Colors.BOLD}Total: ${sum(v['total'] for v in ventas):.2f}{Colors.END}")
     print(f"  Atendido por: {empleado['nombre']} ({empleado_carnet})")
     
     pausar()
@@ -617,38 +1066,33 @@ def buscar_factura():
         pausar()
         return
     
-    # Cargar datos
-    datos = cargar_datos()
-    
-    # Buscar venta
-    venta = None
-    for v in datos["ventas"]:
-        if v["id"] == numero:
-            venta = v
-            break
+    # Buscar venta con su producto y empleado
+    venta = obtener_detalle_factura(numero)
     
     if not venta:
         print(f"\n{Colors.RED}✗ Factura #{numero} no encontrada{Colors.END}")
         pausar()
         return
     
-    # Obtener información del producto
-    producto = obtener_producto_por_id(venta["producto_id"])
-    
-    # Obtener información del empleado
-    empleado = obtener_empleado_por_carnet(venta.get("empleado_carnet", ""))
-    
+    dibujar_factura(venta)
+    pausar()
+
+def dibujar_factura(venta):
     print(f"\n{Colors.GREEN}✓ Factura encontrada:{Colors.END}\n")
-    print(f"  {Colors.BOLD}Factura: #{venta['id']}{Colors.END}")
+    print(f"  {Colors.BOLD}Factura: #{venta['factura']}{Colors.END}")
     print(f"  Fecha: {venta['fecha']}")
     print(f"  Cliente: {venta['cliente']}")
-    print(f"  Producto: {producto['nombre'] if producto else 'Desconocido'}")
-    print(f"  Cantidad: {venta['cantidad']}")
-    print(f"  {Colors.BOLD}Total: ${venta['total']:.2f}{Colors.END}")
-    if empleado:
-        print(f"  Atendido por: {empleado['nombre']} ({venta.get('empleado_carnet', 'N/A')})")
-    
-    pausar()
+    if len(venta["lineas"]) == 1:
+        print(f"  Producto: {venta['producto'] or 'Desconocido'}")
+        print(f"  Cantidad: {venta['cantidad']}")
+    else:
+        print(f"  {'ID':<6} {'Producto':<25} {'Cant.':<6} {'Total':<10}")
+        for linea in venta["lineas"]:
+            nombre = (linea["producto"] or "Desconocido")[:24]
+            print(f"  #{linea['producto_id']:<5} {nombre:<25} {linea['cantidad']:<6} ${linea['total']:<9.2f}")
+    print(f"  {Colors.BOLD}Total: ${venta['total_factura']:.2f}{Colors.END}")
+    if venta["empleado"]:
+        print(f"  Atendido por: {venta['empleado']} ({venta.get('empleado_carnet', 'N/A')})")
 
 def procesar_devolucion():
     """Procesar una devolución"""
@@ -658,6 +1102,13 @@ def procesar_devolucion():
     
     try:
         factura_id = int(input("Número de factura: "))
+        # En facturas con varias líneas, indicar cuál se devuelve
+        detalle = obtener_detalle_factura(factura_id)
+        producto_id = None
+        if detalle and len(detalle["lineas"]) > 1:
+            for linea in detalle["lineas"]:
+                print(f"  #{linea['producto_id']:<5} {(linea['producto'] or 'Desconocido')[:24]:<25} x{linea['cantidad']}")
+            producto_id = int(input("ID del producto a devolver: "))
         cantidad_devolver = int(input("Cantidad a devolver: "))
         
         if cantidad_devolver <= 0:
@@ -671,54 +1122,14 @@ def procesar_devolucion():
     
     motivo = input("Motivo: ").strip()
     
-    # Cargar datos
-    datos = cargar_datos()
-    
-    # Buscar venta
-    venta = None
-    for v in datos["ventas"]:
-        if v["id"] == factura_id:
-            venta = v
-            break
-    
-    if not venta:
-        print(f"\n{Colors.RED}✗ Factura #{factura_id} no encontrada{Colors.END}")
-        pausar()
-        return
-    
-    # Validar cantidad
-    if cantidad_devolver > venta["cantidad"]:
-        print(f"{Colors.RED}✗ Cantidad a devolver excede cantidad vendida ({venta['cantidad']}){Colors.END}")
-        pausar()
-        return
-    
-    # Buscar producto en los datos cargados
-    producto = None
-    for p in datos["productos"]:
-        if p["id"] == venta["producto_id"]:
-            producto = p
-            break
-    
-    if not producto:
-        print(f"{Colors.RED}✗ Producto no encontrado{Colors.END}")
+    # Restaurar stock y registrar movimiento
+    try:
+        venta, producto = ejecutar(devolver, factura_id, cantidad_devolver, producto_id=producto_id)
+    except OperacionInvalida as e:
+        print(f"\n{Colors.RED}✗ {e}{Colors.END}")
         pausar()
         return
     
-    # Restaurar stock
-    producto["cantidad"] += cantidad_devolver
-    
-    # Registrar movimiento
-    agregar_movimiento(
-        datos,
-        venta["producto_id"],
-        "Devolución",
-        cantidad_devolver,
-        producto["sede"]
-    )
-    
-    # Guardar cambios (una sola vez al final)
-    guardar_datos(datos)
-    
     print(f"\n{Colors.GREEN}✓ Devolución procesada correctamente{Colors.END}")
     print(f"  Factura: #{factura_id}")
     print(f"  Producto: {producto['nombre']}")
@@ -728,97 +1139,126 @@ def procesar_devolucion():
     
     pausar()
 
+# Nombres de producto mostrados como máximo en la consulta de stock
+MAX_RESULTADOS_STOCK = 20
+
 def consultar_stock():
     """Consultar stock disponible"""
     mostrar_header("CONSULTAR STOCK DISPONIBLE")
     
-    producto_nombre = input(f"{Colors.YELLOW}Nombre del producto (parcial): {Colors.END}").strip().lower()
+    producto_nombre = input(f"{Colors.YELLOW}Nombre del producto (parcial): {Colors.END}").strip()
     
     if not producto_nombre:
         print(f"{Colors.RED}✗ Debes ingresar un nombre{Colors.END}")
         pausar()
         return
     
-    # Cargar todos los productos
-    productos = obtener_todos_productos()
+    # Búsqueda parcial en el índice de nombres, agrupada por producto y sede
+    stock_por_producto = buscar_stock(producto_nombre, MAX_RESULTADOS_STOCK)
     
-    # Filtrar por nombre (búsqueda parcial)
-    productos_filtrados = [p for p in productos if producto_nombre in p["nombre"].lower()]
-    
-    if not productos_filtrados:
+    if not stock_por_producto:
         print(f"\n{Colors.RED}✗ No se encontraron productos con '{producto_nombre}'{Colors.END}")
         pausar()
         return
     
-    # Agrupar por nombre de producto y sede
-    stock_por_producto = {}
-    for p in productos_filtrados:
-        if p["nombre"] not in stock_por_producto:
-            stock_por_producto[p["nombre"]] = {}
-        stock_por_producto[p["nombre"]][p["sede"]] = p["cantidad"]
-    
-    # Mostrar resultados
+    dibujar_stock(stock_por_producto)
+    pausar()
+
+def dibujar_stock(stock_por_producto):
     print(f"\n{Colors.GREEN}Stock disponible:{Colors.END}\n")
-    
     for nombre_prod, sedes in stock_por_producto.items():
         print(f"{Colors.BOLD}{nombre_prod}:{Colors.END}")
-        total = 0
         for sede, cantidad in sedes.items():
             print(f"  📍 Sede {sede}: {cantidad} unidades")
-            total += cantidad
-        print(f"  {Colors.BOLD}Total: {total} unidades{Colors.END}\n")
-    
-    pausar()
+        print(f"  {Colors.BOLD}Total: {sum(sedes.values())} unidades{Colors.END}\n")
 
 # ============================================================
 # EMPLEADOS
 # ============================================================
 
-def gestion_empleados():
-    """Vista principal de gestión de empleados"""
-    mostrar_header("GESTIÓN DE EMPLEADOS")
-    
+def obtener_asistencia_por_sede(empleados, asistencias):
+    """Total de registros y presentes por sede del empleado (el % de
+    asistencia lo calcula modelo_empleados, sin los días de incapacidad)"""
+    # Unión por carnet normalizado, como los índices y los reportes
+    sede_de = {clave_carnet(e["carnet"]): e["sede"] for e in empleados}
+    presente = lambda a: a["presente"]
+    return agrupar(
+        asistencias,
+        lambda a: sede_de.get(clave_carnet(a["empleado_carnet"])),
+        {"total": contar(), "presentes": contar(presente)},
+        grupos=sede_de.values()
+    )
+
+def modelo_empleados(fecha):
+    """Resumen de empleados, incapacidades activas en `fecha`, ausencias y
+    asistencia por sede"""
     datos = cargar_datos()
+    indices = obtener_indices(datos)
     empleados = datos.get("empleados", [])
-    incapacidades = datos.get("incapacidades", [])
     asistencias = datos.get("asistencias", [])
-    
-    total_empleados = len(empleados)
-    total_incapacidades = len(incapacidades)
-    
-    # Calcular ausencias (asistencias con presente=false)
-    total_ausencias = sum(1 for a in asistencias if not a["presente"])
-    
+    # Una sola pasada sobre asistencias, uniendo carnet -> sede por hash
+    por_sede = obtener_asistencia_por_sede(empleados, asistencias)
+    for stats in por_sede.values():
+        stats["justificadas"] = 0
+    sede_de = {clave_carnet(e["carnet"]): e["sede"] for e in empleados}
+    # Ausencias: asistencias con presente=false; justificadas si ese día
+    # el empleado estaba incapacitado (consulta al índice de intervalos)
+    total_ausencias = justificadas = 0
+    for a in asistencias:
+        if a["presente"]:
+            continue
+        total_ausencias += 1
+        if indices.en_incapacidad(a["empleado_carnet"], a["fecha"]):
+            justificadas += 1
+            stats = por_sede.get(sede_de.get(clave_carnet(a["empleado_carnet"])))
+            if stats is not None:
+                stats["justificadas"] += 1
+    # Meses archivados: se suman sus conteos por empleado
+    for carnet, (total, presentes, justificadas_mes) in historico.asistencia_por_carnet(datos).items():
+        total_ausencias += total - presentes
+        justificadas += justificadas_mes
+        stats = por_sede.get(sede_de.get(carnet))
+        if stats is None:
+            continue
+        stats["presentes"] += presentes
+        stats["total"] += total
+        stats["justificadas"] += justificadas_mes
+    # Los días de incapacidad no cuentan en el porcentaje de asistencia
+    for stats in por_sede.values():
+        laborables = stats["total"] - stats["justificadas"]
+        stats["porcentaje"] = stats["presentes"] / laborables * 100 if laborables else 0.0
+    return {
+        "total_empleados": len(empleados),
+        "incapacidades_activas": indices.contar_incapacidades_activas(fecha),
+        "total_ausencias": total_ausencias,
+        "ausencias_justificadas": justificadas,
+        "asistencia_por_sede": sorted(por_sede.items()),
+    }
+
+def dibujar_empleados(modelo):
     print(f"{Colors.BOLD}👥 RESUMEN GENERAL{Colors.END}")
     print("-" * 60)
-    print(f"  {Colors.GREEN}► Total empleados:{Colors.END}           {total_empleados}")
-    print(f"  {Colors.GREEN}► Incapacidades activas:{Colors.END}     {total_incapacidades}")
-    print(f"  {Colors.GREEN}► Ausencias registradas:{Colors.END}     {total_ausencias}")
+    print(f"  {Colors.GREEN}► Total empleados:{Colors.END}           {modelo['total_empleados']}")
+    print(f"  {Colors.GREEN}► Incapacidades activas:{Colors.END}     {modelo['incapacidades_activas']}")
+    print(f"  {Colors.GREEN}► Ausencias registradas:{Colors.END}     {modelo['total_ausencias']}")
+    print(f"  {Colors.GREEN}► Ausencias justificadas:{Colors.END}    {modelo['ausencias_justificadas']}")
     print()
     
-    # Calcular promedio de asistencia por sede
+    # Promedio de asistencia por sede
     print(f"{Colors.BOLD}📊 PROMEDIO DE ASISTENCIA POR SEDE{Colors.END}")
     print("-" * 60)
     
-    asistencias_por_sede = {}
-    for emp in empleados:
-        sede = emp["sede"]
-        if sede not in asistencias_por_sede:
-            asistencias_por_sede[sede] = {"total": 0, "presentes": 0}
-        
-        # Contar asistencias del empleado
-        for asist in asistencias:
-            if asist["empleado_carnet"] == emp["carnet"]:
-                asistencias_por_sede[sede]["total"] += 1
-                if asist["presente"]:
-                    asistencias_por_sede[sede]["presentes"] += 1
-    
-    for sede, stats in sorted(asistencias_por_sede.items()):
-        if stats["total"] > 0:
-            promedio = (stats["presentes"] / stats["total"]) * 100
+    for sede, stats in modelo["asistencia_por_sede"]:
+        if stats["total"] > stats["justificadas"]:
+            promedio = stats["porcentaje"]
             barra = "█" * int(promedio // 5)
             print(f"  {sede:12} │ {barra} {promedio:.1f}%")
     print()
+
+def gestion_empleados():
+    """Vista principal de gestión de empleados"""
+    mostrar_header("GESTIÓN DE EMPLEADOS")
+    dibujar_empleados(modelo_cacheado(modelo_empleados, fecha_hoy()))
     
     print(f"{Colors.BOLD}OPCIONES:{Colors.END}")
     print("1. Buscar empleado por carnet")
@@ -828,14 +1268,31 @@ def gestion_empleados():
     
     opcion = leer_opcion("Selecciona una opción (0-2): ", ["0", "1", "2"])
     
-    if opcion == "0":
-        return
-    elif opcion == "1":
-        buscar_empleado()
-    elif opcion == "2":
-        listar_empleados()
-    
-    gestion_empleados()
+    acciones = {"1": buscar_empleado, "2": listar_empleados}
+    return acciones.get(opcion)
+
+def modelo_empleado(carnet, fecha):
+    """Ficha de un empleado con su total vendido y la incapacidad que tiene
+    vigente en `fecha` (o None); None si no existe"""
+    empleado = obtener_empleado_por_carnet(carnet)
+    if not empleado:
+        return None
+    activas = obtener_incapacidades(fecha, fecha, carnet)
+    return dict(empleado, total_ventas=obtener_total_ventas_empleado(carnet),
+                incapacidad=dict(activas[-1]) if activas else None)
+
+def dibujar_empleado(empleado):
+    print(f"\n{Colors.GREEN}✓ Empleado encontrado:{Colors.END}\n")
+    print(f"  {Colors.BOLD}Carnet: {empleado['carnet']}{Colors.END}")
+    print(f"  Nombre: {empleado['nombre']}")
+    print(f"  Sede: {empleado['sede']}")
+    print(f"  Horas trabajadas: {empleado['horas_trabajadas']} hrs")
+    print(f"  Ventas realizadas: {empleado['ventas_realizadas']}")
+    print(f"  {Colors.BOLD}Total vendido: ${empleado['total_ventas']:.2f}{Colors.END}")
+    incapacidad = empleado["incapacidad"]
+    if incapacidad:
+        print(f"  {Colors.YELLOW}Incapacitado hasta {incapacidad.get('fecha_fin') or 'nuevo aviso'}"
+              f" ({incapacidad.get('motivo') or 'sin motivo'}){Colors.END}")
 
 def buscar_empleado():
     """Buscar y mostrar información de un empleado por carnet"""
@@ -848,44 +1305,50 @@ def buscar_empleado():
         pausar()
         return
     
-    empleado = obtener_empleado_por_carnet(carnet)
+    empleado = modelo_cacheado(modelo_empleado, carnet, fecha_hoy())
     
     if not empleado:
         print(f"\n{Colors.RED}✗ Empleado con carnet {carnet} no encontrado{Colors.END}")
         pausar()
         return
     
-    # Obtener ventas del empleado
-    datos = cargar_datos()
-    ventas_empleado = [v for v in datos.get("ventas", []) if v.get("empleado_carnet") == carnet]
-    total_ventas = sum(v["total"] for v in ventas_empleado)
-    
-    print(f"\n{Colors.GREEN}✓ Empleado encontrado:{Colors.END}\n")
-    print(f"  {Colors.BOLD}Carnet: {empleado['carnet']}{Colors.END}")
-    print(f"  Nombre: {empleado['nombre']}")
-    print(f"  Sede: {empleado['sede']}")
-    print(f"  Horas trabajadas: {empleado['horas_trabajadas']} hrs")
-    print(f"  Ventas realizadas: {empleado['ventas_realizadas']}")
-    print(f"  {Colors.BOLD}Total vendido: ${total_ventas:.2f}{Colors.END}")
-    
+    dibujar_empleado(empleado)
     pausar()
 
+def modelo_lista_empleados():
+    """Copia de los datos de todos los empleados para la lista"""
+    return [dict(e) for e in listar_empleados_sede()]
+
+def dibujar_lista_empleados(empleados):
+    print(f"{Colors.BOLD}{'Carnet':<10} {'Nombre':<25} {'Sede':<12} {'Horas':<8} {'Ventas':<8}{Colors.END}")
+    print("-" * 70)
+    
+    for emp in empleados:
+        print(f"{emp['carnet']:<10} {emp['nombre']:<25} {emp['sede']:<12} {emp['horas_trabajadas']:<8} {emp['ventas_realizadas']:<8}")
+
 def listar_empleados():
     """Lista todos los empleados"""
     mostrar_header("LISTA DE EMPLEADOS")
     
-    datos = cargar_datos()
-    empleados = datos.get("empleados", [])
+    empleados = modelo_cacheado(modelo_lista_empleados)
     
     if not empleados:
         print(f"{Colors.RED}No hay empleados registrados{Colors.END}")
         pausar()
         return
     
-    print(f"{Colors.BOLD}{'Carnet':<10} {'Nombre':<25} {'Sede':<12} {'Horas':<8} {'Ventas':<8}{Colors.END}")
-    print("-" * 70)
-    
-    for emp in empleados:
-        print(f"{emp['carnet']:<10} {emp['nombre']:<25} {emp['sede']:<12} {emp['horas_trabajadas']:<8} {emp['ventas_realizadas']:<8}")
-    
+    dibujar_lista_empleados(empleados)
     pausar()
+
+# ============================================================
+# ARGUMENTOS REMOTOS
+# ============================================================
+
+# Constructores de view-models que el servidor acepta en `modelo_cacheado`
+MODELOS = {f.__name__: f for f in (
+    modelo_dashboard, modelo_inventario, modelo_resultados_inventario, modelo_ventas,
+    modelo_empleados, modelo_empleado, modelo_lista_empleados
+)}
+
+# Funciones remotas cuyo primer argumento es otra función, enviada por nombre
+FUNCIONES_ARGUMENTO = {"ejecutar": MUTACIONES, "modelo_cacheado": MODELOS}
@@ -0,0 +1,230 @@
+"""
+KYREL - Histórico por Meses
+Archiva los meses cerrados de ventas, movimientos y asistencias en un
+archivo JSON por mes (carpeta `<archivo de datos>.historico/`) para que los
+datos activos solo lleven el mes en curso.
+
+Los datos activos guardan en la clave "historico" el manifiesto de los meses
+archivados: su archivo, los rangos de IDs de ventas y movimientos que
+contiene y un resumen precalculado (totales por día, producto, empleado y
+cliente, y asistencia por empleado con sus ausencias justificadas por
+incapacidad). Con ese resumen los agregados y la
+analítica siguen contando todo el historial sin abrir los archivos, y con
+los rangos de IDs una factura archivada se busca abriendo solo su mes.
+"""
+
+import os
+import json
+from collections import OrderedDict
+
+from agregados import es_inicio_factura
+from indices import PARTICIONES_FECHA, clave_particion
+
+CLAVE = "historico"
+COLECCIONES = ("ventas", "movimientos", "asistencias")
+
+# Archivos de meses que se mantienen leídos en memoria
+MAX_MESES_EN_MEMORIA = 4
+
+
+def directorio_historico(ruta_datos):
+    return ruta_datos + ".historico"
+
+
+def meses_archivados(datos):
+    """Resúmenes de los meses archivados: {AAAA-MM: resumen}"""
+    return datos.get(CLAVE, {}).get("meses", {})
+
+
+# ============================================================
+# RESÚMENES
+# ============================================================
+
+def resumir_mes(registros, en_incapacidad=None):
+    """Resumen precalculado de las colecciones de un mes; `en_incapacidad`
+    (carnet, fecha) marca las ausencias justificadas"""
+    resumen = {"cantidades": {c: len(registros.get(c, [])) for c in COLECCIONES}, "rangos": {}}
+    for coleccion in ("ventas", "movimientos"):
+        ids = [r["id"] for r in registros.get(coleccion, [])]
+        if ids:
+            resumen["rangos"][coleccion] = [min(ids), max(ids)]
+
+    por_dia, por_producto, por_empleado, primeras = {}, {}, {}, {}
+    total = unidades = facturas = 0
+    for venta in registros.get("ventas", []):
+        cantidad = venta.get("cantidad", 0)
+        inicio = 1 if es_inicio_factura(venta) else 0
+        dia = por_dia.setdefault(venta["fecha"], [0.0, 0, 0])
+        dia[0] += venta["total"]
+        dia[1] += inicio
+        dia[2] += cantidad
+        producto = por_producto.setdefault(venta.get("producto_id"), [0.0, 0])
+        producto[0] += venta["total"]
+        producto[1] += cantidad
+        carnet = (venta.get("empleado_carnet") or "").upper()
+        por_empleado[carnet] = por_empleado.get(carnet, 0.0) + venta["total"]
+        cliente = (venta.get("cliente") or "").strip().casefold()
+        if cliente and (cliente not in primeras or venta["fecha"] < primeras[cliente]):
+            primeras[cliente] = venta["fecha"]
+        total += venta["total"]
+        unidades += cantidad
+        facturas += inicio
+    resumen["ventas"] = {
+        "total": round(total, 2),
+        "facturas": facturas,
+        "unidades": unidades,
+        "por_dia": {f: [round(t, 2), n, u] for f, (t, n, u) in sorted(por_dia.items())},
+        # Listas [producto_id, ingresos, unidades]: los IDs no son claves JSON
+        "por_producto": [[pid, round(i, 2), u] for pid, (i, u) in por_producto.items()],
+        "por_empleado": {c: round(t, 2) for c, t in por_empleado.items()},
+        "primeras_compras": primeras,
+    }
+
+    asistencia = {}
+    for registro in registros.get("asistencias", []):
+        carnet = (registro.get("empleado_carnet") or "").upper()
+        cuenta = asistencia.setdefault(carnet, [0, 0, 0])
+        cuenta[0] += 1
+        if registro["presente"]:
+            cuenta[1] += 1
+        elif en_incapacidad is not None and en_incapacidad(carnet, registro["fecha"]):
+            cuenta[2] += 1
+    resumen["asistencias"] = {"por_carnet": asistencia}
+    return resumen
+
+
+def total_ventas_empleado(datos, carnet):
+    """Monto vendido por un empleado en los meses archivados"""
+    carnet = (carnet or "").upper()
+    return sum(m["ventas"]["por_empleado"].get(carnet, 0) for m in meses_archivados(datos).values())
+
+
+def asistencia_por_carnet(datos):
+    """{carnet: [registros, presentes, ausencias justificadas]} de los meses archivados"""
+    cuentas = {}
+    for mes in meses_archivados(datos).values():
+        # Los meses archivados antes de contar las justificadas traen solo dos valores
+        for carnet, (total, presentes, *justificadas) in mes["asistencias"]["por_carnet"].items():
+            cuenta = cuentas.setdefault(carnet, [0, 0, 0])
+            cuenta[0] += total
+            cuenta[1] += presentes
+            cuenta[2] += sum(justificadas)
+    return cuentas
+
+
+# ============================================================
+# ARCHIVOS DE MES
+# ============================================================
+
+_leidos = OrderedDict()
+
+def leer_mes(directorio, archivo):
+    """Registros de un archivo de mes (los últimos leídos quedan en memoria)"""
+    ruta = os.path.join(directorio, archivo)
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return {}
+    clave = (ruta, st.st_mtime_ns, st.st_size)
+    if clave in _leidos:
+        _leidos.move_to_end(clave)
+        return _leidos[clave]
+    with open(ruta, 'r', encoding='utf-8') as f:
+        registros = json.load(f)
+    _leidos[clave] = registros
+    if len(_leidos) > MAX_MESES_EN_MEMORIA:
+        _leidos.popitem(last=False)
+    return registros
+
+
+def buscar(directorio, manifiesto, coleccion, registro_id):
+    """Registro archivado por ID, abriendo solo los meses cuyo rango lo incluye"""
+    for mes in manifiesto.get("meses", {}).values():
+        rango = mes["rangos"].get(coleccion)
+        if not rango or not rango[0] <= registro_id <= rango[1]:
+            continue
+        for registro in leer_mes(directorio, mes["archivo"]).get(coleccion, []):
+            if registro["id"] == registro_id:
+                return registro
+    return None
+
+
+def en_rango(directorio, manifiesto, coleccion, desde=None, hasta=None, particion=None):
+    """Registros archivados entre dos fechas (ver Indices.en_rango), en
+    orden de fecha, abriendo solo los meses del rango"""
+    campo = PARTICIONES_FECHA[coleccion]
+    buscada = None if particion is None else clave_particion(coleccion, particion)
+    resultado = []
+    for mes, resumen in manifiesto.get("meses", {}).items():
+        if (desde and mes < desde[:7]) or (hasta and mes[:len(hasta)] > hasta[:7]):
+            continue
+        for registro in leer_mes(directorio, resumen["archivo"]).get(coleccion, []):
+            fecha = registro["fecha"]
+            if (desde and fecha < desde) or (hasta and fecha[:len(hasta)] > hasta):
+                continue
+            if buscada is not None and clave_particion(coleccion, registro.get(campo)) != buscada:
+                continue
+            resultado.append(registro)
+    resultado.sort(key=lambda registro: registro["fecha"])
+    return resultado
+
+
+def _identidad(coleccion, registro):
+    if coleccion == "asistencias":
+        return (registro["fecha"], (registro.get("empleado_carnet") or "").upper())
+    return registro["id"]
+
+
+def _escribir_json(ruta, contenido):
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+# ============================================================
+# ARCHIVAR
+# ============================================================
+
+def archivar(almacen, hasta):
+    """Archiva los registros de los meses anteriores a `hasta` (AAAA-MM).
+
+    Primero se escriben los archivos de mes (sumando a los ya archivados,
+    sin duplicar registros) y después los datos activos sin esos registros
+    y con el manifiesto, como un punto de control. Devuelve
+    {mes: {colección: registros archivados}}.
+    """
+    directorio = directorio_historico(almacen.ruta)
+    with almacen.bloqueo():
+        datos = almacen.cargar()
+        por_mes = {}
+        for coleccion in COLECCIONES:
+            for registro in datos.get(coleccion, []):
+                mes = registro["fecha"][:7]
+                if mes < hasta:
+                    por_mes.setdefault(mes, {c: [] for c in COLECCIONES})[coleccion].append(registro)
+        if not por_mes:
+            return {}
+
+        os.makedirs(directorio, exist_ok=True)
+        manifiesto = datos.setdefault(CLAVE, {"meses": {}})
+        en_incapacidad = almacen.indices_de(datos).en_incapacidad
+        for mes, nuevos in sorted(por_mes.items()):
+            archivo = f"{mes}.json"
+            registros = leer_mes(directorio, archivo) if mes in manifiesto["meses"] else {}
+            combinados = {}
+            for coleccion in COLECCIONES:
+                existentes = list(registros.get(coleccion, []))
+                vistos = {_identidad(coleccion, r) for r in existentes}
+                existentes += [r for r in nuevos[coleccion] if _identidad(coleccion, r) not in vistos]
+                combinados[coleccion] = existentes
+            _escribir_json(os.path.join(directorio, archivo), dict(mes=mes, **combinados))
+            manifiesto["meses"][mes] = dict(resumir_mes(combinados, en_incapacidad), archivo=archivo)
+        manifiesto["meses"] = dict(sorted(manifiesto["meses"].items()))
+
+        for coleccion in COLECCIONES:
+            datos[coleccion] = [r for r in datos.get(coleccion, []) if r["fecha"][:7] >= hasta]
+        almacen.reescribir(datos)
+        # Los índices aún apuntan a los registros archivados
+        almacen.invalidar()
+    return {mes: {c: len(r) for c, r in nuevos.items()} for mes, nuevos in por_mes.items()}
@@ -0,0 +1,264 @@
+"""
+KYREL - Importación por Lotes
+Carga productos, movimientos, ventas y devoluciones desde CSV o JSONL sin
+pasar por el menú: valida cada fila contra los índices del almacén, aplica
+las válidas en memoria y confirma todo en una sola escritura.
+
+Cada fila lleva un campo `tipo`:
+
+    producto     nombre, categoria, sede, cantidad, precio
+    movimiento   producto_id, movimiento (Entrada/Salida), cantidad
+    venta        cliente, empleado_carnet, producto_id, cantidad
+    devolucion   factura_id, cantidad
+
+y opcionalmente `fecha` (AAAA-MM-DD; por defecto, hoy).
+
+Uso:
+    python importar.py ventas_pos.csv
+    python importar.py cierre.jsonl --rechazos rechazos.jsonl
+    python importar.py cierre.csv --simular
+"""
+
+import sys
+import csv
+import json
+import time
+import argparse
+from datetime import date
+
+import funciones
+from funciones import OperacionInvalida, crear_producto, mover_stock, vender, devolver
+
+# Rechazos que se muestran en pantalla (el resto va solo al archivo)
+MAX_RECHAZOS_PANTALLA = 20
+
+
+# ============================================================
+# LECTURA
+# ============================================================
+
+def leer_csv(archivo):
+    """Genera (línea, fila) de un CSV con encabezado"""
+    lector = csv.DictReader(archivo)
+    for fila in lector:
+        yield lector.line_num, fila
+
+def leer_jsonl(archivo):
+    """Genera (línea, fila) de un archivo JSON por línea"""
+    for numero, linea in enumerate(archivo, 1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError as e:
+            yield numero, {"_error": f"JSON inválido: {e}"}
+            continue
+        yield numero, fila if isinstance(fila, dict) else {"_error": "La línea no es un objeto JSON"}
+
+LECTORES = {
+    "csv": leer_csv,
+    "jsonl": leer_jsonl,
+}
+
+def detectar_formato(ruta):
+    """Formato según la extensión del archivo"""
+    return "jsonl" if ruta.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+# ============================================================
+# CONVERSIÓN Y APLICACIÓN
+# ============================================================
+
+def _texto(fila, campo):
+    valor = fila.get(campo)
+    return "" if valor is None else str(valor).strip()
+
+def _entero(fila, campo):
+    texto = _texto(fila, campo)
+    try:
+        return int(texto)
+    except ValueError:
+        raise OperacionInvalida(f"'{campo}' debe ser un entero (valor: '{texto}')")
+
+def _decimal(fila, campo):
+    texto = _texto(fila, campo)
+    try:
+        return float(texto)
+    except ValueError:
+        raise OperacionInvalida(f"'{campo}' debe ser numérico (valor: '{texto}')")
+
+def _fecha(fila):
+    texto = _texto(fila, "fecha")
+    if not texto:
+        return None
+    try:
+        return date.fromisoformat(texto).isoformat()
+    except ValueError:
+        raise OperacionInvalida(f"'fecha' debe tener formato AAAA-MM-DD (valor: '{texto}')")
+
+def importar_producto(datos, fila):
+    return crear_producto(
+        datos, _texto(fila, "nombre"), _texto(fila, "categoria"), _texto(fila, "sede"),
+        _entero(fila, "cantidad"), _decimal(fila, "precio"), _fecha(fila)
+    )
+
+def importar_movimiento(datos, fila):
+    tipo = _texto(fila, "movimiento").capitalize()
+    return mover_stock(datos, _entero(fila, "producto_id"), tipo, _entero(fila, "cantidad"), _fecha(fila))
+
+def importar_venta(datos, fila):
+    return vender(
+        datos, _texto(fila, "cliente"), _texto(fila, "empleado_carnet"),
+        _entero(fila, "producto_id"), _entero(fila, "cantidad"), _fecha(fila)
+    )
+
+def importar_devolucion(datos, fila):
+    return devolver(datos, _entero(fila, "factura_id"), _entero(fila, "cantidad"), _fecha(fila))
+
+IMPORTADORES = {
+    "producto": importar_producto,
+    "movimiento": importar_movimiento,
+    "venta": importar_venta,
+    "devolucion": importar_devolucion,
+}
+
+def aplicar_fila(datos, fila):
+    """Aplica una fila en memoria; lanza OperacionInvalida si se rechaza.
+
+    Las conversiones y validaciones ocurren antes de tocar los datos, así
+    que una fila rechazada no deja cambios a medias.
+    """
+    if "_error" in fila:
+        raise OperacionInvalida(fila["_error"])
+    tipo = _texto(fila, "tipo").lower()
+    importador = IMPORTADORES.get(tipo)
+    if importador is None:
+        raise OperacionInvalida(f"Tipo de fila desconocido: '{tipo}'")
+    importador(datos, fila)
+    return tipo
+
+
+def importar(filas, simular=False):
+    """Aplica las filas `(línea, fila)` y confirma una sola vez al final.
+
+    Todo el lote corre bajo el cerrojo del almacén: las filas no se pueden
+    volver a leer, así que en lugar de reintentar ante un conflicto se
+    impide que otro terminal confirme entre medio.
+
+    Devuelve un resumen con conteos por tipo, rechazos y tiempos.
+    """
+    inicio = time.perf_counter()
+    almacen = funciones.obtener_almacen()
+    aplicadas = {}
+    rechazos = []
+    leidas = 0
+
+    with almacen.bloqueo():
+        datos = funciones.cargar_datos()
+        for linea, fila in filas:
+            leidas += 1
+            try:
+                tipo = aplicar_fila(datos, fila)
+            except OperacionInvalida as e:
+                rechazos.append({"linea": linea, "motivo": str(e), "fila": fila})
+                continue
+            aplicadas[tipo] = aplicadas.get(tipo, 0) + 1
+
+        fin_aplicacion = time.perf_counter()
+        if simular or not aplicadas:
+            # Descartar los cambios en memoria: se vuelven a leer de disco
+            almacen.invalidar()
+            guardado = True
+        else:
+            guardado = funciones.guardar_datos(datos)
+    fin = time.perf_counter()
+
+    return {
+        "leidas": leidas,
+        "aplicadas": aplicadas,
+        "rechazos": rechazos,
+        "guardado": guardado,
+        "simulado": simular,
+        "segundos_aplicacion": fin_aplicacion - inicio,
+        "segundos_total": fin - inicio,
+    }
+
+
+# ============================================================
+# REPORTE
+# ============================================================
+
+def mostrar_reporte(resumen):
+    C = funciones.Colors
+    total_aplicadas = sum(resumen["aplicadas"].values())
+    segundos = resumen["segundos_total"]
+    velocidad = resumen["leidas"] / segundos if segundos > 0 else 0
+
+    print(f"{C.BOLD}KYREL - Importación{' (simulada)' if resumen['simulado'] else ''}{C.END}")
+    print(f"  Filas leídas:     {resumen['leidas']}")
+    print(f"  Filas aplicadas:  {total_aplicadas}")
+    for tipo, cantidad in sorted(resumen["aplicadas"].items()):
+        print(f"    {tipo:<14} {cantidad}")
+    print(f"  Filas rechazadas: {len(resumen['rechazos'])}")
+    print(f"  Tiempo:           {segundos:.3f} s "
+          f"(aplicación {resumen['segundos_aplicacion']:.3f} s)")
+    print(f"  Rendimiento:      {velocidad:,.0f} filas/s")
+
+    if resumen["rechazos"]:
+        print(f"\n{C.RED}Filas rechazadas:{C.END}")
+        for rechazo in resumen["rechazos"][:MAX_RECHAZOS_PANTALLA]:
+            print(f"  línea {rechazo['linea']}: {rechazo['motivo']}")
+        restantes = len(resumen["rechazos"]) - MAX_RECHAZOS_PANTALLA
+        if restantes > 0:
+            print(f"  ... y {restantes} más")
+
+    if resumen["simulado"]:
+        print(f"\n{C.YELLOW}Simulación: no se guardó ningún cambio{C.END}")
+    elif total_aplicadas and resumen["guardado"]:
+        print(f"\n{C.GREEN}✓ Cambios confirmados en una sola escritura{C.END}")
+    elif total_aplicadas:
+        print(f"\n{C.RED}✗ No se pudieron guardar los cambios{C.END}")
+
+def guardar_rechazos(ruta, rechazos):
+    """Escribe los rechazos como JSON por línea (línea, motivo y fila original)"""
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for rechazo in rechazos:
+            f.write(json.dumps(rechazo, ensure_ascii=False) + "\n")
+
+
+# ============================================================
+# PUNTO DE ENTRADA
+# ============================================================
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="importar", description="KYREL - Importación por lotes")
+    parser.add_argument("archivo", help="Archivo CSV o JSONL a importar ('-' para la entrada estándar)")
+    parser.add_argument("--formato", choices=sorted(LECTORES), help="Formato (por defecto, según la extensión)")
+    parser.add_argument("--rechazos", help="Archivo JSONL donde guardar las filas rechazadas")
+    parser.add_argument("--simular", action="store_true", help="Validar y aplicar sin guardar")
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    formato = args.formato or ("csv" if args.archivo == "-" else detectar_formato(args.archivo))
+
+    if args.archivo == "-":
+        resumen = importar(LECTORES[formato](sys.stdin), args.simular)
+    else:
+        with open(args.archivo, 'r', encoding='utf-8', newline='') as archivo:
+            resumen = importar(LECTORES[formato](archivo), args.simular)
+
+    mostrar_reporte(resumen)
+    if args.rechazos:
+        guardar_rechazos(args.rechazos, resumen["rechazos"])
+        print(f"Rechazos guardados en {args.rechazos}")
+
+    if not resumen["guardado"]:
+        return 1
+    return 2 if resumen["rechazos"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
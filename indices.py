@@ -0,0 +1,374 @@
+"""
+KYREL - Índices Secundarios
+Búsquedas por clave sobre los datos cargados sin recorrer las listas completas
+"""
+
+import bisect
+import unicodedata
+
+
+def clave_carnet(carnet):
+    """Normaliza un carnet para usarlo como clave (sin distinguir mayúsculas)"""
+    return (carnet or "").upper()
+
+
+def normalizar_texto(texto):
+    """Minúsculas y sin tildes, para comparar nombres ("Camíseta" -> "camiseta")"""
+    descompuesto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def trigramas(texto):
+    """Conjunto de subcadenas de 3 caracteres de un texto ya normalizado"""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNombres:
+    """Índice de trigramas sobre los nombres de productos.
+
+    Cada trigrama del nombre normalizado apunta a los productos que lo
+    contienen; una búsqueda intersecta las listas de los trigramas del
+    texto (empezando por la más corta) y solo compara la subcadena contra
+    esos candidatos. Textos de menos de 3 letras comparan contra los
+    nombres ya normalizados, sin recalcularlos.
+    """
+
+    def __init__(self):
+        self.por_trigrama = {}
+        self.normalizados = {}
+        self.productos = {}
+
+    def agregar(self, producto):
+        normalizado = normalizar_texto(producto["nombre"])
+        self.productos[producto["id"]] = producto
+        self.normalizados[producto["id"]] = normalizado
+        for trigrama in trigramas(normalizado):
+            self.por_trigrama.setdefault(trigrama, set()).add(producto["id"])
+
+    def _candidatos(self, texto):
+        claves = trigramas(texto)
+        if not claves:
+            return self.normalizados.keys()
+        listas = sorted((self.por_trigrama.get(t, set()) for t in claves), key=len)
+        return set.intersection(*listas)
+
+    def buscar(self, texto):
+        """Productos cuyo nombre contiene `texto` (sin distinguir tildes ni
+        mayúsculas), del más al menos relevante: nombre exacto, nombre que
+        empieza por el texto, palabra que empieza por el texto y, por
+        último, coincidencia en medio de una palabra."""
+        texto = normalizar_texto(texto.strip())
+        resultados = []
+        for producto_id in self._candidatos(texto):
+            nombre = self.normalizados[producto_id]
+            posicion = nombre.find(texto)
+            if posicion < 0:
+                continue
+            if nombre == texto:
+                rango = 0
+            elif posicion == 0:
+                rango = 1
+            elif not nombre[posicion - 1].isalnum():
+                rango = 2
+            else:
+                rango = 3
+            resultados.append((rango, posicion, nombre, producto_id))
+        resultados.sort()
+        return [self.productos[r[3]] for r in resultados]
+
+
+class IndiceFechas:
+    """Registros ordenados por fecha (AAAA-MM-DD) para consultas por rango.
+
+    Los registros suelen llegar en orden de fecha, así que agregar uno es
+    anexarlo; si llega uno con fecha anterior al último, la lista se
+    reordena (una sola vez) en la siguiente consulta. Un rango se resuelve
+    con dos búsquedas binarias: O(log n + k).
+    """
+
+    def __init__(self):
+        self.fechas = []
+        self.registros = []
+        self.ordenado = True
+
+    def agregar(self, registro):
+        fecha = registro["fecha"]
+        if self.fechas and fecha < self.fechas[-1]:
+            self.ordenado = False
+        self.fechas.append(fecha)
+        self.registros.append(registro)
+
+    def _ordenar(self):
+        # Orden estable: a igual fecha se conserva el orden de llegada
+        orden = sorted(range(len(self.fechas)), key=self.fechas.__getitem__)
+        self.fechas = [self.fechas[i] for i in orden]
+        self.registros = [self.registros[i] for i in orden]
+        self.ordenado = True
+
+    def rango(self, desde=None, hasta=None):
+        """Registros con desde <= fecha <= hasta (extremos opcionales; pueden
+        ser AAAA-MM-DD, AAAA-MM o AAAA)"""
+        if not self.ordenado:
+            self._ordenar()
+        inicio = bisect.bisect_left(self.fechas, desde) if desde else 0
+        # Los extremos pueden ser prefijos: "2025-12" hasta incluye todo diciembre
+        fin = bisect.bisect_right(self.fechas, hasta + "\uffff") if hasta else len(self.fechas)
+        return self.registros[inicio:fin]
+
+
+class IndiceIntervalos:
+    """Intervalos de fechas [inicio, fin] (inclusive) para saber qué registros
+    están vigentes en un día o se cruzan con un rango.
+
+    Los intervalos se ordenan por inicio y forman un árbol binario implícito:
+    el nodo de cada tramo de la lista es su elemento central y guarda el
+    mayor fin del tramo. Una consulta descarta con una búsqueda binaria los
+    que empiezan después del rango y solo baja por los tramos cuyo mayor fin
+    lo alcanza: O(log n) por resultado. Contar los vigentes en un día son dos
+    búsquedas binarias (inicios y fines ordenados): O(log n). Un intervalo
+    sin fin sigue vigente. Las altas marcan el índice para reconstruirlo en
+    la siguiente consulta.
+    """
+
+    def __init__(self, inicio="fecha_inicio", fin="fecha_fin"):
+        self.campo_inicio = inicio
+        self.campo_fin = fin
+        self.registros = []
+        self.inicios = []
+        self.fines = []
+        self.fines_ordenados = []
+        self.fin_maximo = []
+        self.vigente = True
+
+    def _fin(self, registro):
+        return registro.get(self.campo_fin) or "\uffff"
+
+    def agregar(self, registro):
+        self.registros.append(registro)
+        self.vigente = False
+
+    def __len__(self):
+        return len(self.registros)
+
+    def _construir(self):
+        self.registros.sort(key=lambda registro: registro[self.campo_inicio])
+        self.inicios = [r[self.campo_inicio] for r in self.registros]
+        self.fines = [self._fin(r) for r in self.registros]
+        self.fines_ordenados = sorted(self.fines)
+        self.fin_maximo = list(self.fines)
+        self._maximo(0, len(self.fines))
+        self.vigente = True
+
+    def _maximo(self, bajo, alto):
+        # Mayor fin del tramo [bajo, alto), guardado en su elemento central
+        if bajo >= alto:
+            return ""
+        medio = (bajo + alto) // 2
+        self.fin_maximo[medio] = max(self.fines[medio], self._maximo(bajo, medio),
+                                     self._maximo(medio + 1, alto))
+        return self.fin_maximo[medio]
+
+    def solapados(self, desde=None, hasta=None):
+        """Registros con inicio <= hasta y fin >= desde, en orden de inicio
+        (extremos opcionales; pueden ser AAAA-MM-DD, AAAA-MM o AAAA)"""
+        if not self.vigente:
+            self._construir()
+        limite = bisect.bisect_right(self.inicios, hasta + "\uffff") if hasta else len(self.inicios)
+        resultado = []
+        self._recorrer(0, len(self.inicios), limite, desde or "", resultado)
+        return resultado
+
+    def _recorrer(self, bajo, alto, limite, desde, resultado):
+        if bajo >= min(alto, limite):
+            return
+        medio = (bajo + alto) // 2
+        if self.fin_maximo[medio] < desde:
+            return
+        self._recorrer(bajo, medio, limite, desde, resultado)
+        if medio < limite:
+            if self.fines[medio] >= desde:
+                resultado.append(self.registros[medio])
+            self._recorrer(medio + 1, alto, limite, desde, resultado)
+
+    def vigentes(self, fecha):
+        """Registros vigentes el día `fecha`"""
+        return self.solapados(fecha, fecha)
+
+    def contar(self, fecha):
+        """Cuántos registros están vigentes el día `fecha` (AAAA-MM-DD)"""
+        if not self.vigente:
+            self._construir()
+        # Los que empezaron hasta ese día menos los que ya habían terminado
+        return bisect.bisect_right(self.inicios, fecha) - bisect.bisect_left(self.fines_ordenados, fecha)
+
+
+# Colecciones con índice por fecha y el campo por el que se particionan
+PARTICIONES_FECHA = {
+    "ventas": "empleado_carnet",
+    "movimientos": "sede",
+    "asistencias": "empleado_carnet",
+}
+
+
+def clave_particion(coleccion, valor):
+    """Valor de partición normalizado (carnet en mayúsculas, sede sin mayúsculas)"""
+    if PARTICIONES_FECHA[coleccion] == "empleado_carnet":
+        return clave_carnet(valor)
+    return (valor or "").casefold()
+
+
+class Indices:
+    """Índices en memoria sobre una copia de los datos.
+
+    Guardan referencias a los mismos diccionarios de `datos`, de modo que
+    los cambios de stock se ven sin reindexar; solo las altas de registros
+    deben notificarse con los métodos `agregar_*`.
+    """
+
+    def __init__(self, datos):
+        self.datos = datos
+        self.productos_por_id = {}
+        self.productos_por_sede_categoria = {}
+        self.empleados_por_carnet = {}
+        self.ventas_por_id = {}
+        self.ventas_por_carnet = {}
+        self.asistencias_por_carnet = {}
+        self.movimientos_por_producto = {}
+        self.nombres = IndiceNombres()
+        # Índices por fecha, construidos la primera vez que se consultan:
+        # coleccion -> (IndiceFechas de todo, {partición: IndiceFechas})
+        self.por_fecha = {}
+        # Índice de intervalos de incapacidades, también perezoso:
+        # (IndiceIntervalos de todas, {carnet: IndiceIntervalos})
+        self.incapacidades = None
+
+        for producto in datos.get("productos", []):
+            self.agregar_producto(producto)
+        for empleado in datos.get("empleados", []):
+            self.agregar_empleado(empleado)
+        for venta in datos.get("ventas", []):
+            self.agregar_venta(venta)
+        for asistencia in datos.get("asistencias", []):
+            self.agregar_asistencia(asistencia)
+        for movimiento in datos.get("movimientos", []):
+            self.agregar_movimiento(movimiento)
+
+    def agregar(self, coleccion, registro):
+        """Indexa un registro nuevo de cualquier colección"""
+        metodo = {
+            "productos": self.agregar_producto,
+            "empleados": self.agregar_empleado,
+            "ventas": self.agregar_venta,
+            "asistencias": self.agregar_asistencia,
+            "movimientos": self.agregar_movimiento,
+            "incapacidades": self.agregar_incapacidad,
+        }.get(coleccion)
+        if metodo is not None:
+            metodo(registro)
+
+    def en_rango(self, coleccion, desde=None, hasta=None, particion=None):
+        """Registros de ventas, movimientos o asistencias entre dos fechas
+        (inclusive), opcionalmente solo los de una partición: carnet del
+        empleado para ventas y asistencias, sede para movimientos"""
+        if coleccion not in self.por_fecha:
+            self.por_fecha[coleccion] = (IndiceFechas(), {})
+            for registro in self.datos.get(coleccion, []):
+                self._indexar_fecha(coleccion, registro)
+        todos, particiones = self.por_fecha[coleccion]
+        if particion is not None:
+            todos = particiones.get(clave_particion(coleccion, particion))
+            if todos is None:
+                return []
+        return todos.rango(desde, hasta)
+
+    def _indexar_fecha(self, coleccion, registro):
+        indices = self.por_fecha.get(coleccion)
+        if indices is None:
+            return
+        todos, particiones = indices
+        todos.agregar(registro)
+        clave = clave_particion(coleccion, registro.get(PARTICIONES_FECHA[coleccion]))
+        if clave not in particiones:
+            particiones[clave] = IndiceFechas()
+        particiones[clave].agregar(registro)
+
+    def _indice_incapacidades(self, carnet=None):
+        if self.incapacidades is None:
+            self.incapacidades = (IndiceIntervalos(), {})
+            for incapacidad in self.datos.get("incapacidades", []):
+                self._indexar_incapacidad(incapacidad)
+        todas, por_carnet = self.incapacidades
+        if carnet is None:
+            return todas
+        return por_carnet.get(clave_carnet(carnet))
+
+    def incapacidades_en_rango(self, desde=None, hasta=None, carnet=None):
+        """Incapacidades que se cruzan con el rango de fechas, opcionalmente
+        solo las de un empleado, en orden de fecha de inicio"""
+        indice = self._indice_incapacidades(carnet)
+        return indice.solapados(desde, hasta) if indice is not None else []
+
+    def incapacidades_activas(self, fecha, carnet=None):
+        """Incapacidades vigentes el día `fecha`"""
+        return self.incapacidades_en_rango(fecha, fecha, carnet)
+
+    def contar_incapacidades_activas(self, fecha):
+        """Número de incapacidades vigentes el día `fecha`"""
+        return self._indice_incapacidades().contar(fecha)
+
+    def en_incapacidad(self, carnet, fecha):
+        """Si el empleado tenía una incapacidad vigente el día `fecha`"""
+        indice = self._indice_incapacidades(carnet)
+        return indice is not None and indice.contar(fecha) > 0
+
+    def _indexar_incapacidad(self, incapacidad):
+        todas, por_carnet = self.incapacidades
+        todas.agregar(incapacidad)
+        carnet = clave_carnet(incapacidad.get("empleado_carnet"))
+        if carnet not in por_carnet:
+            por_carnet[carnet] = IndiceIntervalos()
+        por_carnet[carnet].agregar(incapacidad)
+
+    def buscar(self, coleccion, clave):
+        """Busca un registro por su clave (ID o carnet)"""
+        if coleccion == "productos":
+            return self.productos_por_id.get(clave)
+        if coleccion == "ventas":
+            return self.ventas_por_id.get(clave)
+        if coleccion == "empleados":
+            return self.empleados_por_carnet.get(clave_carnet(clave))
+        return None
+
+    def agregar_producto(self, producto):
+        """Indexa un producto nuevo por ID, por (sede, categoría) y por nombre"""
+        self.productos_por_id[producto["id"]] = producto
+        clave = (producto["sede"], producto["categoria"])
+        self.productos_por_sede_categoria.setdefault(clave, []).append(producto)
+        self.nombres.agregar(producto)
+
+    def agregar_empleado(self, empleado):
+        """Indexa un empleado por carnet"""
+        self.empleados_por_carnet[clave_carnet(empleado["carnet"])] = empleado
+
+    def agregar_venta(self, venta):
+        """Indexa una venta por ID y por carnet del empleado"""
+        self.ventas_por_id[venta["id"]] = venta
+        carnet = clave_carnet(venta.get("empleado_carnet"))
+        self.ventas_por_carnet.setdefault(carnet, []).append(venta)
+        self._indexar_fecha("ventas", venta)
+
+    def agregar_asistencia(self, asistencia):
+        """Indexa un registro de asistencia por carnet"""
+        carnet = clave_carnet(asistencia.get("empleado_carnet"))
+        self.asistencias_por_carnet.setdefault(carnet, []).append(asistencia)
+        self._indexar_fecha("asistencias", asistencia)
+
+    def agregar_movimiento(self, movimiento):
+        """Indexa un movimiento de inventario por producto"""
+        self.movimientos_por_producto.setdefault(movimiento["producto_id"], []).append(movimiento)
+        self._indexar_fecha("movimientos", movimiento)
+
+    def agregar_incapacidad(self, incapacidad):
+        """Indexa una incapacidad nueva (si el índice ya se construyó)"""
+        if self.incapacidades is not None:
+            self._indexar_incapacidad(incapacidad)
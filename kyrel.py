@@ -0,0 +1,285 @@
+"""
+KYREL - Línea de Comandos
+Consultas sin menú interactivo para scripts y cron: no limpia la pantalla
+ni espera Enter, y cada comando lee solo las colecciones que necesita.
+
+Uso:
+    python kyrel.py stock --nombre camiseta
+    python kyrel.py factura 123
+    python kyrel.py empleados --sede Norte
+    python kyrel.py dashboard --json
+    python kyrel.py ventas --desde 2025-12-01 --hasta 2025-12-15 --empleado EMP001
+    python kyrel.py movimientos --desde 2025-12 --sede Norte --detalle
+    python kyrel.py asistencia --desde 2025-12 --hasta 2025-12
+    python kyrel.py incapacidades --fecha 2025-12-10
+    python kyrel.py incapacidades --desde 2025 --carnet EMP002
+"""
+
+import sys
+import json
+import argparse
+
+import funciones
+from agregados import es_inicio_factura
+from fechas import fecha_parcial
+
+
+# ============================================================
+# SALIDA
+# ============================================================
+
+def imprimir_json(valor):
+    print(json.dumps(valor, ensure_ascii=False, indent=2))
+
+def imprimir_tabla(encabezados, filas):
+    """Tabla de texto plano con columnas alineadas"""
+    filas = [[str(c) for c in fila] for fila in filas]
+    anchos = [max([len(e)] + [len(fila[i]) for fila in filas]) for i, e in enumerate(encabezados)]
+    print("  ".join(e.ljust(a) for e, a in zip(encabezados, anchos)).rstrip())
+    print("  ".join("-" * a for a in anchos))
+    for fila in filas:
+        print("  ".join(c.ljust(a) for c, a in zip(fila, anchos)).rstrip())
+
+def error(mensaje):
+    print(f"kyrel: {mensaje}", file=sys.stderr)
+    return 1
+
+
+# ============================================================
+# COMANDOS
+# ============================================================
+
+def comando_stock(args):
+    """Stock por sede de los productos que coinciden con el nombre, los más relevantes primero"""
+    stock = funciones.buscar_stock(args.nombre, args.limite)
+    if args.json:
+        imprimir_json([
+            {"nombre": nombre, "sedes": sedes, "total": sum(sedes.values())}
+            for nombre, sedes in stock.items()
+        ])
+        return 0 if stock else 1
+    if not stock:
+        return error(f"no se encontraron productos con '{args.nombre}'")
+    filas = []
+    for nombre, sedes in stock.items():
+        for sede, cantidad in sedes.items():
+            filas.append([nombre, sede, cantidad])
+        if len(sedes) > 1:
+            filas.append([nombre, "TOTAL", sum(sedes.values())])
+    imprimir_tabla(["Producto", "Sede", "Unidades"], filas)
+    return 0
+
+def comando_factura(args):
+    """Detalle de una factura"""
+    venta = funciones.obtener_detalle_factura(args.numero)
+    if not venta:
+        if args.json:
+            imprimir_json(None)
+        return error(f"factura #{args.numero} no encontrada")
+    if args.json:
+        imprimir_json(venta)
+        return 0
+    imprimir_tabla(["Campo", "Valor"], [
+        ["Factura", venta["factura"]],
+        ["Fecha", venta["fecha"]],
+        ["Cliente", venta.get("cliente", "")],
+        ["Total", f"{venta['total_factura']:.2f}"],
+        ["Atendido por", f"{venta['empleado'] or 'N/A'} ({venta.get('empleado_carnet', 'N/A')})"],
+    ])
+    print()
+    imprimir_tabla(
+        ["Línea", "Producto", "Cantidad", "Total"],
+        [[l["id"], l["producto"] or "Desconocido", l.get("cantidad", ""), f"{l['total']:.2f}"]
+         for l in venta["lineas"]]
+    )
+    return 0
+
+def comando_empleados(args):
+    """Lista de empleados, opcionalmente de una sede"""
+    empleados = funciones.listar_empleados_sede(args.sede)
+    if args.json:
+        imprimir_json(empleados)
+        return 0
+    imprimir_tabla(
+        ["Carnet", "Nombre", "Sede", "Horas", "Ventas"],
+        [[e["carnet"], e["nombre"], e["sede"], e.get("horas_trabajadas", ""), e.get("ventas_realizadas", "")]
+         for e in empleados]
+    )
+    return 0
+
+def comando_dashboard(args):
+    """Métricas del dashboard general"""
+    metricas = funciones.obtener_metricas_dashboard(args.movimientos)
+    if args.json:
+        imprimir_json(metricas)
+        return 0
+    imprimir_tabla(["Métrica", "Valor"], [
+        ["Fecha", metricas["fecha"]],
+        ["Unidades en stock", metricas["unidades_en_stock"]],
+        ["Ventas hoy", f"{metricas['ventas_hoy']:.2f}"],
+        ["Facturas emitidas", metricas["facturas"]],
+        ["Modelos de productos", metricas["productos"]],
+    ])
+    print()
+    imprimir_tabla(["Sede", "Unidades"], list(metricas["unidades_por_sede"].items()))
+    print()
+    imprimir_tabla(
+        ["Producto", "Sede", "Tipo", "Cant.", "Fecha"],
+        [[m["producto"] or f"ID {m['producto_id']}", m.get("sede", ""), m["tipo"], m["cantidad"], m["fecha"]]
+         for m in metricas["ultimos_movimientos"]]
+    )
+    return 0
+
+
+def comando_ventas(args):
+    """Ventas entre dos fechas: totales por día (o las líneas con --detalle)"""
+    ventas = funciones.obtener_en_rango("ventas", args.desde, args.hasta, args.empleado)
+    if args.json:
+        imprimir_json(ventas)
+        return 0
+    if args.detalle:
+        imprimir_tabla(
+            ["Fecha", "Venta", "Factura", "Cliente", "Producto", "Cant.", "Total", "Empleado"],
+            [[v["fecha"], v["id"], v.get("factura", v["id"]), v.get("cliente", ""), v.get("producto_id", ""),
+              v.get("cantidad", ""), f"{v['total']:.2f}", v.get("empleado_carnet", "")] for v in ventas]
+        )
+    else:
+        por_dia = {}
+        for venta in ventas:
+            dia = por_dia.setdefault(venta["fecha"], [0, 0.0, 0])
+            dia[0] += 1 if es_inicio_factura(venta) else 0
+            dia[1] += venta["total"]
+            dia[2] += venta.get("cantidad", 0)
+        imprimir_tabla(["Fecha", "Facturas", "Unidades", "Total"],
+                       [[f, n, u, f"{t:.2f}"] for f, (n, t, u) in por_dia.items()])
+    print(f"\n{len(ventas)} líneas, {sum(1 for v in ventas if es_inicio_factura(v))} facturas, "
+          f"total {sum(v['total'] for v in ventas):.2f}")
+    return 0
+
+def comando_movimientos(args):
+    """Movimientos de inventario entre dos fechas, por tipo (o uno a uno con --detalle)"""
+    movimientos = funciones.obtener_en_rango("movimientos", args.desde, args.hasta, args.sede)
+    if args.tipo:
+        movimientos = [m for m in movimientos if m["tipo"].casefold() == args.tipo.casefold()]
+    if args.json:
+        imprimir_json(movimientos)
+        return 0
+    if args.detalle:
+        imprimir_tabla(
+            ["Fecha", "ID", "Producto", "Sede", "Tipo", "Cant."],
+            [[m["fecha"], m["id"], m["producto_id"], m.get("sede", ""), m["tipo"], m["cantidad"]] for m in movimientos]
+        )
+    else:
+        por_tipo = {}
+        for movimiento in movimientos:
+            tipo = por_tipo.setdefault((movimiento.get("sede", ""), movimiento["tipo"]), [0, 0])
+            tipo[0] += 1
+            tipo[1] += movimiento["cantidad"]
+        imprimir_tabla(["Sede", "Tipo", "Movimientos", "Unidades"],
+                       [[sede, tipo, n, u] for (sede, tipo), (n, u) in sorted(por_tipo.items())])
+    print(f"\n{len(movimientos)} movimientos")
+    return 0
+
+def comando_asistencia(args):
+    """Asistencia entre dos fechas por empleado; los días de incapacidad no
+    cuentan en el porcentaje"""
+    if args.json:
+        imprimir_json(funciones.obtener_en_rango("asistencias", args.desde, args.hasta, args.carnet))
+        return 0
+    por_carnet = funciones.obtener_resumen_asistencia(args.desde, args.hasta, args.carnet)
+    imprimir_tabla(
+        ["Carnet", "Registros", "Presente", "Ausente", "Justificadas", "Asistencia"],
+        [[c, n, p, n - p, j, f"{p / (n - j) * 100:.1f}%" if n > j else "-"]
+         for c, (n, p, j) in sorted(por_carnet.items())]
+    )
+    return 0
+
+def comando_incapacidades(args):
+    """Incapacidades vigentes en una fecha (por defecto, hoy) o que se
+    cruzan con un rango de fechas"""
+    if args.desde or args.hasta:
+        desde, hasta = args.desde, args.hasta
+    else:
+        desde = hasta = args.fecha or funciones.fecha_hoy()
+    incapacidades = funciones.obtener_incapacidades(desde, hasta, args.carnet)
+    if args.json:
+        imprimir_json(incapacidades)
+        return 0
+    imprimir_tabla(
+        ["Carnet", "Inicio", "Fin", "Motivo"],
+        [[i["empleado_carnet"], i["fecha_inicio"], i.get("fecha_fin") or "", i.get("motivo") or ""]
+         for i in incapacidades]
+    )
+    print(f"\n{len(incapacidades)} incapacidades")
+    return 0
+
+
+# ============================================================
+# PUNTO DE ENTRADA
+# ============================================================
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="kyrel", description="KYREL - Consultas desde la línea de comandos")
+    # --json vale antes o después del subcomando
+    comun = argparse.ArgumentParser(add_help=False)
+    comun.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help="Salida en JSON")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    stock = subparsers.add_parser("stock", parents=[comun], help="Stock disponible por nombre")
+    stock.add_argument("--nombre", required=True, help="Nombre o parte del nombre del producto (sin distinguir tildes)")
+    stock.add_argument("--limite", type=int, help="Mostrar como máximo N productos (los más relevantes)")
+    stock.set_defaults(funcion=comando_stock)
+
+    factura = subparsers.add_parser("factura", parents=[comun], help="Detalle de una factura")
+    factura.add_argument("numero", type=int, help="Número de factura")
+    factura.set_defaults(funcion=comando_factura)
+
+    empleados = subparsers.add_parser("empleados", parents=[comun], help="Listar empleados")
+    empleados.add_argument("--sede", help="Solo los de esta sede")
+    empleados.set_defaults(funcion=comando_empleados)
+
+    dashboard = subparsers.add_parser("dashboard", parents=[comun], help="Métricas generales")
+    dashboard.add_argument("--movimientos", type=int, default=4, help="Últimos movimientos a mostrar")
+    dashboard.set_defaults(funcion=comando_dashboard)
+
+    # Reportes por rango de fechas (índices por fecha, incluidos los meses archivados)
+    rango = argparse.ArgumentParser(add_help=False, parents=[comun])
+    rango.add_argument("--desde", type=fecha_parcial, help="Primera fecha (AAAA-MM-DD, AAAA-MM o AAAA)")
+    rango.add_argument("--hasta", type=fecha_parcial, help="Última fecha, inclusive (\"2025-12\" = todo diciembre)")
+
+    ventas = subparsers.add_parser("ventas", parents=[rango], help="Ventas entre dos fechas")
+    ventas.add_argument("--empleado", metavar="CARNET", help="Solo las de este empleado")
+    ventas.add_argument("--detalle", action="store_true", help="Mostrar cada línea de venta")
+    ventas.set_defaults(funcion=comando_ventas)
+
+    movimientos = subparsers.add_parser("movimientos", parents=[rango], help="Movimientos entre dos fechas")
+    movimientos.add_argument("--sede", help="Solo los de esta sede")
+    movimientos.add_argument("--tipo", help="Solo este tipo (Entrada, Salida, Venta, Devolución)")
+    movimientos.add_argument("--detalle", action="store_true", help="Mostrar cada movimiento")
+    movimientos.set_defaults(funcion=comando_movimientos)
+
+    asistencia = subparsers.add_parser("asistencia", parents=[rango], help="Asistencia entre dos fechas")
+    asistencia.add_argument("--carnet", help="Solo este empleado")
+    asistencia.set_defaults(funcion=comando_asistencia)
+
+    incapacidades = subparsers.add_parser("incapacidades", parents=[rango],
+                                          help="Incapacidades vigentes en una fecha o en un rango")
+    incapacidades.add_argument("--fecha", type=fecha_parcial, help="Vigentes este día (por defecto, hoy)")
+    incapacidades.add_argument("--carnet", help="Solo este empleado")
+    incapacidades.set_defaults(funcion=comando_incapacidades)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    try:
+        return args.funcion(args)
+    except funciones.OperacionInvalida as e:
+        # Fallo del servidor a mitad de una consulta: mensaje en stderr, sin traza
+        return error(e)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+KYREL - Lector JSON Incremental
+Recorre una sola colección de datos.json sin construir las demás.
+
+El archivo se lee por bloques; los valores de las claves que no interesan
+se saltan buscando solo delimitadores y comillas, y los registros de la
+colección pedida se decodifican de a uno.
+"""
+
+import json
+import re
+
+TAMANO_BLOQUE = 1 << 16
+
+_ESPACIOS = re.compile(r'\s*')
+# Caracteres relevantes al saltar un valor (fuera y dentro de cadenas)
+_ESTRUCTURA = re.compile(r'["{}\[\],]')
+_EN_CADENA = re.compile(r'["\\]')
+_FIN_PRIMITIVO = re.compile(r'[,}\]]')
+
+_decodificador = json.JSONDecoder()
+
+
+class _Lector:
+    """Búfer de texto sobre un archivo que se rellena bajo demanda"""
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.buf = ""
+        self.pos = 0
+        self.fin = False
+
+    def rellenar(self):
+        """Agrega un bloque al búfer; devuelve False si ya no hay más datos"""
+        if self.fin:
+            return False
+        bloque = self.archivo.read(TAMANO_BLOQUE)
+        if not bloque:
+            self.fin = True
+            return False
+        # Descartar lo ya consumido para que el búfer no crezca sin límite
+        if self.pos > TAMANO_BLOQUE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += bloque
+        return True
+
+    def caracter(self):
+        """Salta espacios y devuelve el siguiente carácter (sin consumirlo)"""
+        while True:
+            self.pos = _ESPACIOS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.rellenar():
+                raise ValueError("Fin inesperado del archivo JSON")
+
+    def esperar(self, esperado):
+        if self.caracter() != esperado:
+            raise ValueError(f"Se esperaba '{esperado}' en la posición {self.pos}")
+        self.pos += 1
+
+    def decodificar(self):
+        """Decodifica el siguiente valor JSON completo"""
+        self.caracter()
+        while True:
+            try:
+                valor, fin = _decodificador.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.rellenar():
+                    raise
+                continue
+            # Un número al final del búfer podría seguir en el próximo bloque
+            if fin == len(self.buf) and not self.fin and self.rellenar():
+                continue
+            self.pos = fin
+            return valor
+
+    def saltar(self):
+        """Salta el siguiente valor JSON sin construirlo"""
+        profundidad = 0
+        inicio = self.caracter()
+        if inicio not in '{["':
+            # Primitivo: termina en la próxima coma o cierre
+            while True:
+                m = _FIN_PRIMITIVO.search(self.buf, self.pos)
+                if m:
+                    self.pos = m.start()
+                    return
+                if not self.rellenar():
+                    self.pos = len(self.buf)
+                    return
+
+        en_cadena = False
+        while True:
+            patron = _EN_CADENA if en_cadena else _ESTRUCTURA
+            m = patron.search(self.buf, self.pos)
+            if not m:
+                self.pos = len(self.buf)
+                if not self.rellenar():
+                    raise ValueError("Fin inesperado del archivo JSON")
+                continue
+            c = m.group()
+            self.pos = m.end()
+            if en_cadena:
+                if c == '\\':
+                    # Saltar el carácter escapado
+                    if self.pos >= len(self.buf) and not self.rellenar():
+                        raise ValueError("Fin inesperado del archivo JSON")
+                    self.pos += 1
+                else:
+                    en_cadena = False
+                    if profundidad == 0:
+                        return
+            elif c == '"':
+                en_cadena = True
+            elif c in '{[':
+                profundidad += 1
+            elif c in '}]':
+                profundidad -= 1
+                if profundidad == 0:
+                    return
+
+
+def iterar_coleccion(ruta, nombre):
+    """Genera los registros de la colección `nombre` de un archivo JSON.
+
+    Las demás claves del objeto principal se saltan sin decodificarlas.
+    Si la colección no existe no se genera nada.
+    """
+    with open(ruta, 'r', encoding='utf-8') as f:
+        lector = _Lector(f)
+        lector.esperar('{')
+        if lector.caracter() == '}':
+            return
+        while True:
+            clave = lector.decodificar()
+            lector.esperar(':')
+            if clave == nombre and lector.caracter() == '[':
+                lector.pos += 1
+                if lector.caracter() == ']':
+                    return
+                while True:
+                    yield lector.decodificar()
+                    if lector.caracter() == ']':
+                        return
+                    lector.esperar(',')
+            lector.saltar()
+            if lector.caracter() == '}':
+                return
+            lector.esperar(',')
+
+
+def leer_clave(ruta, nombre, defecto=None):
+    """Devuelve el valor de una clave del objeto principal sin decodificar
+    el resto del archivo (las claves anteriores se saltan)"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        lector = _Lector(f)
+        lector.esperar('{')
+        if lector.caracter() == '}':
+            return defecto
+        while True:
+            clave = lector.decodificar()
+            lector.esperar(':')
+            if clave == nombre:
+                return lector.decodificar()
+            lector.saltar()
+            if lector.caracter() == '}':
+                return defecto
+            lector.esperar(',')
@@ -0,0 +1,153 @@
+"""
+KYREL - Herramientas de Mantenimiento
+Tareas administrativas sobre los datos, fuera del menú interactivo
+"""
+
+import sys
+import argparse
+
+import funciones
+import historico
+import perfil
+from almacen import ConflictoVersion
+from almacen_sqlite import BaseNoVacia, migrar_desde_json
+from almacen_binario import exportar_json, importar_json
+from fechas import mes
+
+
+def comando_migrar_sqlite(args):
+    """Copia datos.json (y su diario) a una base SQLite nueva o vacía"""
+    try:
+        conteos = migrar_desde_json(args.json, args.sqlite, reemplazar=args.reemplazar)
+    except (BaseNoVacia, ConflictoVersion) as e:
+        print(f"kyrel: {e}", file=sys.stderr)
+        return 1
+    print(f"Migración completada: {args.json} -> {args.sqlite}")
+    for tabla, cantidad in conteos.items():
+        print(f"  {tabla:<15} {cantidad}")
+    print(f"\nPara usarla: KYREL_BACKEND=sqlite KYREL_SQLITE_FILE={args.sqlite}")
+    return 0
+
+
+def comando_importar_json(args):
+    """Crea (o reemplaza) la instantánea binaria a partir de datos.json"""
+    datos = importar_json(args.json, args.binario)
+    print(f"Importación completada: {args.json} -> {args.binario}")
+    print(f"  {len(datos.get('ventas', []))} ventas, {len(datos.get('productos', []))} productos")
+    print(f"\nPara usarla: KYREL_BACKEND=binario KYREL_BINARIO_FILE={args.binario}")
+    return 0
+
+
+def comando_exportar_json(args):
+    """Escribe la instantánea binaria (con su diario) como JSON legible"""
+    datos = exportar_json(args.binario, args.json)
+    print(f"Exportación completada: {args.binario} -> {args.json}")
+    print(f"  {len(datos.get('ventas', []))} ventas, {len(datos.get('productos', []))} productos")
+    return 0
+
+
+def comando_consolidar(args):
+    """Consolida el diario de cambios en datos.json"""
+    return 0 if funciones.consolidar_datos() else 1
+
+
+def comando_archivar(args):
+    """Archiva los meses anteriores a --hasta (por defecto, el mes en curso)"""
+    if funciones.BACKEND == "sqlite":
+        print("El archivo por meses solo está disponible con los backends json y binario", file=sys.stderr)
+        return 1
+    hasta = args.hasta or funciones.fecha_hoy()[:7]
+    archivados = historico.archivar(funciones.obtener_almacen(), hasta)
+    if not archivados:
+        print(f"No hay registros anteriores a {hasta}")
+        return 0
+    print(f"Meses archivados en {historico.directorio_historico(funciones.ruta_datos())}:")
+    for mes, conteos in sorted(archivados.items()):
+        detalle = ", ".join(f"{cantidad} {coleccion}" for coleccion, cantidad in conteos.items())
+        print(f"  {mes}  {detalle}")
+    return 0
+
+
+def comando_verificar_agregados(args):
+    """Compara los agregados guardados con un recálculo y opcionalmente los repara"""
+    almacen = funciones.obtener_almacen()
+    diferencias = almacen.verificar_agregados()
+    if not diferencias:
+        print("Agregados correctos")
+        return 0
+
+    print(f"{len(diferencias)} diferencia(s) en los agregados:")
+    for campo, guardado, calculado in diferencias:
+        print(f"  {campo:<40} guardado={guardado}  calculado={calculado}")
+
+    if not args.reparar:
+        print("\nUsa --reparar para recalcularlos")
+        return 1
+    almacen.reparar_agregados()
+    print("\nAgregados recalculados y guardados")
+    return 0
+
+
+def comando_perfil(args):
+    """Resumen p50/p95 por operación de un archivo de perfil (KYREL_PROFILE)"""
+    if not args.archivo:
+        print("Indica el archivo de perfil o define KYREL_PROFILE", file=sys.stderr)
+        return 1
+    try:
+        resumen = perfil.resumir(args.archivo, args.tipo)
+    except OSError as e:
+        print(f"No se pudo leer el perfil: {e}", file=sys.stderr)
+        return 1
+    if not resumen:
+        print("El perfil no tiene eventos")
+        return 0
+    perfil.imprimir_resumen(resumen)
+    return 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="mantenimiento", description="KYREL - Mantenimiento de datos")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    migrar = subparsers.add_parser("migrar-sqlite", help="Migrar datos.json a SQLite")
+    migrar.add_argument("--json", default=funciones.DATOS_FILE, help="Archivo JSON de origen")
+    migrar.add_argument("--sqlite", default=funciones.SQLITE_FILE, help="Base SQLite de destino")
+    migrar.add_argument("--reemplazar", action="store_true", help="Sustituir los datos si la base no está vacía")
+    migrar.set_defaults(funcion=comando_migrar_sqlite)
+
+    importar = subparsers.add_parser("importar-json", help="Crear la instantánea binaria desde JSON")
+    importar.add_argument("--json", default=funciones.DATOS_FILE, help="Archivo JSON de origen")
+    importar.add_argument("--binario", default=funciones.BINARIO_FILE, help="Instantánea de destino")
+    importar.set_defaults(funcion=comando_importar_json)
+
+    exportar = subparsers.add_parser("exportar-json", help="Exportar la instantánea binaria a JSON")
+    exportar.add_argument("--binario", default=funciones.BINARIO_FILE, help="Instantánea de origen")
+    exportar.add_argument("--json", default=funciones.DATOS_FILE, help="Archivo JSON de destino")
+    exportar.set_defaults(funcion=comando_exportar_json)
+
+    consolidar = subparsers.add_parser("consolidar", help="Consolidar el diario en datos.json")
+    consolidar.set_defaults(funcion=comando_consolidar)
+
+    archivar = subparsers.add_parser("archivar", help="Archivar los meses cerrados de ventas, movimientos y asistencias")
+    archivar.add_argument("--hasta", metavar="AAAA-MM", type=mes, help="Primer mes que se mantiene activo (por defecto, el actual)")
+    archivar.set_defaults(funcion=comando_archivar)
+
+    resumen = subparsers.add_parser("perfil", help="Resumen p50/p95 de un archivo KYREL_PROFILE")
+    resumen.add_argument("archivo", nargs="?", default=perfil.RUTA, help="Por defecto, el de KYREL_PROFILE")
+    resumen.add_argument("--tipo", choices=["pantalla", "datos", "consulta", "io"], help="Solo un tipo de evento")
+    resumen.set_defaults(funcion=comando_perfil)
+
+    verificar = subparsers.add_parser("verificar-agregados", help="Verificar los totales materializados")
+    verificar.add_argument("--reparar", action="store_true", help="Recalcularlos si hay diferencias")
+    verificar.set_defaults(funcion=comando_verificar_agregados)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
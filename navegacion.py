@@ -0,0 +1,56 @@
+"""
+KYREL - Navegación
+Pila explícita de pantallas. Cada pantalla se ejecuta, devuelve la siguiente
+pantalla a abrir (que se apila, o la reemplaza si viene de `reemplazar`) o
+None para volver a la anterior, y termina;
+así una sesión larga no hace crecer la pila de llamadas de Python ni retiene
+los datos que cargó cada vista.
+"""
+
+import perfil
+
+
+def pantalla(funcion, *args):
+    """Entrada de la pila: función de pantalla y sus argumentos"""
+    return (funcion, args)
+
+
+class Reemplazo(tuple):
+    """Entrada que ocupa el lugar de la pantalla actual en vez de apilarse"""
+
+
+def reemplazar(funcion, *args):
+    """Como `pantalla`, pero al volver de la nueva pantalla no se regresa a
+    la actual sino a la anterior a ella"""
+    return Reemplazo((funcion, args))
+
+
+def _entrada(valor):
+    """Acepta una función sin argumentos o una entrada de `pantalla`"""
+    if callable(valor):
+        return (valor, ())
+    return valor
+
+
+def navegar(inicial, errores=(), avisar=None):
+    """Ejecuta pantallas desde `inicial` hasta vaciar la pila.
+
+    Una pantalla que devuelve otra la apila y se vuelve a mostrar cuando
+    esa termina; una que devuelve None se desapila. Si una pantalla lanza
+    una de las excepciones de `errores`, se informa con `avisar(error)` y
+    se vuelve a la anterior.
+    """
+    pila = [_entrada(inicial)]
+    while pila:
+        funcion, args = pila[-1]
+        try:
+            siguiente = perfil.pantalla(funcion, *args)
+        except errores as error:
+            avisar(error)
+            siguiente = None
+        if siguiente is None:
+            pila.pop()
+        elif isinstance(siguiente, Reemplazo):
+            pila[-1] = tuple(siguiente)
+        else:
+            pila.append(_entrada(siguiente))
@@ -0,0 +1,196 @@
+"""
+KYREL - Perfilado
+Instrumentación opcional de las rutas calientes. Con la variable de entorno
+KYREL_PROFILE=<archivo> cada proceso anexa a ese archivo un evento JSON por
+línea con:
+
+    pantalla    tiempo de cada pantalla del menú, separando la espera en
+                input() del cálculo (navegacion.navegar)
+    datos       cada cargar_datos y guardar_datos
+    consulta    cada función de búsqueda (obtener_*, buscar_stock...) con
+                los registros recorridos en secuencia para responderla
+    io          lecturas y escrituras de datos.json y del diario, en bytes
+
+Sin la variable, los decoradores devuelven la función original y los
+contadores no envuelven nada: el costo es nulo.
+
+El resumen con p50/p95 por operación se imprime con
+    python mantenimiento.py perfil [ARCHIVO]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import builtins
+import functools
+import contextlib
+
+RUTA = os.environ.get("KYREL_PROFILE") or None
+ACTIVO = RUTA is not None
+
+# Acumulados del proceso: los eventos guardan la diferencia antes/después
+_registros = 0
+_espera = 0.0
+_archivo = None
+
+
+# ============================================================
+# EVENTOS
+# ============================================================
+
+def evento(tipo, op, segundos, **campos):
+    """Anexa un evento al archivo de perfil"""
+    global _archivo
+    if not ACTIVO:
+        return
+    if _archivo is None or _archivo[0] != os.getpid():
+        # Un proceso hijo (fork) abre su propio descriptor
+        _archivo = (os.getpid(), open(RUTA, 'a', encoding='utf-8', buffering=1))
+    registro = {"ts": round(time.time(), 6), "pid": os.getpid(), "tipo": tipo, "op": op,
+                "ms": round(segundos * 1000, 3)}
+    registro.update(campos)
+    _archivo[1].write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+def medido(tipo, nombre=None):
+    """Decorador que registra la duración de cada llamada (y los registros
+    recorridos durante ella, si los hubo); sin perfil no envuelve nada"""
+    def decorador(funcion):
+        if not ACTIVO:
+            return funcion
+        op = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            registros = _registros
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                campos = {}
+                if _registros != registros:
+                    campos["registros"] = _registros - registros
+                evento(tipo, op, time.perf_counter() - inicio, **campos)
+        return envoltura
+    return decorador
+
+
+@contextlib.contextmanager
+def _medicion(tipo, op, campos):
+    datos = dict(campos)
+    inicio = time.perf_counter()
+    try:
+        yield datos
+    finally:
+        evento(tipo, op, time.perf_counter() - inicio, **datos)
+
+
+def medicion(tipo, op, **campos):
+    """Contexto que registra la duración del bloque; el bloque puede agregar
+    campos (p. ej. bytes) al diccionario que recibe"""
+    if not ACTIVO:
+        return contextlib.nullcontext({})
+    return _medicion(tipo, op, campos)
+
+
+def contar(registros):
+    """Iterador sobre `registros` que los cuenta como recorridos"""
+    if not ACTIVO:
+        return registros
+    return _contados(registros)
+
+
+def _contados(registros):
+    global _registros
+    for registro in registros:
+        _registros += 1
+        yield registro
+
+
+# ============================================================
+# PANTALLAS
+# ============================================================
+
+def pantalla(funcion, *args):
+    """Ejecuta una pantalla registrando su tiempo total y el de espera en input()"""
+    if not ACTIVO:
+        return funcion(*args)
+    espera = _espera
+    inicio = time.perf_counter()
+    try:
+        return funcion(*args)
+    finally:
+        total = time.perf_counter() - inicio
+        esperado = _espera - espera
+        evento("pantalla", funcion.__name__, total,
+               calculo_ms=round((total - esperado) * 1000, 3), espera_ms=round(esperado * 1000, 3))
+
+
+def _input_medido(prompt="", _input=builtins.input):
+    global _espera
+    inicio = time.perf_counter()
+    try:
+        return _input(prompt)
+    finally:
+        _espera += time.perf_counter() - inicio
+
+
+if ACTIVO:
+    builtins.input = _input_medido
+
+
+# ============================================================
+# RESUMEN
+# ============================================================
+
+def percentil(valores, p):
+    """Percentil `p` (0-100) por rango más cercano de valores ordenados"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def resumir(ruta, tipo=None):
+    """{(tipo, op): estadísticas} de un archivo de perfil"""
+    muestras = {}
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue  # línea a medio escribir
+            if tipo and registro["tipo"] != tipo:
+                continue
+            muestra = muestras.setdefault((registro["tipo"], registro["op"]), {
+                "ms": [], "calculo_ms": [], "bytes": 0, "registros": 0
+            })
+            muestra["ms"].append(registro["ms"])
+            if "calculo_ms" in registro:
+                muestra["calculo_ms"].append(registro["calculo_ms"])
+            muestra["bytes"] += registro.get("bytes_leidos", 0) + registro.get("bytes_escritos", 0)
+            muestra["registros"] += registro.get("registros", 0)
+
+    resumen = {}
+    for clave, muestra in muestras.items():
+        tiempos = sorted(muestra["ms"])
+        # En las pantallas importa el cálculo, no lo que tardó el usuario en responder
+        calculo = sorted(muestra["calculo_ms"]) or tiempos
+        resumen[clave] = {
+            "llamadas": len(tiempos),
+            "p50_ms": percentil(calculo, 50),
+            "p95_ms": percentil(calculo, 95),
+            "total_ms": round(sum(calculo), 3),
+            "bytes": muestra["bytes"],
+            "registros": muestra["registros"],
+        }
+    return resumen
+
+
+def imprimir_resumen(resumen, salida=sys.stdout):
+    print(f"{'Tipo':<9} {'Operación':<32} {'Llamadas':>8} {'p50 ms':>10} {'p95 ms':>10} "
+          f"{'Total ms':>11} {'MB':>9} {'Registros':>11}", file=salida)
+    for (tipo, op), e in sorted(resumen.items(), key=lambda item: -item[1]["total_ms"]):
+        print(f"{tipo:<9} {op[:32]:<32} {e['llamadas']:>8} {e['p50_ms']:>10.2f} {e['p95_ms']:>10.2f} "
+              f"{e['total_ms']:>11.1f} {e['bytes'] / 1e6:>9.2f} {e['registros']:>11,}", file=salida)
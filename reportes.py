@@ -0,0 +1,416 @@
+"""
+KYREL - Reportes de Cierre
+Exporta los reportes de inventario, ventas y asistencia por sede o por mes
+en CSV, HTML y JSON, calculando cada partición en un proceso aparte
+(concurrent.futures), y une los totales de todas en un resumen global.
+
+Por sede, cada partición lleva los productos de la sede con sus ventas
+(según la sede del producto), los movimientos de la sede y la asistencia
+de sus empleados. Por mes, lleva las ventas, movimientos y asistencias del
+mes; los meses archivados los lee el propio proceso de la partición desde
+su archivo (ver historico.py), de modo que el histórico completo se recorre
+en paralelo.
+
+Con el arranque por fork los procesos heredan los datos ya agrupados sin
+copiarlos; donde no hay fork se envían una vez a cada proceso.
+
+Uso:
+    python reportes.py --salida cierre/ --desde 2025-12 --hasta 2025-12
+    python reportes.py --por mes --salida historico/ --formatos csv json
+    python reportes.py --salida cierre/ --procesos 1
+"""
+
+import os
+import re
+import sys
+import csv
+import html
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import funciones
+import historico
+from agrupacion import agrupar, contar, sumar
+from agregados import es_inicio_factura
+from fechas import fecha_parcial
+from indices import IndiceIntervalos, clave_carnet, normalizar_texto
+
+FORMATOS = ("csv", "html", "json")
+COLECCIONES = ("ventas", "movimientos", "asistencias")
+
+# Totales de cada partición, en el orden del resumen
+TOTALES = ["productos", "unidades_inventario", "valor_inventario", "facturas", "lineas",
+           "unidades_vendidas", "total_ventas", "movimientos", "asistencias", "presentes", "justificadas"]
+
+# Contexto de los procesos: datos ya particionados y opciones de salida
+_contexto = None
+_incapacidades = None
+
+
+# ============================================================
+# REPORTE DE UNA PARTICIÓN
+# ============================================================
+
+def _iniciar(contexto):
+    global _contexto, _incapacidades
+    _contexto = contexto
+    _incapacidades = None
+
+
+def _en_incapacidad(carnet, fecha):
+    # Índice de intervalos por carnet, construido una vez por proceso
+    global _incapacidades
+    if _incapacidades is None:
+        _incapacidades = {}
+        for incapacidad in _contexto["incapacidades"]:
+            carnet_incapacidad = clave_carnet(incapacidad.get("empleado_carnet"))
+            _incapacidades.setdefault(carnet_incapacidad, IndiceIntervalos()).agregar(incapacidad)
+    indice = _incapacidades.get(clave_carnet(carnet))
+    return indice is not None and indice.contar(fecha) > 0
+
+
+def calcular_reporte(nombre, registros, contexto):
+    """Tablas y totales de una partición: {"particion", "tablas", "totales"}"""
+    productos = contexto["productos"]
+    empleados = contexto["empleados"]
+    producto_de = lambda v: productos.get(v.get("producto_id"), ("", "Desconocido"))
+    tablas = {}
+
+    inventario = registros.get("inventario")
+    if inventario is not None:
+        grupos = agrupar(inventario, lambda p: (p["sede"], p["categoria"]), {
+            "productos": contar(), "unidades": sumar("cantidad"),
+            "valor": sumar(lambda p: p["cantidad"] * p["precio"]),
+        })
+        tablas["inventario"] = (["Sede", "Categoría", "Productos", "Unidades", "Valor"], [
+            [sede, categoria, g["productos"], g["unidades"], round(g["valor"], 2)]
+            for (sede, categoria), g in sorted(grupos.items())
+        ])
+
+    ventas = registros["ventas"]
+    reductores = {"facturas": contar(es_inicio_factura), "lineas": contar(),
+                  "unidades": sumar("cantidad"), "total": sumar("total")}
+    grupos = agrupar(ventas, producto_de, reductores)
+    tablas["ventas"] = (["Sede", "Categoría", "Líneas", "Unidades", "Total"], [
+        [sede, categoria, g["lineas"], g["unidades"], round(g["total"], 2)]
+        for (sede, categoria), g in sorted(grupos.items())
+    ])
+    grupos = agrupar(ventas, lambda v: clave_carnet(v.get("empleado_carnet")), reductores)
+    tablas["ventas_empleado"] = (["Carnet", "Nombre", "Facturas", "Líneas", "Total"], [
+        [carnet, empleados.get(carnet, ("",))[0], g["facturas"], g["lineas"], round(g["total"], 2)]
+        for carnet, g in sorted(grupos.items())
+    ])
+
+    movimientos = registros["movimientos"]
+    grupos = agrupar(movimientos, lambda m: (m.get("sede") or "", m["tipo"]),
+                     {"movimientos": contar(), "unidades": sumar("cantidad")})
+    tablas["movimientos"] = (["Sede", "Tipo", "Movimientos", "Unidades"], [
+        [sede, tipo, g["movimientos"], g["unidades"]] for (sede, tipo), g in sorted(grupos.items())
+    ])
+
+    # Las ausencias durante una incapacidad no cuentan en el porcentaje
+    asistencias = registros["asistencias"]
+    justificada = lambda a: not a["presente"] and _en_incapacidad(a["empleado_carnet"], a["fecha"])
+    grupos = agrupar(asistencias, lambda a: clave_carnet(a["empleado_carnet"]), {
+        "registros": contar(), "presentes": contar(lambda a: a["presente"]), "justificadas": contar(justificada),
+    })
+    tablas["asistencia"] = (["Carnet", "Nombre", "Sede", "Registros", "Presentes", "Justificadas", "Asistencia %"], [
+        [carnet, *empleados.get(carnet, ("", "")), g["registros"], g["presentes"], g["justificadas"],
+         round(g["presentes"] / (g["registros"] - g["justificadas"]) * 100, 1)
+         if g["registros"] > g["justificadas"] else None]
+        for carnet, g in sorted(grupos.items())
+    ])
+
+    filas_asistencia = tablas["asistencia"][1]
+    totales = {
+        "productos": len(inventario or []),
+        "unidades_inventario": sum(p["cantidad"] for p in inventario or []),
+        "valor_inventario": round(sum(p["cantidad"] * p["precio"] for p in inventario or []), 2),
+        "facturas": sum(1 for v in ventas if es_inicio_factura(v)),
+        "lineas": len(ventas),
+        "unidades_vendidas": sum(v.get("cantidad", 0) for v in ventas),
+        "total_ventas": round(sum(v["total"] for v in ventas), 2),
+        "movimientos": len(movimientos),
+        "asistencias": len(asistencias),
+        "presentes": sum(fila[4] for fila in filas_asistencia),
+        "justificadas": sum(fila[5] for fila in filas_asistencia),
+    }
+    return {"particion": nombre, "tablas": tablas, "totales": totales}
+
+
+def generar_particion(nombre):
+    """Calcula y escribe el reporte de una partición del contexto del
+    proceso; devuelve sus totales y los archivos escritos"""
+    particion = _contexto["particiones"][nombre]
+    registros = dict(particion["registros"])
+    mes = particion.get("mes_archivado")
+    if mes is not None:
+        # Mes archivado: lo lee este proceso, no el principal
+        archivados = leer_archivado(_contexto["directorio_historico"], _contexto["manifiesto"], mes,
+                                    _contexto["desde"], _contexto["hasta"])
+        for coleccion in COLECCIONES:
+            registros[coleccion] = archivados[coleccion] + registros[coleccion]
+    reporte = calcular_reporte(nombre, registros, _contexto)
+    archivos = escribir_reporte(_contexto["salida"], reporte, _contexto["formatos"])
+    return {"particion": nombre, "totales": reporte["totales"], "archivos": archivos}
+
+
+# ============================================================
+# SALIDA
+# ============================================================
+
+def nombre_archivo(particion):
+    """Nombre de archivo de una partición ("Centro" -> "centro")"""
+    return re.sub(r"[^a-z0-9-]+", "_", normalizar_texto(particion)).strip("_") or "sin_sede"
+
+
+def escribir_csv(directorio, base, tablas):
+    """Un CSV por tabla: <base>_<tabla>.csv"""
+    rutas = []
+    for tabla, (columnas, filas) in tablas.items():
+        ruta = os.path.join(directorio, f"{base}_{tabla}.csv")
+        with open(ruta, 'w', encoding='utf-8', newline='') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(columnas)
+            escritor.writerows(filas)
+        rutas.append(ruta)
+    return rutas
+
+
+def escribir_html(ruta, titulo, tablas):
+    """Una página con todas las tablas"""
+    partes = [f"<!DOCTYPE html>\n<html lang=\"es\"><head><meta charset=\"utf-8\">"
+              f"<title>{html.escape(titulo)}</title></head><body>\n<h1>{html.escape(titulo)}</h1>"]
+    for tabla, (columnas, filas) in tablas.items():
+        partes.append(f"<h2>{html.escape(tabla.replace('_', ' ').capitalize())}</h2>\n<table border=\"1\">")
+        partes.append("<tr>" + "".join(f"<th>{html.escape(c)}</th>" for c in columnas) + "</tr>")
+        for fila in filas:
+            partes.append("<tr>" + "".join(
+                f"<td>{html.escape('' if v is None else str(v))}</td>" for v in fila
+            ) + "</tr>")
+        partes.append("</table>")
+    partes.append("</body></html>\n")
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write("\n".join(partes))
+    return [ruta]
+
+
+def escribir_json(ruta, reporte):
+    contenido = dict(reporte, tablas={
+        tabla: [dict(zip(columnas, fila)) for fila in filas]
+        for tabla, (columnas, filas) in reporte["tablas"].items()
+    })
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f, ensure_ascii=False, indent=1)
+    return [ruta]
+
+
+def escribir_reporte(directorio, reporte, formatos):
+    """Escribe un reporte en los formatos pedidos; devuelve las rutas"""
+    base = nombre_archivo(reporte["particion"])
+    rutas = []
+    if "csv" in formatos:
+        rutas += escribir_csv(directorio, base, reporte["tablas"])
+    if "html" in formatos:
+        rutas += escribir_html(os.path.join(directorio, f"{base}.html"),
+                               f"KYREL - {reporte['particion']}", reporte["tablas"])
+    if "json" in formatos:
+        rutas += escribir_json(os.path.join(directorio, f"{base}.json"), reporte)
+    return rutas
+
+
+# ============================================================
+# PARTICIONES
+# ============================================================
+
+def meses_en_rango(manifiesto, desde, hasta):
+    """Meses archivados que se cruzan con el rango de fechas"""
+    return [mes for mes in manifiesto.get("meses", {})
+            if (not desde or mes >= desde[:7]) and (not hasta or mes[:len(hasta)] <= hasta[:7])]
+
+
+def leer_archivado(directorio, manifiesto, mes, desde, hasta):
+    """{colección: registros} de un mes archivado dentro del rango, leyendo
+    su archivo una sola vez"""
+    solo = {"meses": {mes: manifiesto["meses"][mes]}}
+    return {c: historico.en_rango(directorio, solo, c, desde, hasta) for c in COLECCIONES}
+
+
+def particionar_por_sede(almacen, datos, desde, hasta):
+    """{sede: partición}; incluye las ventas, movimientos y asistencias de
+    los meses archivados del rango, que se leen aquí (cada mes una vez)"""
+    sede_producto = {p["id"]: p["sede"] for p in datos.get("productos", [])}
+    sede_empleado = {clave_carnet(e["carnet"]): e["sede"] for e in datos.get("empleados", [])}
+    particiones = {}
+
+    def registros(sede):
+        if sede not in particiones:
+            particiones[sede] = {"registros": {"inventario": [], "ventas": [], "movimientos": [], "asistencias": []}}
+        return particiones[sede]["registros"]
+
+    for sede in sorted(set(sede_producto.values()) | set(sede_empleado.values())):
+        registros(sede)
+    for producto in datos.get("productos", []):
+        registros(producto["sede"])["inventario"].append(producto)
+
+    indices = almacen.indices_de(datos)
+    manifiesto = almacen.historico()
+    directorio = historico.directorio_historico(almacen.ruta)
+    fuentes = [leer_archivado(directorio, manifiesto, mes, desde, hasta)
+               for mes in meses_en_rango(manifiesto, desde, hasta)]
+    fuentes.append({c: indices.en_rango(c, desde, hasta) for c in COLECCIONES})
+    for fuente in fuentes:
+        for venta in fuente["ventas"]:
+            registros(sede_producto.get(venta.get("producto_id"), ""))["ventas"].append(venta)
+        for movimiento in fuente["movimientos"]:
+            registros(movimiento.get("sede") or "")["movimientos"].append(movimiento)
+        for asistencia in fuente["asistencias"]:
+            sede = sede_empleado.get(clave_carnet(asistencia["empleado_carnet"]), "")
+            registros(sede)["asistencias"].append(asistencia)
+    return particiones
+
+
+def particionar_por_mes(almacen, datos, desde, hasta):
+    """{AAAA-MM: partición}; los meses archivados solo llevan su nombre, el
+    proceso de la partición lee el archivo"""
+    particiones = {}
+
+    def registros(mes):
+        if mes not in particiones:
+            particiones[mes] = {"registros": {c: [] for c in COLECCIONES}}
+        return particiones[mes]["registros"]
+
+    for mes in meses_en_rango(almacen.historico(), desde, hasta):
+        registros(mes)
+        particiones[mes]["mes_archivado"] = mes
+    indices = almacen.indices_de(datos)
+    for coleccion in COLECCIONES:
+        for registro in indices.en_rango(coleccion, desde, hasta):
+            registros(registro["fecha"][:7])[coleccion].append(registro)
+    return dict(sorted(particiones.items()))
+
+
+def _peso(particion, manifiesto):
+    # Registros aproximados, para repartir primero las particiones grandes
+    peso = sum(len(r) for r in particion["registros"].values())
+    mes = particion.get("mes_archivado")
+    if mes is not None:
+        peso += sum(manifiesto["meses"][mes]["cantidades"].values())
+    return peso
+
+
+def unir_totales(resultados):
+    """Suma los totales de las particiones y calcula el % de asistencia global"""
+    totales = {clave: 0 for clave in TOTALES}
+    for resultado in resultados:
+        for clave in TOTALES:
+            totales[clave] += resultado["totales"][clave]
+    for clave in ("valor_inventario", "total_ventas"):
+        totales[clave] = round(totales[clave], 2)
+    laborables = totales["asistencias"] - totales["justificadas"]
+    totales["asistencia_porcentaje"] = round(totales["presentes"] / laborables * 100, 1) if laborables else None
+    return totales
+
+
+# ============================================================
+# EXPORTAR
+# ============================================================
+
+def _contexto_de_pool():
+    # fork comparte los datos ya cargados sin serializarlos
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def exportar(almacen, salida, por="sede", desde=None, hasta=None, formatos=FORMATOS, procesos=None):
+    """Escribe en `salida` un reporte por partición y el resumen global.
+
+    `procesos` = 1 calcula las particiones en serie en este proceso; None
+    usa un proceso por núcleo. Devuelve {"por", "particiones", "totales",
+    "archivos", "segundos"}.
+    """
+    inicio = time.perf_counter()
+    os.makedirs(salida, exist_ok=True)
+    datos = almacen.cargar()
+    particionar = particionar_por_sede if por == "sede" else particionar_por_mes
+    contexto = {
+        "productos": {p["id"]: (p["sede"], p["categoria"]) for p in datos.get("productos", [])},
+        "empleados": {clave_carnet(e["carnet"]): (e["nombre"], e["sede"]) for e in datos.get("empleados", [])},
+        "incapacidades": datos.get("incapacidades", []),
+        "manifiesto": almacen.historico(),
+        "directorio_historico": historico.directorio_historico(almacen.ruta),
+        "desde": desde,
+        "hasta": hasta,
+        "salida": salida,
+        "formatos": tuple(formatos),
+        "particiones": particionar(almacen, datos, desde, hasta),
+    }
+    nombres = sorted(contexto["particiones"],
+                     key=lambda n: -_peso(contexto["particiones"][n], contexto["manifiesto"]))
+    procesos = min(procesos or os.cpu_count() or 1, len(nombres) or 1)
+
+    if procesos == 1:
+        _iniciar(contexto)
+        try:
+            resultados = [generar_particion(nombre) for nombre in nombres]
+        finally:
+            _iniciar(None)
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=_contexto_de_pool(),
+                                 initializer=_iniciar, initargs=(contexto,)) as pool:
+            resultados = list(pool.map(generar_particion, nombres))
+    orden = list(contexto["particiones"])
+    resultados.sort(key=lambda r: orden.index(r["particion"]))
+
+    totales = unir_totales(resultados)
+    columna = "Sede" if por == "sede" else "Mes"
+    resumen = {"particion": "resumen", "totales": totales, "tablas": {"resumen": (
+        [columna] + TOTALES,
+        [[r["particion"] or "(sin sede)"] + [r["totales"][c] for c in TOTALES] for r in resultados]
+        + [["TOTAL"] + [totales[c] for c in TOTALES]]
+    )}}
+    archivos = [a for r in resultados for a in r["archivos"]] + escribir_reporte(salida, resumen, formatos)
+    return {"por": por, "particiones": resultados, "totales": totales, "archivos": archivos,
+            "segundos": time.perf_counter() - inicio, "procesos": procesos}
+
+
+# ============================================================
+# PUNTO DE ENTRADA
+# ============================================================
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="reportes", description="KYREL - Reportes de cierre")
+    parser.add_argument("--salida", required=True, help="Carpeta de destino")
+    parser.add_argument("--por", choices=["sede", "mes"], default="sede", help="Partición de los reportes")
+    parser.add_argument("--desde", type=fecha_parcial, help="Primera fecha (AAAA-MM-DD, AAAA-MM o AAAA)")
+    parser.add_argument("--hasta", type=fecha_parcial, help="Última fecha, inclusive (\"2025-12\" = todo diciembre)")
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS, default=list(FORMATOS))
+    parser.add_argument("--procesos", type=int, help="Procesos en paralelo (por defecto, uno por núcleo; 1 = en serie)")
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    resultado = exportar(funciones.obtener_almacen(), args.salida, args.por, args.desde, args.hasta,
+                         args.formatos, args.procesos)
+    totales = resultado["totales"]
+    print(f"{len(resultado['particiones'])} reportes por {args.por} en {args.salida} "
+          f"({len(resultado['archivos'])} archivos, {resultado['procesos']} procesos, "
+          f"{resultado['segundos']:.2f} s)")
+    print(f"  Ventas:      {totales['facturas']} facturas, {totales['lineas']} líneas, {totales['total_ventas']:.2f}")
+    if args.por == "sede":
+        print(f"  Inventario:  {totales['productos']} productos, {totales['unidades_inventario']} unidades, "
+              f"{totales['valor_inventario']:.2f}")
+    print(f"  Movimientos: {totales['movimientos']}")
+    asistencia = totales["asistencia_porcentaje"]
+    print(f"  Asistencia:  {totales['asistencias']} registros, {totales['justificadas']} ausencias justificadas"
+          + (f", {asistencia:.1f}%" if asistencia is not None else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
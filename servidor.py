@@ -0,0 +1,256 @@
+"""
+KYREL - Servidor Local
+Proceso opcional que mantiene una sola copia de los datos en memoria y
+atiende a todos los terminales de la tienda por un socket Unix (o TCP en
+localhost). Las peticiones se atienden de una en una en el bucle de asyncio,
+así que las escrituras quedan serializadas sin esperar bloqueos de archivo y
+las consultas no releen datos.json en cada terminal. Las operaciones que
+llegan casi a la vez desde varios terminales se confirman juntas en una
+sola escritura del diario (confirmación agrupada).
+
+Los terminales (menú y kyrel.py) lo usan automáticamente cuando existe el
+socket `<archivo de datos>.sock`; si el servidor no está, trabajan con el
+archivo como siempre. Ver cliente.py para el protocolo.
+
+Uso:
+    python servidor.py                       # socket Unix junto a los datos
+    python servidor.py --tcp 127.0.0.1:7070  # TCP local (KYREL_SERVIDOR=tcp:127.0.0.1:7070)
+"""
+
+import os
+import sys
+import json
+import signal
+import socket
+import asyncio
+import argparse
+import ipaddress
+
+import cliente
+import funciones
+
+# Confirmación agrupada: se espera este tiempo a que lleguen más operaciones
+# y se confirman a lo sumo MAX_LOTE en una sola escritura
+ESPERA_LOTE = 0.0005
+MAX_LOTE = 256
+
+
+# ============================================================
+# PETICIONES
+# ============================================================
+
+def _a_json(valor):
+    # Escalares y arreglos de NumPy (resúmenes de analitica)
+    if hasattr(valor, "tolist"):
+        return valor.tolist()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def resolver(peticion):
+    """(op, función, args, kwargs) de una petición; las funciones que
+    viajan como argumento se buscan por nombre entre las permitidas"""
+    op = peticion["op"]
+    args = list(peticion.get("args", []))
+    kwargs = peticion.get("kwargs", {})
+    funcion = funciones.FUNCIONES_REMOTAS.get(op)
+    if funcion is None:
+        raise ValueError(f"Operación desconocida: {op}")
+    if op in funciones.FUNCIONES_ARGUMENTO:
+        permitidas = funciones.FUNCIONES_ARGUMENTO[op]
+        if not args or args[0] not in permitidas:
+            raise ValueError(f"Función no permitida en {op}: {args[0] if args else None}")
+        args[0] = permitidas[args[0]]
+    return op, funcion, args, kwargs
+
+def respuesta(resultado):
+    if isinstance(resultado, Exception):
+        return {"ok": False, "tipo": type(resultado).__name__, "error": str(resultado)}
+    return {"ok": True, "resultado": resultado}
+
+def codificar(respuesta):
+    try:
+        texto = json.dumps(respuesta, ensure_ascii=False, default=_a_json)
+    except (TypeError, ValueError) as e:
+        texto = json.dumps({"ok": False, "tipo": "ErrorServidor", "error": f"Respuesta no serializable: {e}"})
+    return texto.encode('utf-8') + b"\n"
+
+
+# ============================================================
+# SERVIDOR
+# ============================================================
+
+class Estadisticas:
+    """Contadores que se muestran al detener el servidor"""
+
+    def __init__(self):
+        self.conexiones = 0
+        self.peticiones = 0
+        self.operaciones = 0
+        self.confirmaciones = 0
+
+
+def confirmar_sola(llamada, estadisticas):
+    """Resultado de confirmar una sola operación, o la excepción que la rechazó"""
+    try:
+        resultado, = funciones.ejecutar_lote([llamada])
+    except Exception as e:
+        return e
+    if not isinstance(resultado, funciones.OperacionInvalida):
+        estadisticas.confirmaciones += 1
+    return resultado
+
+
+async def confirmar_lotes(cola, estadisticas):
+    """Confirma las operaciones encoladas por las conexiones, en lotes"""
+    while True:
+        lote = [await cola.get()]
+        # Dar tiempo a que los demás terminales encolen sus operaciones
+        await asyncio.sleep(ESPERA_LOTE)
+        while not cola.empty() and len(lote) < MAX_LOTE:
+            lote.append(cola.get_nowait())
+        llamadas = [(f, a, k) for f, a, k, _ in lote]
+        try:
+            resultados = funciones.ejecutar_lote(llamadas)
+            estadisticas.confirmaciones += 1
+        except Exception:
+            # No se confirmó nada del lote: cada operación por separado, para
+            # que el error le llegue solo al terminal que la envió
+            resultados = [confirmar_sola(llamada, estadisticas) for llamada in llamadas]
+        estadisticas.operaciones += len(lote)
+        for (_, _, _, futuro), resultado in zip(lote, resultados):
+            if not futuro.done():
+                futuro.set_result(respuesta(resultado))
+
+
+async def atender_peticion(peticion, cola):
+    """Respuesta a una petición; las operaciones van a la cola de confirmación"""
+    try:
+        op, funcion, args, kwargs = resolver(peticion)
+    except Exception as e:
+        return respuesta(e)
+    if op != "ejecutar":
+        # Síncrono a propósito: una petición a la vez sobre los datos
+        try:
+            return respuesta(funcion(*args, **kwargs))
+        except Exception as e:
+            return respuesta(e)
+    futuro = asyncio.get_running_loop().create_future()
+    cola.put_nowait((args[0], args[1:], kwargs, futuro))
+    return await futuro
+
+
+async def atender_conexion(lector, escritor, cola, estadisticas):
+    estadisticas.conexiones += 1
+    try:
+        while True:
+            linea = await lector.readline()
+            if not linea:
+                break
+            try:
+                peticion = json.loads(linea)
+            except ValueError:
+                resultado = {"ok": False, "tipo": "ErrorServidor", "error": "Petición inválida"}
+            else:
+                resultado = await atender_peticion(peticion, cola)
+            estadisticas.peticiones += 1
+            escritor.write(codificar(resultado))
+            await escritor.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        escritor.close()
+
+
+def socket_en_uso(ruta):
+    """True si ya hay un servidor escuchando en el socket Unix `ruta`"""
+    prueba = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        prueba.connect(ruta)
+        return True
+    except OSError:
+        return False
+    finally:
+        prueba.close()
+
+
+async def servir(direccion, estadisticas):
+    familia, destino = cliente.parsear_direccion(direccion)
+    cola = asyncio.Queue()
+    manejador = lambda lector, escritor: atender_conexion(lector, escritor, cola, estadisticas)
+    if familia == socket.AF_UNIX:
+        if os.path.exists(destino):
+            if socket_en_uso(destino):
+                raise RuntimeError(f"Ya hay un servidor en {destino}")
+            os.unlink(destino)  # socket de un servidor que terminó mal
+        servidor = await asyncio.start_unix_server(manejador, path=destino)
+    else:
+        servidor = await asyncio.start_server(manejador, host=destino[0], port=destino[1])
+
+    confirmador = asyncio.create_task(confirmar_lotes(cola, estadisticas))
+    detener = asyncio.Event()
+    bucle = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        bucle.add_signal_handler(senal, detener.set)
+
+    print(f"KYREL servidor escuchando en {direccion} (datos: {funciones.ruta_datos()})", flush=True)
+    try:
+        async with servidor:
+            await detener.wait()
+    finally:
+        confirmador.cancel()
+        if familia == socket.AF_UNIX and os.path.exists(destino):
+            os.unlink(destino)
+
+
+def direccion_tcp_local(texto):
+    """Tipo de argparse para --tcp: HOST:PUERTO con HOST localhost o una IP
+    de loopback. El servidor no autentica a nadie: no debe quedar expuesto
+    en la red"""
+    try:
+        _, (host, puerto) = cliente.parsear_direccion(f"tcp:{texto}")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"dirección inválida '{texto}' (usa HOST:PUERTO)")
+    if not 0 < puerto < 65536:
+        raise argparse.ArgumentTypeError(f"puerto inválido en '{texto}'")
+    try:
+        local = host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        local = False
+    if not local:
+        raise argparse.ArgumentTypeError(f"'{host}' no es local: el servidor solo escucha en localhost o en una IP de loopback")
+    return f"tcp:{texto}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYREL - Servidor local de datos")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--unix", metavar="RUTA", help="Socket Unix (por defecto <archivo de datos>.sock)")
+    grupo.add_argument("--tcp", metavar="HOST:PUERTO", type=direccion_tcp_local,
+                       help="Escuchar por TCP (solo localhost)")
+    args = parser.parse_args(argv)
+
+    if args.tcp:
+        direccion = args.tcp
+    elif args.unix:
+        direccion = f"unix:{args.unix}"
+    else:
+        direccion = cliente.direccion_por_defecto(funciones.ruta_datos())
+
+    # El servidor trabaja directamente con el archivo
+    cliente.deshabilitar()
+    funciones.cargar_datos()
+
+    estadisticas = Estadisticas()
+    try:
+        asyncio.run(servir(direccion, estadisticas))
+    except (RuntimeError, OSError) as e:
+        print(f"kyrel: {e}", file=sys.stderr)
+        return 1
+    finally:
+        funciones.consolidar_datos()
+    print(f"Servidor detenido: {estadisticas.conexiones} conexiones, {estadisticas.peticiones} peticiones, "
+          f"{estadisticas.operaciones} operaciones en {estadisticas.confirmaciones} confirmaciones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+KYREL - Terminal
+Capa de dibujo de las pantallas interactivas. Todo lo que se imprime se
+acumula en un búfer y se escribe en un solo `write` cuando hace falta (antes
+de leer del teclado o al salir). Cada pantalla nueva es un cuadro: se limpia
+y se redibuja con secuencias ANSI, sin lanzar `clear` en un subproceso, y si
+la terminal conserva el cuadro anterior solo se reescriben las líneas que
+cambiaron.
+
+Si la salida no es una terminal no se emiten secuencias de control; los
+colores se omiten también si está definida la variable NO_COLOR.
+"""
+
+import os
+import re
+import sys
+import atexit
+import shutil
+import unicodedata
+
+LIMPIAR = "\033[H\033[2J"
+BORRAR_LINEA = "\033[K"
+BORRAR_HASTA_EL_FINAL = "\033[J"
+
+_ANSI = re.compile(r"\033\[[0-9;?]*[A-Za-z]")
+
+
+def es_terminal(flujo=None):
+    """True si `flujo` (por defecto la salida estándar real) es una terminal"""
+    flujo = flujo or sys.__stdout__
+    try:
+        return flujo.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def colores_activos():
+    """Los colores se usan solo en una terminal y sin NO_COLOR definida"""
+    return "NO_COLOR" not in os.environ and es_terminal()
+
+
+def ancho_visible(texto):
+    """Columnas que ocupa `texto` en pantalla (sin ANSI, emojis dobles)"""
+    ancho = 0
+    for caracter in _ANSI.sub("", texto):
+        if unicodedata.combining(caracter) or caracter in "\u200d\ufe0f":
+            continue
+        ancho += 2 if unicodedata.east_asian_width(caracter) in ("W", "F") else 1
+    return ancho
+
+
+class Terminal:
+    """Reemplazo de sys.stdout que dibuja por cuadros.
+
+    `pantalla` es lo que se cree que hay en la terminal desde el último
+    cuadro, línea a línea (None en una línea que el usuario escribió, cuyo
+    contenido no se conoce); si no se puede saber (la salida se desplazó o
+    alguna línea ocupó más de una fila) vale None y el cuadro siguiente se
+    dibuja completo.
+    """
+
+    def __init__(self, salida=None, tty=None, tamano=None):
+        self.salida = salida or sys.__stdout__
+        self.fd = self.salida.fileno()
+        self.tty = es_terminal(self.salida) if tty is None else tty
+        self._tamano = tamano
+        self.encoding = "utf-8"
+        self.errors = "replace"
+        self.pendiente = []
+        self.pantalla = None
+        self.cuadro_nuevo = False
+
+    # --------------------------------------------------------
+    # Interfaz de archivo (lo que usan print e input)
+    # --------------------------------------------------------
+
+    def write(self, texto):
+        self.pendiente.append(texto)
+        return len(texto)
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self.tty
+
+    def fileno(self):
+        """Descriptor de la salida real: con él input() usa readline (edición
+        de línea, flechas e historial) en lugar de leer sin más de stdin"""
+        return self.fd
+
+    def flush(self):
+        """Escribe lo acumulado de una vez. input() lo llama antes de leer"""
+        if not self.pendiente and not self.cuadro_nuevo:
+            return
+        texto = "".join(self.pendiente)
+        self.pendiente = []
+        if self.cuadro_nuevo:
+            self.cuadro_nuevo = False
+            salida = self._dibujar_cuadro(texto)
+        else:
+            salida = texto
+            self._anexar(texto)
+        self._escribir(salida)
+        # Tras el volcado el usuario suele escribir una respuesta y Enter
+        if self.pantalla is not None:
+            self.pantalla[-1] = None
+            self.pantalla.append("")
+            if not self._cabe(self.pantalla):
+                self.pantalla = None
+
+    # --------------------------------------------------------
+    # Cuadros
+    # --------------------------------------------------------
+
+    def nuevo_cuadro(self):
+        """Empieza una pantalla nueva: lo escrito hasta ahora se descarta de
+        la vista y el próximo volcado redibuja"""
+        if self.pendiente and not self.cuadro_nuevo:
+            self.flush()
+        self.pendiente = []
+        self.cuadro_nuevo = True
+
+    def tamano(self):
+        if self._tamano:
+            return self._tamano
+        medida = shutil.get_terminal_size()
+        return medida.columns, medida.lines
+
+    def _dibujar_cuadro(self, texto):
+        if not self.tty:
+            return texto
+        lineas = texto.split("\n")
+        anterior = self.pantalla
+        self.pantalla = None
+        if not self._cabe(lineas):
+            return LIMPIAR + texto
+        self.pantalla = lineas
+        if anterior is None:
+            return LIMPIAR + texto
+
+        # Solo las líneas distintas del cuadro anterior
+        partes = []
+        for fila, linea in enumerate(lineas, 1):
+            if fila <= len(anterior) and anterior[fila - 1] == linea:
+                continue
+            partes.append(f"\033[{fila};1H{linea}{BORRAR_LINEA}")
+        ultima = len(lineas)
+        partes.append(f"\033[{ultima};{ancho_visible(lineas[-1]) + 1}H{BORRAR_HASTA_EL_FINAL}")
+        return "".join(partes)
+
+    def _anexar(self, texto):
+        """Actualiza la vista tras escribir `texto` a continuación"""
+        if self.pantalla is None or not self.tty:
+            return
+        lineas = texto.split("\n")
+        ultima = self.pantalla[-1]
+        lineas[0] = None if ultima is None else ultima + lineas[0]
+        self.pantalla[-1:] = lineas
+        if not self._cabe(self.pantalla):
+            self.pantalla = None
+
+    def _cabe(self, lineas):
+        """True si cada línea ocupa una sola fila y no hubo desplazamiento"""
+        columnas, filas = self.tamano()
+        if len(lineas) > filas:
+            return False
+        return all(linea is None or ancho_visible(linea) < columnas for linea in lineas)
+
+    def _escribir(self, texto):
+        datos = texto.encode(self.encoding, self.errors)
+        while datos:
+            escritos = os.write(self.fd, datos)
+            datos = datos[escritos:]
+
+
+def instalar():
+    """Redirige sys.stdout a un Terminal (una sola vez) y lo devuelve"""
+    if not isinstance(sys.stdout, Terminal):
+        sys.stdout = Terminal()
+        atexit.register(sys.stdout.flush)
+    return sys.stdout
+
+
+def limpiar():
+    """Empieza un cuadro nuevo; sin Terminal instalado, limpia con ANSI"""
+    if isinstance(sys.stdout, Terminal):
+        sys.stdout.nuevo_cuadro()
+    elif es_terminal(sys.stdout):
+        sys.stdout.write(LIMPIAR)
+        sys.stdout.flush()